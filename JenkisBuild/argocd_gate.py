@@ -0,0 +1,163 @@
+import logging
+import os
+import time
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from environments import EnvironmentSet
+
+# 部署成功所要求的同步和健康状态
+SYNCED = 'Synced'
+HEALTHY = 'Healthy'
+# 同步操作以这些状态结束时不必再等待
+FAILED_PHASES = ('Failed', 'Error')
+
+
+def parse_time(value):
+    """ArgoCD 的 RFC 3339 时间 (2024-05-01T08:00:00Z) 转换为时间戳，为空时返回 None"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+class ArgoHealthGate:
+    """
+    部署后的健康检查: Jenkins 构建成功后，轮询对应 ArgoCD 应用的同步和健康状态，
+    直到 Synced 且 Healthy 才算部署成功。刚构建完时应用状态往往还是上一次发布的 Synced / Healthy，
+    所以还要求最近一次同步操作在构建开始之后结束 (status.operationState.finishedAt)。应用名沿用 argoCD/monitorBranch.py 的命名:
+    <app_prefix><服务名去掉 pp- 前缀><app_suffix>，例如 pp-mail-service-cloud -> preprod-mail-service-cloud--qcore-preprod。
+    所有服务共用一个带连接池的会话，每个服务有各自的超时时间。
+    """
+
+    def __init__(self, url, token=None, app_prefix='preprod-', app_suffix='--qcore-preprod', apps=None,
+                 timeout=600, timeouts=None, poll_interval=5, environments: EnvironmentSet = None,
+                 pool_size=20, request_timeout=10, verify=True, logger=None):
+        """
+        :param apps: {服务: 应用名}，覆盖按命名规则得到的应用名，应用名为空表示该服务不做检查;
+                     ArgoCD 中不存在的应用按失败处理，避免命名规则写错时所有服务都不做检查
+        :param timeout: 单个服务等待 Synced/Healthy 的最长时间(秒)
+        :param timeouts: {服务: 秒}，覆盖个别服务的超时时间
+        :param environments: 多环境部署时各环境可用 argocd 设置覆盖 url/app_prefix/app_suffix/enabled
+        """
+        self.url = url.rstrip('/')
+        self.app_prefix = app_prefix
+        self.app_suffix = app_suffix
+        self.apps = apps or {}
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self.poll_interval = poll_interval
+        self.environments = environments or EnvironmentSet()
+        self.request_timeout = request_timeout
+        self.logger = logger or logging.getLogger(__name__)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.verify = verify
+        if token:
+            self.session.headers['Authorization'] = f"Bearer {token}"
+
+    @classmethod
+    def from_config(cls, argocd_config: dict, environments: EnvironmentSet = None, logger=None):
+        """根据 config.yaml 中的 argocd 配置创建，token 可由环境变量 ARGOCD_TOKEN 提供"""
+        return cls(
+            url=argocd_config.get('url', 'https://argocd.qcore-preprod.qima.com'),
+            token=argocd_config.get('token') or os.environ.get('ARGOCD_TOKEN'),
+            app_prefix=argocd_config.get('app_prefix', 'preprod-'),
+            app_suffix=argocd_config.get('app_suffix', '--qcore-preprod'),
+            apps=argocd_config.get('apps'),
+            timeout=argocd_config.get('timeout', 600),
+            timeouts=argocd_config.get('timeouts'),
+            poll_interval=argocd_config.get('poll_interval', 5),
+            environments=environments,
+            pool_size=argocd_config.get('pool_size', 20),
+            verify=argocd_config.get('verify_ssl', True),
+            logger=logger,
+        )
+
+    def _settings(self, target: str) -> dict:
+        env, _ = self.environments.split(target)
+        return (self.environments.settings(env).get('argocd') or {}) if env else {}
+
+    def app_name(self, target: str):
+        """返回服务对应的 ArgoCD 应用名，不需要检查时返回 None"""
+        env, service = self.environments.split(target)
+        settings = self._settings(target)
+        if not settings.get('enabled', True):
+            return None
+        for key in (target, service):
+            if key in self.apps:
+                return self.apps[key] or None
+        name = service[len('pp-'):] if service.startswith('pp-') else service
+        return (f"{settings.get('app_prefix', self.app_prefix)}{name}"
+                f"{settings.get('app_suffix', self.app_suffix)}")
+
+    def app_url(self, target: str, app: str) -> str:
+        """应用的 API 地址 api/v1/applications/<应用名>"""
+        base_url = self._settings(target).get('url', self.url).rstrip('/')
+        return f"{base_url}/api/v1/applications/{app}"
+
+    def status(self, target: str, app: str, refresh=False):
+        """
+        读取应用状态
+        :param refresh: 让 ArgoCD 先重新比较 Git 与集群的状态，避免读到构建之前的 Synced/Healthy
+        :return: (同步状态, 健康状态, 同步操作阶段, 同步操作开始时间, 同步操作结束时间)，应用不存在时返回 None
+        """
+        params = {'refresh': 'normal'} if refresh else None
+        resp = self.session.get(self.app_url(target, app), params=params, timeout=self.request_timeout)
+        if resp.status_code == 404:
+            return None
+        resp.raise_for_status()
+        status = resp.json().get('status') or {}
+        operation = status.get('operationState') or {}
+        return ((status.get('sync') or {}).get('status'), (status.get('health') or {}).get('status'),
+                operation.get('phase'), parse_time(operation.get('startedAt')), parse_time(operation.get('finishedAt')))
+
+    def wait(self, target: str, since: float) -> bool:
+        """
+        等待服务对应的应用在 since 之后完成同步，并且 Synced 且 Healthy
+        :param since: 构建开始的时间戳，之前结束的同步属于上一次发布
+        :return: 达到目标状态或不需要检查时返回 True；应用不存在、同步失败或超时返回 False
+        """
+        app = self.app_name(target)
+        if not app:
+            return True
+        # ArgoCD 的时间只精确到秒
+        since = int(since)
+        timeout = self.timeouts.get(target, self.timeouts.get(self.environments.split(target)[1], self.timeout))
+        deadline = time.time() + timeout
+        self.logger.info(f"等待 ArgoCD 应用 {app} 同步并健康 (最长 {timeout} 秒)")
+        last = None
+        while True:
+            try:
+                current = self.status(target, app, refresh=last is None)
+            except (requests.RequestException, ValueError) as e:
+                # 查询失败不影响结果，下次轮询再试
+                self.logger.warning(f"读取 ArgoCD 应用 {app} 状态失败: {str(e)}")
+            else:
+                if current is None:
+                    self.logger.error(f"ArgoCD 中没有应用 {app}，不需要检查的服务请在 argocd.apps 中设为 ''")
+                    return False
+                sync, health, phase, started_at, finished_at = current
+                fresh = bool(finished_at and finished_at >= since)
+                if (sync, health, fresh) != last:
+                    note = '' if fresh else ' (最近一次同步早于本次构建，等待新的同步)'
+                    self.logger.info(f"ArgoCD 应用 {app}: {sync} / {health}{note}")
+                    last = (sync, health, fresh)
+                if sync == SYNCED and health == HEALTHY and fresh:
+                    return True
+                if phase in FAILED_PHASES and started_at and started_at >= since:
+                    self.logger.error(f"ArgoCD 应用 {app} 同步失败 ({phase})")
+                    return False
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                state = f"{last[0]} / {last[1]}{'' if last[2] else ' (没有本次构建之后的同步)'}" if last else '未知'
+                self.logger.error(f"ArgoCD 应用 {app} 在 {timeout} 秒内未达到 Synced / Healthy，当前: {state}")
+                return False
+            time.sleep(min(self.poll_interval, remaining))
+
+    def close(self):
+        self.session.close()
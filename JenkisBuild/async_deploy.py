@@ -0,0 +1,369 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from build_watcher import finished_result
+from deploy_scheduler import DeployDag
+from environments import EnvironmentSet
+from retry_policy import RetryPolicy
+
+
+class AsyncJenkinsClient:
+    """基于 aiohttp 的 Jenkins REST API 客户端，所有请求共用一个连接池"""
+
+    def __init__(self, base_url, user=None, api_token=None, pool_size=20, timeout=10, verify=True):
+        self.base_url = base_url.rstrip('/')
+        self.request_count = 0
+        auth = aiohttp.BasicAuth(user, api_token) if user and api_token else None
+        connector = aiohttp.TCPConnector(limit=pool_size, ssl=verify)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            auth=auth,
+            timeout=aiohttp.ClientTimeout(total=timeout),
+            raise_for_status=True,
+        )
+        self._crumb = None
+        self._crumb_lock = asyncio.Lock()
+
+    @classmethod
+    def from_config(cls, jenkins_config: dict):
+        return cls(
+            base_url=jenkins_config.get('url', 'https://jenkins.qima.com'),
+            user=jenkins_config.get('user') or os.environ.get('JENKINS_USER'),
+            api_token=jenkins_config.get('api_token') or os.environ.get('JENKINS_API_TOKEN'),
+            pool_size=jenkins_config.get('pool_size', 20),
+            timeout=jenkins_config.get('timeout', 10),
+            verify=jenkins_config.get('verify_ssl', True),
+        )
+
+    def url(self, path: str) -> str:
+        if path.startswith('http://') or path.startswith('https://'):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    async def _get_crumb(self) -> dict:
+        async with self._crumb_lock:
+            if self._crumb is None:
+                async with self.session.get(self.url('crumbIssuer/api/json'), raise_for_status=False) as resp:
+                    self.request_count += 1
+                    if resp.status == 404:
+                        self._crumb = {}
+                    else:
+                        resp.raise_for_status()
+                        data = await resp.json(content_type=None)
+                        self._crumb = {data['crumbRequestField']: data['crumb']}
+            return self._crumb
+
+    async def get_json(self, path: str, tree: str = None) -> dict:
+        path = path.rstrip('/')
+        if not path.endswith('api/json'):
+            path = f"{path}/api/json"
+        params = {'tree': tree} if tree else None
+        async with self.session.get(self.url(path), params=params) as resp:
+            self.request_count += 1
+            return await resp.json(content_type=None)
+
+    async def last_build_number(self, job_path: str) -> int:
+        data = await self.get_json(job_path, tree='lastBuild[number]')
+        return (data.get('lastBuild') or {}).get('number', 0)
+
+    async def trigger_build(self, job_path: str, params: dict = None) -> str:
+        """通过 buildWithParameters 触发构建，返回队列项地址"""
+        query = {'delay': '0sec'}
+        query.update(params or {})
+        headers = await self._get_crumb()
+        url = self.url(f"{job_path.rstrip('/')}/buildWithParameters")
+        async with self.session.post(url, params=query, headers=headers) as resp:
+            self.request_count += 1
+            return resp.headers.get('Location')
+
+    async def follow_queue_item(self, queue_url: str, timeout=1800, get_json=None) -> int:
+        """
+        轮询队列项直到分配构建编号，队列项被取消时抛出 RuntimeError，超时返回 None
+        :param get_json: 可选的协程函数 get_json(path, tree)，用于给每次读取加上重试，默认直接请求
+        """
+        get_json = get_json or self.get_json
+        deadline = time.monotonic() + timeout
+        interval = 0.2
+        while time.monotonic() < deadline:
+            item = await get_json(queue_url, 'cancelled,why,executable[number]')
+            executable = item.get('executable') or {}
+            if executable.get('number'):
+                return executable['number']
+            if item.get('cancelled'):
+                raise RuntimeError(f"队列项已被取消: {queue_url}")
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, 2.0)
+        return None
+
+    async def close(self):
+        await self.session.close()
+
+
+class AsyncBuildPoller:
+    """协程版的批量构建状态轮询器，每个周期对每个目录只发一次请求"""
+
+    TREE = 'jobs[name,builds[number,result,building]{0,10}]'
+
+    def __init__(self, client: AsyncJenkinsClient, interval=1.0, timeout=1800, retry_policy: RetryPolicy = None,
+                 host: str = None, logger=None):
+        """
+        :param retry_policy: 读取结果计入 host 的断路器；失败不重试，下个周期再查
+        """
+        self.client = client
+        self.interval = interval
+        self.timeout = timeout
+        self.retry_policy = retry_policy
+        self.host = host
+        self.logger = logger or logging.getLogger(__name__)
+        self._pending = {}  # (folder, job_name, build_number) -> (previous_number, deadline, future)
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def watch(self, job_path: str, previous_number: int = 0, build_number: int = None) -> asyncio.Future:
+        folder, job_name = job_path.rstrip('/').rsplit('/job/', 1)
+        key = (folder, job_name, build_number)
+        if build_number:
+            previous_number = build_number - 1
+        if key not in self._pending:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[key] = (previous_number, time.monotonic() + self.timeout, future)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+        # shield: 单个等待方被取消时不影响其它等待同一构建的服务
+        return asyncio.shield(self._pending[key][2])
+
+    async def _run(self):
+        while True:
+            folders = {}
+            for key, entry in self._pending.items():
+                folders.setdefault(key[0], []).append((key, entry))
+
+            for folder, entries in folders.items():
+                try:
+                    data = await self._get_json(folder, self.TREE)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.logger.warning(f"批量获取 {folder} 构建状态失败: {str(e)}")
+                    continue
+                builds = {job.get('name'): job.get('builds') or [] for job in data.get('jobs', [])}
+                for key, (previous_number, deadline, future) in entries:
+                    _, job_name, build_number = key
+                    build = await self._find_build(folder, job_name, builds.get(job_name, []), build_number)
+                    result = finished_result(build, previous_number)
+                    if result:
+                        self.logger.info(f"{job_name} 构建 #{build['number']} 结束: {result}")
+                    elif time.monotonic() < deadline:
+                        continue
+                    else:
+                        self.logger.error(f"{job_name} 构建监控超时 ({self.timeout}秒)")
+                    self._pending.pop(key, None)
+                    if not future.done():
+                        future.set_result(result)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _find_build(self, folder: str, job_name: str, builds: list, build_number: int = None) -> dict:
+        """从批量结果中找到要监控的构建，指定编号的构建已不在最近几个构建中时单独查询"""
+        if not build_number:
+            return builds[0] if builds else {}
+        for build in builds:
+            if build.get('number') == build_number:
+                return build
+        if builds and builds[0].get('number', 0) > build_number:
+            try:
+                return await self._get_json(f"{folder}/job/{job_name}/{build_number}", 'number,result,building')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.warning(f"获取 {job_name} #{build_number} 构建状态失败: {str(e)}")
+        return {}
+
+    async def _get_json(self, path: str, tree: str = None) -> dict:
+        if not self.retry_policy:
+            return await self.client.get_json(path, tree)
+        return await self.retry_policy.observe_async(self.host, lambda: self.client.get_json(path, tree))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for _, _, future in self._pending.values():
+            if not future.done():
+                future.cancel()
+        self._pending.clear()
+
+
+class AsyncDeployEngine:
+    """
+    asyncio 部署引擎：单进程单线程驱动任意数量的服务，
+    通过信号量限制同时进行中的构建数 (多环境部署时每个环境另有自己的信号量)，Ctrl-C 时取消所有未完成的部署。
+    触发、读取最后构建编号和队列项按与线程池引擎共用的重试策略重试，Jenkins 断路器断开时暂停新的触发。
+    """
+
+    def __init__(self, jenkins_config: dict, job_path, branch_param='BRANCH',
+                 max_concurrency=10, build_timeout=1800, poll_interval=1.0, depends_on=None, health_gate=None,
+                 environments: EnvironmentSet = None, retry_policy: RetryPolicy = None, logger=None):
+        """
+        :param job_path: 可调用对象 job_path(service) -> Jenkins任务路径
+        :param max_concurrency: 同时进行中(触发+等待结果)的构建上限
+        :param depends_on: {service: [前置服务, ...]}，前置服务成功后才开始部署
+        :param health_gate: 可选的部署后检查，例如 ArgoHealthGate；构建成功后在线程池中调用
+                            health_gate.wait(service, 构建开始时间戳)，返回 False 时按部署失败处理
+        :param environments: 多环境部署时按各环境的 max_workers 限制该环境同时进行中的构建数
+        :param retry_policy: 重试策略和断路器，默认按 RetryPolicy 的默认参数创建
+        """
+        self.jenkins_config = jenkins_config
+        self.job_path = job_path
+        self.branch_param = branch_param
+        self.max_concurrency = max_concurrency
+        self.build_timeout = build_timeout
+        self.poll_interval = poll_interval
+        self.depends_on = depends_on or {}
+        self.health_gate = health_gate
+        self.environments = environments or EnvironmentSet()
+        self.host = urlsplit(jenkins_config.get('url', 'https://jenkins.qima.com')).netloc
+        self._gate_executor = None
+        self.logger = logger or logging.getLogger(__name__)
+        self.retry_policy = retry_policy or RetryPolicy(logger=self.logger)
+        self.results = {}
+
+    def run(self, services_branches: dict) -> dict:
+        """同步入口，返回 {service: success}"""
+        self.results = {}
+        try:
+            asyncio.run(self.deploy(services_branches))
+        except KeyboardInterrupt:
+            self.logger.warning("收到中断信号，已取消所有未完成的部署")
+        # 被取消或未开始的服务按失败处理
+        for service in services_branches:
+            self.results.setdefault(service, False)
+        return self.results
+
+    async def deploy(self, services_branches: dict) -> dict:
+        start_time = time.time()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        env_semaphores = {}
+        for service in services_branches:
+            env, limit = self.environments.split(service)[0], self.environments.limit(service)
+            if limit and env not in env_semaphores:
+                env_semaphores[env] = asyncio.Semaphore(limit)
+        client = AsyncJenkinsClient.from_config(self.jenkins_config)
+        poller = AsyncBuildPoller(client, interval=self.poll_interval, timeout=self.build_timeout,
+                                  retry_policy=self.retry_policy, host=self.host, logger=self.logger)
+        dag = DeployDag(services_branches, self.depends_on)
+        done = {service: asyncio.Event() for service in services_branches}
+        if self.health_gate:
+            # 检查是阻塞的 HTTP 轮询，与同时进行中的构建数相同的线程即可
+            self._gate_executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='health-gate')
+        try:
+            tasks = [
+                asyncio.create_task(self._deploy_one(client, poller, semaphore, service, branch,
+                                                     dag.deps[service], done, env_semaphores))
+                for service, branch in services_branches.items()
+            ]
+            await asyncio.gather(*tasks)
+        finally:
+            await poller.stop()
+            await client.close()
+            if self._gate_executor:
+                self._gate_executor.shutdown(wait=False, cancel_futures=True)
+                self._gate_executor = None
+            total_duration = round(time.time() - start_time, 2)
+            self.logger.info(f"异步部署结束，总耗时: {total_duration} 秒，API请求 {client.request_count} 次")
+        return self.results
+
+    async def _deploy_one(self, client, poller, semaphore, service: str, branch: str, deps: list, done: dict,
+                          env_semaphores: dict):
+        success = False
+        try:
+            # 等待前置服务结束，前置服务失败则不再部署
+            for dep in deps:
+                await done[dep].wait()
+            failed_deps = [dep for dep in deps if not self.results.get(dep)]
+            if failed_deps:
+                self.logger.warning(f"服务 {service} 的前置服务 {failed_deps} 部署失败，跳过部署")
+                return
+            # 先占所属环境的名额，已满的环境不占用全局名额，让位给其它环境
+            env_semaphore = env_semaphores.get(self.environments.split(service)[0])
+            if env_semaphore:
+                await env_semaphore.acquire()
+            try:
+                async with semaphore:
+                    success = await self._trigger_and_wait(client, poller, service, branch)
+            finally:
+                if env_semaphore:
+                    env_semaphore.release()
+        finally:
+            self.results[service] = success
+            done[service].set()
+
+    async def _build_started_at(self, client, job_path: str, build_number: int, fallback: float) -> float:
+        """构建开始的时间戳，取不到时使用开始监控的时间"""
+        if not build_number:
+            return fallback
+        try:
+            build = await client.get_json(f"{job_path.rstrip('/')}/{build_number}", 'timestamp')
+        except Exception as e:
+            self.logger.debug(f"读取构建 #{build_number} 开始时间失败: {str(e)}")
+            return fallback
+        return build['timestamp'] / 1000 if build.get('timestamp') else fallback
+
+    def _with_retry(self, func, service: str, label: str):
+        """按共享重试策略执行请求，func() 返回协程"""
+        return self.retry_policy.call_async(func, host=self.host, label=f"{service} {label}")
+
+    async def _trigger_and_wait(self, client, poller, service: str, branch: str) -> bool:
+        job_path = self.job_path(service)
+        try:
+            await self.retry_policy.wait_until_allowed_async(self.host)
+            previous_number = await self._with_retry(lambda: client.last_build_number(job_path),
+                                                     service, '读取最后构建编号')
+            self.logger.info(f"通过API触发构建: {job_path}，分支: {branch}")
+            queue_url = await self._with_retry(lambda: client.trigger_build(job_path, {self.branch_param: branch}),
+                                               service, '触发构建')
+            build_number = None
+            if queue_url:
+                def get_json(path, tree=None):
+                    return self._with_retry(lambda: client.get_json(path, tree), service, '读取队列项')
+                try:
+                    build_number = await client.follow_queue_item(queue_url, timeout=self.build_timeout,
+                                                                  get_json=get_json)
+                except RuntimeError:
+                    raise
+                except Exception as e:
+                    self.logger.warning(f"读取队列项 {queue_url} 失败，按构建编号顺序监控: {str(e)}")
+            if build_number:
+                self.logger.info(f"服务 {service} 对应构建 #{build_number}")
+            watch_start = time.time()
+            result = await poller.watch(job_path, previous_number, build_number)
+            success = result == 'SUCCESS'
+            if success and self.health_gate:
+                since = await self._build_started_at(client, job_path, build_number, watch_start)
+                loop = asyncio.get_running_loop()
+                success = await loop.run_in_executor(self._gate_executor, self.health_gate.wait, service, since)
+                if not success:
+                    self.logger.error(f"{service} 构建成功但发布检查未通过，按部署失败处理")
+            self.logger.info(f"服务 {service} 部署{'成功' if success else '失败'}")
+            return success
+        except asyncio.CancelledError:
+            self.logger.warning(f"服务 {service} 部署已取消")
+            raise
+        except Exception as e:
+            self.logger.error(f"部署服务 {service} 时发生错误: {str(e)}")
+            return False
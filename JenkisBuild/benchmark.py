@@ -0,0 +1,167 @@
+import argparse
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+
+from deploy_history import DeployHistory
+from deploy_journal import DeployJournal
+from deploy_scheduler import BuildDurationStore
+from jenkins_deploy import JenkinsDeployer
+
+# 部署方式 -> JenkinsDeployer 上的调用
+MODES = {
+    'sequential': lambda deployer, services: deployer.deploy(services),
+    'concurrent': lambda deployer, services: deployer.deploy_concurrent(services, force=True),
+    'all_master': lambda deployer, services: deployer.deploy_all_master(force=True),
+    'async': lambda deployer, services: deployer.deploy_async(services),
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _request(url: str, method='GET') -> dict:
+    with urllib.request.urlopen(urllib.request.Request(url, method=method, data=b'' if method == 'POST' else None),
+                                timeout=10) as resp:
+        return json.loads(resp.read() or b'{}')
+
+
+def start_fake_jenkins(args) -> (subprocess.Popen, str):
+    """在独立进程中启动 Jenkins 替身，避免它的内存计入部署进程"""
+    port = _free_port()
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_jenkins.py'),
+               '--port', str(port), '--duration', str(args.duration[0]), str(args.duration[1]),
+               '--failure-rate', str(args.failure_rate), '--queue-delay', str(args.queue_delay),
+               '--executors', str(args.executors)]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(50):
+        try:
+            _request(f"{url}/_stats")
+            return process, url
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Jenkins 替身启动失败")
+
+
+def make_deployer(url: str, backend: str, workers: int, services: dict, work_dir: str) -> JenkinsDeployer:
+    """创建指向 Jenkins 替身的部署器，本地状态文件写到临时目录"""
+    deployer = JenkinsDeployer(max_workers=workers, build_timeout=600, headless=True,
+                               backend='api' if backend == 'async' else backend)
+    deployer.services = list(services)
+    deployer.skip_services = []
+    deployer.depends_on = {}
+    deployer.skip_unchanged = False
+    deployer.concurrency_config = {}
+    deployer.webhook_config = {}
+    deployer.argocd_config = {}
+    deployer.report_config = {'enabled': False}
+    deployer.logging_config = {'dir': os.path.join(work_dir, 'logs'), 'progress': False}
+    deployer.jenkins_url = url
+    deployer.jenkins_config = {'url': url, 'pool_size': max(workers, 10)}
+    deployer.duration_store = BuildDurationStore(os.path.join(work_dir, 'build_durations.json'))
+    deployer.journal = DeployJournal(os.path.join(work_dir, 'deploy_journal.db'))
+    deployer.history = DeployHistory(os.path.join(work_dir, 'deploy_history.db'))
+    return deployer
+
+
+def run_case(url: str, mode: str, backend: str, size: int, workers: int) -> dict:
+    services = {f"bench-service-{i:03d}": 'master' for i in range(size)}
+    _request(f"{url}/_reset", 'POST')
+    with tempfile.TemporaryDirectory() as work_dir:
+        deployer = make_deployer(url, backend, workers, services, work_dir)
+        tracemalloc.start()
+        start = time.perf_counter()
+        error = None
+        try:
+            results = MODES[mode](deployer, services) or {}
+        except Exception as e:
+            results, error = {}, str(e)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        deployer.journal.close()
+        deployer.history.close()
+        if deployer.driver:
+            deployer.driver.quit()
+    stats = _request(f"{url}/_stats")
+    return {
+        'mode': mode,
+        'backend': backend,
+        'services': size,
+        'workers': workers,
+        'seconds': round(elapsed, 2),
+        'peak_memory_mb': round(peak / 1024 / 1024, 2),
+        'requests': stats['requests'],
+        'requests_per_service': round(stats['requests'] / size, 1),
+        'succeeded': sum(1 for success in results.values() if success),
+        'error': error,
+        'by_endpoint': stats['by_endpoint'],
+    }
+
+
+def format_results(rows: list) -> str:
+    header = f"{'mode':<11}{'backend':<10}{'services':>9}{'workers':>9}{'seconds':>10}{'peak MB':>10}{'requests':>10}{'req/svc':>9}{'ok':>6}"
+    lines = [header, '-' * len(header)]
+    for row in rows:
+        lines.append(f"{row['mode']:<11}{row['backend']:<10}{row['services']:>9}{row['workers']:>9}"
+                     f"{row['seconds']:>10}{row['peak_memory_mb']:>10}{row['requests']:>10}"
+                     f"{row['requests_per_service']:>9}{row['succeeded']:>6}"
+                     + (f"  错误: {row['error']}" if row['error'] else ''))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="使用本地 Jenkins 替身测量部署器的吞吐量")
+    parser.add_argument("--sizes", type=int, nargs='+', default=[10, 50, 200], help="服务数量")
+    parser.add_argument("--backends", nargs='+', default=['api', 'async'], choices=['api', 'async', 'selenium'],
+                        help="selenium 需要本机安装 Edge")
+    parser.add_argument("--modes", nargs='+', default=['concurrent'], choices=[m for m in MODES if m != 'async'],
+                        help="async 后端固定使用 deploy_async")
+    parser.add_argument("--workers", type=int, nargs='+', default=[10, 50], help="并发数")
+    parser.add_argument("--duration", type=float, nargs=2, default=(1.0, 3.0), metavar=("MIN", "MAX"),
+                        help="模拟构建耗时范围(秒)")
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--queue-delay", type=float, default=0.2)
+    parser.add_argument("--executors", type=int, default=0, help="模拟的执行器数量，0 表示不限制")
+    parser.add_argument("--output", help="把结果另存为 JSON")
+    parser.add_argument("--verbose", action="store_true", help="输出部署器日志")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    process, url = start_fake_jenkins(args)
+    rows = []
+    try:
+        for backend in args.backends:
+            modes = ['async'] if backend == 'async' else args.modes
+            for mode in modes:
+                for size in args.sizes:
+                    for workers in args.workers:
+                        row = run_case(url, mode, backend, size, workers)
+                        rows.append(row)
+                        print(format_results([row]).splitlines()[-1], flush=True)
+    finally:
+        process.terminate()
+        process.wait()
+
+    print()
+    print(format_results(rows))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
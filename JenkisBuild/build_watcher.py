@@ -0,0 +1,339 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from urllib.parse import urlsplit
+
+
+def finished_result(build: dict, previous_number: int = 0):
+    """触发之后的新构建已结束时返回其结果，否则返回 None"""
+    if not build or build.get('number', 0) <= previous_number:
+        return None
+    if build.get('building'):
+        return None
+    return build.get('result')
+
+
+def follow_queue_item(fetch_json, queue_url: str, timeout=1800, max_errors=5, logger=None):
+    """
+    轮询 Jenkins 队列项，直到分配了构建编号
+    :param queue_url: 触发构建时 Jenkins 返回的队列项地址
+    :return: 构建编号；连续多次读取失败或超时返回 None
+    :raises RuntimeError: 队列项被取消
+    """
+    logger = logger or logging.getLogger(__name__)
+    start_time = time.time()
+    interval = 0.2
+    errors = 0
+    while time.time() - start_time < timeout:
+        try:
+            item = fetch_json(queue_url, 'cancelled,why,executable[number]')
+            errors = 0
+        except Exception as e:
+            errors += 1
+            if errors >= max_errors:
+                logger.warning(f"读取队列项 {queue_url} 失败: {str(e)}")
+                return None
+            item = {}
+        executable = item.get('executable') or {}
+        if executable.get('number'):
+            waited = round(time.time() - start_time, 2)
+            logger.info(f"队列项已分配构建 #{executable['number']} (排队 {waited}秒)")
+            return executable['number']
+        if item.get('cancelled'):
+            raise RuntimeError(f"队列项已被取消: {queue_url}")
+        time.sleep(interval)
+        # 大多数构建很快离开队列，之后逐渐放慢
+        interval = min(interval * 2, 2.0)
+    logger.error(f"等待构建编号超时: {queue_url}")
+    return None
+
+
+def _relative_path(path: str) -> str:
+    """完整URL只保留路径部分，便于与相对的任务路径比较"""
+    if '://' in path:
+        path = urlsplit(path).path
+    return path.strip('/')
+
+
+class BuildStatusWatcher:
+    """
+    通过构建的 JSON 接口监控构建状态，代替刷新整个构建页面。
+    轮询间隔根据 estimatedDuration 自适应：预计还早时少查，接近完成时每秒查一次。
+    """
+
+    TREE = 'number,result,building,estimatedDuration,timestamp'
+
+    def __init__(self, fetch_json, min_interval=1.0, max_interval=15.0, timeout=1800, logger=None):
+        """
+        :param fetch_json: 可调用对象 fetch_json(path, tree) -> dict
+        :param timeout: 单个构建的最长监控时间(秒)
+        """
+        self.fetch_json = fetch_json
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger(__name__)
+
+    def next_interval(self, build: dict, now: float = None) -> float:
+        """根据构建预计剩余时间计算下一次轮询的间隔"""
+        if not build or not build.get('building'):
+            # 构建尚未开始，很快就会出现
+            return self.min_interval
+        estimated_ms = build.get('estimatedDuration') or -1
+        started_ms = build.get('timestamp') or 0
+        if estimated_ms <= 0 or not started_ms:
+            return min(self.max_interval, self.min_interval * 5)
+        now = time.time() if now is None else now
+        remaining = estimated_ms / 1000 - (now - started_ms / 1000)
+        # 剩余时间的一半作为间隔，越接近完成查询越频繁
+        return max(self.min_interval, min(self.max_interval, remaining / 2))
+
+    def wait(self, job_path: str, previous_number: int = 0, label: str = None, build_number: int = None,
+             check=None):
+        """
+        等待触发之后的构建结束
+        :param job_path: 任务路径或完整的任务URL
+        :param previous_number: 触发前的最后构建编号，只关注比它新的构建
+        :param build_number: 已知的构建编号，提供时只监控这一个构建
+        :param check: 可选的 check() -> 构建结果或 None，构建运行期间每次轮询后调用，返回结果时提前结束
+        :return: 构建结果 (SUCCESS/FAILURE/ABORTED/...)，超时返回 None
+        """
+        label = label or job_path
+        start_time = time.time()
+        if build_number:
+            build_path = f"{job_path.rstrip('/')}/{build_number}"
+            previous_number = build_number - 1
+        else:
+            build_path = f"{job_path.rstrip('/')}/lastBuild"
+        polls = 0
+
+        while time.time() - start_time < self.timeout:
+            build = None
+            try:
+                build = self.fetch_json(build_path, self.TREE)
+                polls += 1
+            except Exception as e:
+                self.logger.warning(f"获取 {label} 构建状态失败: {str(e)}")
+
+            result = finished_result(build, previous_number)
+            if result:
+                elapsed = round(time.time() - start_time, 2)
+                self.logger.info(f"{label} 构建 #{build['number']} 结束: {result} "
+                                 f"(耗时 {elapsed}秒, 查询 {polls} 次)")
+                return result
+            if not build or build.get('number', 0) <= previous_number:
+                # 新构建还没出现，按未开始处理
+                build = None
+            elif check:
+                result = check()
+                if result:
+                    return result
+
+            interval = self.next_interval(build)
+            elapsed = round(time.time() - start_time, 2)
+            self.logger.debug(f"{label} 构建进行中，已耗时 {elapsed}秒，{interval:.1f}秒后再次检查")
+            time.sleep(interval)
+
+        self.logger.error(f"{label} 构建监控超时 ({self.timeout}秒)")
+        return None
+
+
+class MultiplexedBuildPoller:
+    """
+    用一个后台线程监控所有进行中的构建。
+    每个周期对每个 Jenkins 目录只发一次批量请求，结果通过 Future 通知各个服务。
+    """
+
+    # builds 按编号从新到旧排列，取最近几个以便找到指定编号的构建
+    TREE = 'jobs[name,builds[number,result,building]{0,10}]'
+    BUILD_TREE = 'number,result,building'
+
+    def __init__(self, fetch_json, interval=1.0, timeout=1800, logger=None):
+        """
+        :param fetch_json: 可调用对象 fetch_json(path, tree) -> dict
+        :param interval: 两次批量查询之间的间隔(秒)
+        :param timeout: 单个构建的最长监控时间(秒)，超时后 Future 结果为 None
+        """
+        self.fetch_json = fetch_json
+        self.interval = interval
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger(__name__)
+        self.request_count = 0
+        # (folder, job_name, build_number) -> {previous_number, build_number, deadline, poll_after, futures, on_start, started}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='build-poller', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        # 未完成的构建按超时处理，避免调用方一直阻塞
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for entry in pending.values():
+            for future in entry['futures']:
+                if not future.done():
+                    future.set_result(None)
+
+    def watch(self, job_path: str, previous_number: int = 0, on_start=None, build_number: int = None,
+              quiet_for: float = None) -> Future:
+        """
+        登记一个需要监控的构建
+        :param job_path: 任务路径，例如 job/PP/job/pp-public-api 或完整URL
+        :param previous_number: 触发前的最后构建编号，只关注比它新的构建
+        :param on_start: 可选回调 on_start(build_number)，第一次看到新构建正在运行时调用
+        :param build_number: 已知的构建编号，提供时只监控这一个构建
+        :param quiet_for: 可选，这段时间(秒)内不轮询，等待 notify 推送结果，之后才回退到轮询
+        :return: Future，结果为构建结果字符串，超时为 None
+        """
+        folder, job_name = job_path.rstrip('/').rsplit('/job/', 1)
+        future = Future()
+        if build_number:
+            previous_number = build_number - 1
+        with self._lock:
+            key = (folder, job_name, build_number)
+            if key in self._pending:
+                self._pending[key]['futures'].append(future)
+            else:
+                self._pending[key] = {
+                    'previous_number': previous_number,
+                    'build_number': build_number,
+                    'deadline': time.time() + self.timeout,
+                    'poll_after': time.time() + quiet_for if quiet_for else 0,
+                    'futures': [future],
+                    'on_start': on_start,
+                    'started': False,
+                }
+        self.start()
+        self._wakeup.set()
+        return future
+
+    def _run(self):
+        while not self._stopped.is_set():
+            now = time.time()
+            with self._lock:
+                folders = {}
+                for key, entry in self._pending.items():
+                    if entry['poll_after'] <= now:
+                        folders.setdefault(key[0], []).append((key, entry))
+
+            for folder, entries in folders.items():
+                try:
+                    data = self.fetch_json(folder, self.TREE)
+                    self.request_count += 1
+                except Exception as e:
+                    self.logger.warning(f"批量获取 {folder} 构建状态失败: {str(e)}")
+                    continue
+                builds = {job.get('name'): job.get('builds') or [] for job in data.get('jobs', [])}
+                for key, entry in entries:
+                    job_name = key[1]
+                    build = self._find_build(folder, job_name, builds.get(job_name, []), entry['build_number'])
+                    result = finished_result(build, entry['previous_number'])
+                    if build.get('number', 0) > entry['previous_number']:
+                        self._mark_started(entry, job_name, build['number'])
+                    if result:
+                        self.logger.info(f"{job_name} 构建 #{build['number']} 结束: {result}")
+                    elif time.time() < entry['deadline']:
+                        continue
+                    else:
+                        self.logger.error(f"{job_name} 构建监控超时 ({self.timeout}秒)")
+                    self._resolve(key, result)
+
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def notify(self, job_path: str, build_number: int, phase: str, result: str = None):
+        """
+        外部推送的构建事件 (例如 Jenkins Notification 插件的回调)，立即结束对应的等待
+        :param job_path: 任务路径或完整的任务URL
+        :param phase: STARTED / COMPLETED / FINALIZED
+        :return: 匹配到的等待数量
+        """
+        folder, job_name = _relative_path(job_path).rsplit('/job/', 1)
+        with self._lock:
+            matches = [
+                (key, entry) for key, entry in self._pending.items()
+                if key[1] == job_name and _relative_path(key[0]) == folder
+                and (entry['build_number'] == build_number
+                     or (not entry['build_number'] and build_number > entry['previous_number']))
+            ]
+        completed = phase in ('COMPLETED', 'FINALIZED') and result
+        # 通知中的结果只作为提示，以 Jenkins 中记录的结果为准
+        confirmed = self._confirm_result(folder, job_name, build_number) if matches and completed else None
+        for key, entry in matches:
+            self._mark_started(entry, job_name, build_number)
+            if not completed:
+                continue
+            if confirmed:
+                self.logger.info(f"{job_name} 构建 #{build_number} 结束: {confirmed} (通知)")
+                self._resolve(key, confirmed)
+            else:
+                # 无法确认时回退到轮询
+                entry['poll_after'] = 0
+                self._wakeup.set()
+        return len(matches)
+
+    def _confirm_result(self, folder: str, job_name: str, build_number: int):
+        """读取一次构建的JSON确认已经结束，返回结果；仍在构建或读取失败时返回 None"""
+        try:
+            self.request_count += 1
+            build = self.fetch_json(f"{folder}/job/{job_name}/{build_number}", self.BUILD_TREE)
+        except Exception as e:
+            self.logger.warning(f"确认 {job_name} 构建 #{build_number} 的结果失败: {str(e)}")
+            return None
+        if build.get('building') or not build.get('result'):
+            self.logger.warning(f"{job_name} 构建 #{build_number} 收到结束通知但仍在构建，回退到轮询")
+            return None
+        return build['result']
+
+    def _mark_started(self, entry: dict, job_name: str, build_number: int):
+        """第一次看到新构建时调用 on_start"""
+        if entry['started']:
+            return
+        entry['started'] = True
+        if entry['on_start']:
+            try:
+                entry['on_start'](build_number)
+            except Exception as e:
+                self.logger.warning(f"{job_name} on_start 回调失败: {str(e)}")
+
+    def _find_build(self, folder: str, job_name: str, builds: list, build_number: int = None) -> dict:
+        """从批量结果中找到要监控的构建，指定编号的构建已不在最近几个构建中时单独查询"""
+        if not build_number:
+            return builds[0] if builds else {}
+        for build in builds:
+            if build.get('number') == build_number:
+                return build
+        if builds and builds[0].get('number', 0) > build_number:
+            try:
+                self.request_count += 1
+                return self.fetch_json(f"{folder}/job/{job_name}/{build_number}", self.BUILD_TREE)
+            except Exception as e:
+                self.logger.warning(f"获取 {job_name} #{build_number} 构建状态失败: {str(e)}")
+        return {}
+
+    def _resolve(self, key, result):
+        with self._lock:
+            entry = self._pending.pop(key, None)
+        if entry:
+            for future in entry['futures']:
+                if not future.done():
+                    future.set_result(result)
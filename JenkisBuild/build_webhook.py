@@ -0,0 +1,91 @@
+import hmac
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class BuildWebhookReceiver:
+    """
+    接收 Jenkins Notification 插件回调的本地 HTTP 服务。
+    回调内容形如 {"name": ..., "url": "job/PP/job/xxx/", "build": {"number": 12, "phase": "COMPLETED", "status": "SUCCESS"}}，
+    收到后交给 on_event(job_path, build_number, phase, status) 处理，例如 MultiplexedBuildPoller.notify。
+    回调地址必须带共享令牌 (?token=<token> 或请求头 X-Webhook-Token)，否则返回 403。
+    """
+
+    def __init__(self, on_event, token: str, host='127.0.0.1', port=8765, path='/jenkins', logger=None):
+        """
+        :param token: 共享令牌，不能为空
+        :param port: 监听端口，为 0 时由系统分配，启动后可从 self.port 读取
+        :param path: 接收回调的URL路径
+        """
+        if not token:
+            raise ValueError("构建通知接收服务需要配置令牌")
+        self.on_event = on_event
+        self.token = token
+        self.host = host
+        self.port = port
+        self.path = path.rstrip('/') or '/'
+        self.logger = logger or logging.getLogger(__name__)
+        self.event_count = 0
+        self._server = None
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self):
+        if self._server is not None:
+            return
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                url = urlsplit(self.path)
+                if url.path.rstrip('/') != receiver.path.rstrip('/'):
+                    self.send_error(404)
+                    return
+                token = self.headers.get('X-Webhook-Token') or (parse_qs(url.query).get('token') or [''])[0]
+                if not hmac.compare_digest(token.encode(), receiver.token.encode()):
+                    self.send_error(403)
+                    return
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    receiver.handle(json.loads(self.rfile.read(length) or b'{}'))
+                except ValueError as e:
+                    self.send_error(400, str(e))
+                    return
+                self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                receiver.logger.debug(f"webhook: {format % args}")
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='build-webhook', daemon=True)
+        self._thread.start()
+        self.logger.info(f"构建通知接收服务已启动: http://{self.host}:{self.port}{self.path}")
+
+    def handle(self, payload: dict):
+        """处理一条回调，格式不正确时抛出 ValueError"""
+        build = payload.get('build') or {}
+        job_path = payload.get('url')
+        if not job_path or not build.get('number') or not build.get('phase'):
+            raise ValueError("通知缺少 url/build.number/build.phase")
+        self.event_count += 1
+        self.on_event(job_path, int(build['number']), build['phase'], build.get('status'))
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+            self._thread = None
@@ -0,0 +1,54 @@
+import logging
+import time
+
+
+class ConcurrencyGovernor:
+    """
+    根据 Jenkins 的空闲执行器数和队列长度决定同时进行中的部署上限。
+    其它任务排队时先让出执行器，空闲执行器多时增加并发，结果始终限制在 [min_workers, max_workers]。
+    Jenkins 状态按 refresh_interval 缓存，避免每次提交都发请求。
+    """
+
+    def __init__(self, fetch_json, min_workers=1, max_workers=10, refresh_interval=10, logger=None):
+        """
+        :param fetch_json: 可调用对象 fetch_json(path, tree) -> dict
+        """
+        self.fetch_json = fetch_json
+        self.min_workers = max(min_workers, 1)
+        self.max_workers = max(max_workers, self.min_workers)
+        self.refresh_interval = refresh_interval
+        self.logger = logger or logging.getLogger(__name__)
+        self._free = None  # 最近一次计算出的可用执行器数
+        self._checked_at = 0
+        self._last_limit = None
+
+    def free_executors(self):
+        """空闲执行器数减去排队中的任务数，读取失败时沿用上一次的值 (从未成功时为 None)"""
+        if self._free is not None and time.time() - self._checked_at < self.refresh_interval:
+            return self._free
+        try:
+            computers = self.fetch_json('computer', 'busyExecutors,totalExecutors')
+            queue = self.fetch_json('queue', 'items[id]')
+        except Exception as e:
+            self.logger.warning(f"获取Jenkins执行器状态失败: {str(e)}")
+            self._checked_at = time.time()
+            return self._free
+        idle = computers.get('totalExecutors', 0) - computers.get('busyExecutors', 0)
+        self._free = idle - len(queue.get('items') or [])
+        self._checked_at = time.time()
+        return self._free
+
+    def limit(self, in_flight: int) -> int:
+        """
+        返回当前允许同时进行中的部署数
+        :param in_flight: 已在进行中的部署数
+        """
+        free = self.free_executors()
+        if free is None:
+            limit = self.max_workers
+        else:
+            limit = max(self.min_workers, min(self.max_workers, in_flight + free))
+        if limit != self._last_limit:
+            self.logger.info(f"并发上限调整为 {limit} (进行中 {in_flight}，可用执行器 {free})")
+            self._last_limit = limit
+        return limit
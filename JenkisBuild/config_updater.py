@@ -1,6 +1,14 @@
+import argparse
+import bisect
+import re
+import sys
 import yaml
 from typing import Dict
 
+from config_loader import load_config
+from deploy_scheduler import DeployDag
+from service_catalog import ServiceCatalog
+
 SERVICE_MAPPINGS = {
     # 基础映射关系
     'aims-service': 'pp-lt-aims-service-api',
@@ -13,7 +21,8 @@ SERVICE_MAPPINGS = {
     'program-web': 'pp-lt-program-web',
     'psi-web': 'pp-psi-web',
     'public-api': 'pp-public-api',
-    
+    'lt-dependency': 'it-dependency',
+
     # 其他可能的映射关系
     'auditor-app': 'pp-auditor-app-api',
     'b2b-service': 'pp-b2b-service',
@@ -57,55 +66,355 @@ SERVICE_MAPPINGS = {
     'wqs-common': 'pp-wqs-common'
 }
 
-def parse_input_text(text: str) -> Dict[str, str]:
-    result = {}
-    current_section = ""
-    
-    for line in text.split('\n'):
-        if not line.strip():
+# 任务名中可以省略的前缀和后缀，发布说明里通常写的是去掉它们之后的名字
+JOB_PREFIXES = ('pp-', 'lt-', 'node-')
+JOB_SUFFIXES = ('-api', '-cloud', '-new')
+
+# 不在服务目录页面中、由部署器单独处理的任务
+EXTRA_JOBS = ('it-dependency',)
+
+# 发布说明分类 (releaseExtract 输出的 service_categories.txt 或 "Back End=" 形式的标题) 对应的部署方式
+SEQUENTIAL_SECTIONS = ('commons',)  # 公共库逐个部署
+PREREQUISITE_SECTIONS = ('dependency', 'dependency services')  # 同一计划中后端服务的前置
+DEPENDENT_SECTIONS = ('back end',)
+KNOWN_SECTIONS = ('back end', 'front end', 'eks', 'eks services', 'commons', 'dependency', 'dependency services',
+                  'unknown')
+
+# 发布说明中的一行: 名称=版本，或只有名称 (分类文件)
+RELEASE_LINE = re.compile(r'^\s*(?:[-*]\s*)?([A-Za-z0-9][\w.\-/ ]*?)\s*(?:=\s*(\S*)\s*)?$')
+
+
+def normalize(name: str) -> str:
+    return re.sub(r'[\s_]+', '-', name.strip().lower())
+
+
+class ServiceIndex:
+    """
+    把发布说明中的名称解析为 Jenkins 任务名。索引在创建时一次算好:
+    任务名本身、别名、去掉 pp-/lt-/node- 前缀和 -api/-cloud/-new 后缀得到的短名，
+    以及按短名排序的前缀索引，用于 "final-report" 这类只写了名称开头的情况。
+    """
+
+    def __init__(self, jobs, aliases: dict = None):
+        self.jobs = set(jobs) | set(EXTRA_JOBS)
+        self.aliases = {}
+        for alias, job in {**SERVICE_MAPPINGS, **(aliases or {})}.items():
+            if job in self.jobs:
+                self.aliases[normalize(alias)] = job
+        self.keys = {}  # 短名 -> {任务名}
+        for job in self.jobs:
+            for key in self._short_names(job):
+                self.keys.setdefault(key, set()).add(job)
+        self._sorted_keys = sorted(self.keys)
+
+    @staticmethod
+    def _short_names(job: str) -> set:
+        names = set()
+        name = job.lower()
+        while True:
+            names.add(name)
+            for suffix in JOB_SUFFIXES:
+                if name.endswith(suffix):
+                    names.add(name[:-len(suffix)])
+            prefix = next((prefix for prefix in JOB_PREFIXES if name.startswith(prefix)), None)
+            if not prefix:
+                return names
+            name = name[len(prefix):]
+
+    def resolve(self, name: str):
+        """
+        :return: (任务名, None) 或 (None, 候选任务列表)，候选为空表示找不到，多于一个表示有歧义
+        """
+        key = normalize(name)
+        if key in self.jobs:
+            return key, None
+        if key in self.aliases:
+            return self.aliases[key], None
+        matches = self.keys.get(key)
+        if not matches:
+            # 前缀索引: 短名以 "<key>-" 开头的任务
+            matches = set()
+            start = bisect.bisect_left(self._sorted_keys, key + '-')
+            for candidate in self._sorted_keys[start:]:
+                if not candidate.startswith(key + '-'):
+                    break
+                matches |= self.keys[candidate]
+        if len(matches) == 1:
+            return next(iter(matches)), None
+        return None, sorted(matches)
+
+
+class ReleasePlan:
+    """编译结果: 部署计划和无法解析的条目"""
+
+    def __init__(self):
+        self.concurrent = {}  # {任务名: 分支}
+        self.sequential = {}
+        self.depends_on = {}  # {任务名: [前置任务名]}，只包含本计划新增的依赖
+        self.resolved = {}  # 发布说明中的名称 -> 任务名
+        self.unresolved = []  # [(行号, 名称)]
+        self.ambiguous = []  # [(行号, 名称, [候选任务])]
+        self.errors = []  # [(行号, 说明)]
+
+    @property
+    def services(self) -> dict:
+        return {**self.sequential, **self.concurrent}
+
+    def problems(self) -> list:
+        problems = [f"第 {line} 行: 找不到 '{name}' 对应的Jenkins任务" for line, name in self.unresolved]
+        problems += [f"第 {line} 行: '{name}' 可能对应多个任务: {', '.join(candidates)}"
+                     for line, name, candidates in self.ambiguous]
+        problems += [f"第 {line} 行: {message}" for line, message in self.errors]
+        return problems
+
+    def format(self) -> str:
+        lines = [f"部署计划: 并发 {len(self.concurrent)} 个，顺序 {len(self.sequential)} 个"]
+        for title, section in (('sequential', self.sequential), ('concurrent', self.concurrent)):
+            for service, branch in section.items():
+                lines.append(f"  [{title}] {service}: {branch}")
+        for service, deps in self.depends_on.items():
+            lines.append(f"  [depends_on] {service} <- {', '.join(deps)}")
+        problems = self.problems()
+        if problems:
+            lines.append(f"未解析 {len(problems)} 项:")
+            lines += [f"  {problem}" for problem in problems]
+        return '\n'.join(lines)
+
+
+def compile_release(text: str, index: ServiceIndex, branch: str = None, depends_on: dict = None) -> ReleasePlan:
+    """
+    把发布说明编译为部署计划
+    :param text: "名称=版本" 形式的发布说明，或 releaseExtract 输出的分类文件 (只有名称，分类标题单独一行)
+    :param branch: 没有写版本的条目使用的分支
+    :param depends_on: config.yaml 中已有的 depends_on，用于校验循环依赖
+    """
+    plan = ReleasePlan()
+    section = ''
+    prerequisites, dependents = [], []
+    for number, line in enumerate(text.splitlines(), 1):
+        stripped = line.strip()
+        if not stripped or stripped.startswith('#'):
+            continue
+        if stripped.endswith('=') or normalize(stripped).replace('-', ' ') in KNOWN_SECTIONS:
+            section = stripped.rstrip('=').strip().lower()
             continue
-        if line.endswith('='):
-            current_section = line.rstrip('=')
+        match = RELEASE_LINE.match(stripped)
+        if not match:
+            plan.errors.append((number, f"无法识别的内容: {stripped}"))
             continue
-        if '=' in line:
-            service, version = line.split('=')
-            if service in SERVICE_MAPPINGS:
-                result[SERVICE_MAPPINGS[service]] = version
+        name, version = match.group(1), match.group(2) or branch
+        job, candidates = index.resolve(name)
+        if job is None:
+            if candidates:
+                plan.ambiguous.append((number, name, candidates))
             else:
-                print(f"警告: 服务 '{service}' 没有对应的映射关系")
-    
-    return result
-
-def update_yaml_config(input_text: str, yaml_path: str = 'JenkisBuild/config.yaml'):
-    # 解析输入文本
-    service_versions = parse_input_text(input_text)
-    
-    # 读取现有YAML
+                plan.unresolved.append((number, name))
+            continue
+        if not version:
+            plan.errors.append((number, f"'{name}' 没有版本，请在行中写明或使用 --branch"))
+            continue
+        target = plan.sequential if section in SEQUENTIAL_SECTIONS else plan.concurrent
+        previous = plan.services.get(job)
+        if previous and previous != version:
+            plan.errors.append((number, f"{job} 的版本冲突: {previous} / {version}"))
+            continue
+        target[job] = version
+        plan.resolved[name] = job
+        if section in PREREQUISITE_SECTIONS:
+            prerequisites.append(job)
+        elif section in DEPENDENT_SECTIONS:
+            dependents.append(job)
+
+    for job in dependents:
+        if job in plan.concurrent and prerequisites:
+            plan.depends_on[job] = [dep for dep in prerequisites if dep in plan.concurrent]
+    merged = {service: list(deps) for service, deps in (depends_on or {}).items()}
+    for service, deps in plan.depends_on.items():
+        merged[service] = list(dict.fromkeys((merged.get(service) or []) + deps))
+    try:
+        DeployDag(plan.concurrent, merged)
+    except ValueError as e:
+        plan.errors.append((0, str(e)))
+    return plan
+
+
+def parse_input_text(text: str, index: ServiceIndex = None) -> Dict[str, str]:
+    """解析 "名称=版本" 形式的发布说明，返回 {任务名: 版本}，无法解析的名称打印警告"""
+    plan = compile_release(text, index or load_index())
+    for problem in plan.problems():
+        print(f"警告: {problem}")
+    return plan.services
+
+
+def load_index(config: dict = None, refresh: bool = False) -> ServiceIndex:
+    """
+    用服务目录创建索引。API模式 (或 refresh 为 True) 时按 catalog.ttl 从Jenkins刷新任务列表
+    """
+    config = config or load_config()
+    catalog_config = config.get('catalog') or {}
+    catalog = ServiceCatalog(ttl=catalog_config.get('ttl', 0) or (1 if refresh else 0))
+    fetch_json = None
+    if refresh or (config.get('default') or {}).get('backend') == 'api':
+        from jenkins_api import JenkinsApiClient
+        api = JenkinsApiClient.from_config(config.get('jenkins') or {})
+        fetch_json = api.get_json
+    jobs = catalog.refresh(fetch_json) if refresh else catalog.services(fetch_json)
+    return ServiceIndex(jobs, (config.get('release_plan') or {}).get('aliases'))
+
+
+# ---- 保留注释的 YAML 块替换 ----
+
+KEY_LINE = re.compile(r'^(\s*)([^\s#:][^:#]*?):(\s*)(.*)$')
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip(' '))
+
+
+def _is_content(line: str) -> bool:
+    stripped = line.strip()
+    return bool(stripped) and not stripped.startswith('#')
+
+
+def _block_end(lines: list, start: int, indent: int) -> int:
+    """key 在 start 行、缩进为 indent 的块的结束位置，不含块后的空行"""
+    end = start + 1
+    for i in range(start + 1, len(lines)):
+        if not lines[i].strip():
+            continue
+        if _indent(lines[i]) <= indent:
+            break
+        end = i + 1
+    return end
+
+
+def _find_key(lines: list, key: str, start: int, end: int, indent: int = None):
+    for i in range(start, end):
+        match = KEY_LINE.match(lines[i])
+        if match and match.group(2).strip() == key and _is_content(lines[i]) \
+                and (indent is None or len(match.group(1)) == indent):
+            return i
+    return None
+
+
+def _dump(mapping: dict, indent: int) -> list:
+    text = yaml.safe_dump(mapping, allow_unicode=True, sort_keys=False, default_flow_style=False)
+    return [' ' * indent + line for line in text.splitlines()]
+
+
+def replace_mapping(lines: list, path: list, mapping: dict) -> list:
+    """
+    把 path (例如 ['services', 'concurrent']) 处的映射替换为 mapping，
+    块中的注释行和块外的内容保持不变；path 不存在时在上层块末尾创建
+    """
+    start, end, indent = 0, len(lines), -1
+    for depth, key in enumerate(path):
+        child_indent = None
+        for i in range(start, end):
+            if _is_content(lines[i]):
+                child_indent = _indent(lines[i])
+                break
+        position = _find_key(lines, key, start, end, child_indent) if child_indent is not None else None
+        if position is None:
+            # 创建缺少的键以及其下的映射
+            new_indent = child_indent if child_indent is not None and child_indent > indent else indent + 2
+            value = mapping
+            for inner in reversed(path[depth + 1:]):
+                value = {inner: value}
+            created = _dump({key: value}, new_indent) if value else [' ' * new_indent + f"{key}: {{}}"]
+            return lines[:end] + created + lines[end:]
+        indent = _indent(lines[position])
+        key_line = position
+        start, end = position + 1, _block_end(lines, position, indent)
+
+    match = KEY_LINE.match(lines[key_line])
+    value_part = match.group(4)
+    comment = value_part[value_part.index('#'):] if '#' in value_part else ''
+    # 块中的内容行全部替换，注释和空行保留在原位置，新内容写在原来第一条内容的位置
+    body = lines[start:end]
+    child_indent = next((_indent(line) for line in body if _is_content(line)), indent + 2)
+    kept, insert_at = [], None
+    for line in body:
+        if _is_content(line):
+            if insert_at is None:
+                insert_at = len(kept)
+            continue
+        kept.append(line)
+    if insert_at is None:
+        insert_at = len(kept)
+    new_entries = _dump(mapping, child_indent) if mapping else []
+    suffix = ('  ' + comment) if comment else ''
+    head = ' ' * indent + f"{path[-1]}:" + ('' if mapping else ' {}') + suffix
+    return lines[:key_line] + [head] + kept[:insert_at] + new_entries + kept[insert_at:] + lines[end:]
+
+
+def update_yaml_config(input_text: str, yaml_path: str = 'JenkisBuild/config.yaml', branch: str = None,
+                       replace: bool = False, index: ServiceIndex = None) -> ReleasePlan:
+    """
+    把发布说明编译成部署计划并原地更新 config.yaml (保留注释和其它配置)
+    默认只添加/更新计划中出现的服务，已有的其它服务保留；计划中没有 Commons 服务时不修改 services.sequential
+    :param replace: 为 True 时用计划替换 services.concurrent，计划中有顺序部署的服务时同样替换 services.sequential
+    """
     with open(yaml_path, 'r', encoding='utf-8') as f:
-        config = yaml.safe_load(f)
-    
-    # 更新concurrent部分
-    if 'services' not in config:
-        config['services'] = {}
-    if 'concurrent' not in config['services']:
-        config['services']['concurrent'] = {}
-        
-    config['services']['concurrent'].update(service_versions)
-    
-    # 写回YAML文件
+        text = f.read()
+    config = yaml.safe_load(text) or {}
+    plan = compile_release(input_text, index or load_index(config), branch, config.get('depends_on'))
+    if plan.errors and any(line == 0 for line, _ in plan.errors):
+        # 循环依赖，不写入
+        return plan
+
+    services = config.get('services') or {}
+    concurrent, sequential = plan.concurrent, plan.sequential
+    if not replace:
+        concurrent = {**(services.get('concurrent') or {}), **concurrent}
+        sequential = {**(services.get('sequential') or {}), **sequential}
+    depends_on = {service: list(deps) for service, deps in (config.get('depends_on') or {}).items()}
+    for service, deps in plan.depends_on.items():
+        depends_on[service] = list(dict.fromkeys((depends_on.get(service) or []) + deps))
+
+    lines = text.splitlines()
+    if plan.sequential:
+        lines = replace_mapping(lines, ['services', 'sequential'], sequential)
+    lines = replace_mapping(lines, ['services', 'concurrent'], concurrent)
+    if plan.depends_on:
+        lines = replace_mapping(lines, ['depends_on'], depends_on)
     with open(yaml_path, 'w', encoding='utf-8') as f:
-        yaml.dump(config, f, allow_unicode=True, sort_keys=False)
-
-# 示例使用
-input_text = """
-Back End=
-aims-service=release-5.3.41
-psi-service=release-8.120
-customer-service=release-8.120
-Front End=
-aims-web=release-5.3.41
-public-api=release-1.2.221
-psi-web=release-8.120
-"""
-
-update_yaml_config(input_text) 
\ No newline at end of file
+        f.write('\n'.join(lines) + '\n')
+    return plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把发布说明编译成部署计划并更新 config.yaml")
+    parser.add_argument("release", nargs='?', help="发布说明文件 (名称=版本) 或 releaseExtract 的分类文件，省略时从标准输入读取")
+    parser.add_argument("--branch", help="没有写版本的条目使用的分支，例如 release-5.3.41")
+    parser.add_argument("--config", default='JenkisBuild/config.yaml')
+    parser.add_argument("--replace", action="store_true",
+                        help="用计划替换 services.concurrent (以及计划中有顺序部署服务时的 services.sequential)，默认保留已有服务")
+    parser.add_argument("--refresh", action="store_true", help="先从Jenkins刷新任务列表")
+    parser.add_argument("--dry-run", action="store_true", help="只打印部署计划，不修改 config.yaml")
+    parser.add_argument("--strict", action="store_true", help="有未解析的条目时不修改 config.yaml")
+    args = parser.parse_args()
+
+    if args.release:
+        with open(args.release, 'r', encoding='utf-8') as f:
+            text = f.read()
+    else:
+        text = sys.stdin.read()
+
+    with open(args.config, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+    index = load_index(config, refresh=args.refresh)
+    plan = compile_release(text, index, args.branch, config.get('depends_on'))
+    print(plan.format())
+    if args.dry_run or (args.strict and plan.problems()):
+        return 1 if plan.problems() else 0
+    plan = update_yaml_config(text, args.config, args.branch, args.replace, index)
+    if any(line == 0 for line, _ in plan.errors):
+        print("存在循环依赖，未修改配置")
+        return 1
+    print(f"已更新 {args.config}")
+    return 1 if plan.problems() else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
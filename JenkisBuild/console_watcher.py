@@ -0,0 +1,72 @@
+import logging
+import re
+from collections import deque
+
+# 默认的失败特征，可在 config.yaml 的 console.failure_patterns 中覆盖
+DEFAULT_FAILURE_PATTERNS = [
+    r'\[ERROR\] BUILD FAILURE',
+    r'npm ERR!',
+    r'ERROR: script returned exit code',
+]
+
+
+class ConsoleWatcher:
+    """
+    通过 logText/progressiveText 增量读取单个构建的控制台输出，匹配到失败特征后提前判定失败。
+    每次请求带上 start 偏移量 (上次响应的 X-Text-Size)，只传输新增的内容。
+    """
+
+    # 一次检查最多连续读取的分段数，避免日志暴增时长时间阻塞
+    MAX_CHUNKS = 20
+
+    def __init__(self, fetch_text, build_path: str, patterns=None, context_lines=5, logger=None):
+        """
+        :param fetch_text: 可调用对象 fetch_text(path, start) -> (text, next_start, more_data)
+        :param build_path: 构建路径，例如 job/PP/job/pp-public-api/123
+        :param patterns: 失败特征的正则表达式列表
+        :param context_lines: 匹配行之前保留的日志行数
+        """
+        self.fetch_text = fetch_text
+        self.build_path = build_path.rstrip('/')
+        self.patterns = [re.compile(p) for p in (patterns or DEFAULT_FAILURE_PATTERNS)]
+        self.logger = logger or logging.getLogger(__name__)
+        self.offset = 0
+        self.bytes_read = 0
+        self.excerpt = None
+        self._partial = ''  # 上次读取末尾不完整的一行
+        self._recent = deque(maxlen=context_lines + 1)
+
+    def poll(self):
+        """
+        读取新增的控制台输出并匹配失败特征
+        :return: 匹配到时返回日志摘录，否则返回 None
+        """
+        if self.excerpt:
+            return self.excerpt
+        for _ in range(self.MAX_CHUNKS):
+            try:
+                text, next_start, more_data = self.fetch_text(f"{self.build_path}/logText/progressiveText",
+                                                              self.offset)
+            except Exception as e:
+                # 构建尚未开始或暂时读取失败，下次再试
+                self.logger.debug(f"读取 {self.build_path} 控制台输出失败: {str(e)}")
+                return None
+            if next_start is not None:
+                self.offset = int(next_start)
+            self.bytes_read += len(text or '')
+            if self._scan(text or ''):
+                return self.excerpt
+            if not more_data:
+                break
+        return None
+
+    def _scan(self, text: str) -> bool:
+        lines = (self._partial + text).split('\n')
+        self._partial = lines.pop()
+        for line in lines:
+            line = line.rstrip('\r')
+            self._recent.append(line)
+            if any(pattern.search(line) for pattern in self.patterns):
+                self.excerpt = '\n'.join(self._recent)
+                return True
+        return False
@@ -1,18 +1,39 @@
+import argparse
 from jenkins_deploy import JenkinsDeployer
 from config_loader import load_config
+from deploy_scheduler import format_plan
 
 def main():
+    parser = argparse.ArgumentParser(description="部署所有服务的master分支")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--plan", action="store_true", help="只打印按最长优先调度的部署计划和预计总耗时，不触发构建")
+    parser.add_argument("--workers", type=int, help="并发数，覆盖默认值")
+    parser.add_argument("--force", action="store_true", help="即使分支最新提交已成功构建过也重新构建")
+    mode.add_argument("--resume", metavar="RUN_ID", help="恢复中断的部署：已成功的跳过，仍在构建的重新关联，其余重新触发")
+    args = parser.parse_args()
+
     config = load_config()
     default_config = config.get('default', {})
+    concurrency = config.get('concurrency') or {}
+    if concurrency.get('adaptive'):
+        # 实际并发由Jenkins空闲执行器决定，这里只是上限
+        max_workers = args.workers or concurrency.get('max_workers', 10)
+    else:
+        max_workers = args.workers or default_config.get('max_workers', 20)
     
     deployer = JenkinsDeployer(
-        max_workers=default_config.get('max_workers', 20),
+        max_workers=max_workers,
         build_timeout=default_config.get('build_timeout', 1800),
-        headless=default_config.get('headless', True)
+        headless=default_config.get('headless', True),
+        backend=default_config.get('backend', 'selenium')
     )
     
     try:
-        deployer.deploy_all_master()
+        if args.plan:
+            total, plan = deployer.plan(deployer.master_services(), max_workers)
+            print(format_plan(total, plan, max_workers))
+        else:
+            deployer.deploy_all_master(resume_run_id=args.resume, force=args.force)
     finally:
         if deployer.driver:
             deployer.driver.quit()
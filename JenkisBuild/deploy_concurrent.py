@@ -1,28 +1,75 @@
+import argparse
 from jenkins_deploy import JenkinsDeployer
 from config_loader import load_config
+from deploy_scheduler import format_plan
+from environments import EnvironmentSet
 
 def main():
+    parser = argparse.ArgumentParser(description="并发部署 config.yaml 中 concurrent 部分的服务")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--plan", action="store_true", help="只打印按最长优先调度的部署计划和预计总耗时，不触发构建")
+    parser.add_argument("--workers", type=int, help="并发数，覆盖默认值")
+    parser.add_argument("--force", action="store_true", help="即使分支最新提交已成功构建过也重新构建")
+    mode.add_argument("--resume", metavar="RUN_ID", help="恢复中断的部署：已成功的跳过，仍在构建的重新关联，其余重新触发")
+    parser.add_argument("--env", nargs='+', metavar="ENV",
+                        help="同时部署到 config.yaml 中 environments 下的多个环境，例如 --env PP Prod")
+    args = parser.parse_args()
+
     config = load_config()
     default_config = config.get('default', {})
     services_to_deploy = config.get('services', {}).get('concurrent', {})
     
-    if not services_to_deploy:
+    if args.resume:
+        # 恢复时使用部署日志中记录的服务列表
+        services_to_deploy = None
+    elif not services_to_deploy:
         print("没有需要部署的服务")
         return
+    elif args.env:
+        # 同一份计划展开为 <环境>/<服务>，在一次部署中并行进行
+        try:
+            services_to_deploy = EnvironmentSet(config.get('environments')).expand(services_to_deploy, args.env)
+        except ValueError as e:
+            print(str(e))
+            return
     
-    # 动态设置max_workers为concurrent服务数量    
-    max_workers = len(services_to_deploy)
+    # 恢复依赖线程池引擎写入的部署日志
+    engine = 'threads' if args.resume else default_config.get('engine', 'threads')
+    if engine == 'async':
+        # 异步引擎只通过API部署，并发上限取配置中的max_workers
+        max_workers = default_config.get('max_workers', 10)
+        backend = 'api'
+    else:
+        concurrency = config.get('concurrency') or {}
+        if concurrency.get('adaptive'):
+            # 实际并发由Jenkins空闲执行器决定，这里只是上限
+            max_workers = concurrency.get('max_workers', 10)
+        else:
+            # 动态设置max_workers为concurrent服务数量
+            max_workers = len(services_to_deploy) if services_to_deploy else default_config.get('max_workers', 3)
+        backend = default_config.get('backend', 'selenium')
+    if args.workers:
+        max_workers = args.workers
         
     deployer = JenkinsDeployer(
-        # max_workers=default_config.get('max_workers', 10),
-        max_workers=max_workers,  # 使用动态计算的max_workers
+        max_workers=max_workers,
         build_timeout=default_config.get('build_timeout', 1800),
-        headless=default_config.get('headless', True)
+        headless=default_config.get('headless', True),
+        backend=backend
     )
     
     try:
-        results = deployer.deploy_concurrent(services_to_deploy)
+        if args.plan:
+            total, plan = deployer.plan(services_to_deploy, max_workers)
+            print(format_plan(total, plan, max_workers))
+            return
+        if engine == 'async':
+            results = deployer.deploy_async(services_to_deploy)
+        else:
+            results = deployer.deploy_concurrent(services_to_deploy, resume_run_id=args.resume, force=args.force)
         print(f"并发部署结果: {results}")
+        for service, excerpt in deployer.failure_excerpts.items():
+            print(f"\n{service} 失败日志:\n{excerpt}")
     except Exception as e:
         print(f"部署过程中发生错误: {str(e)}")
     finally:
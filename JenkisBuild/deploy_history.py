@@ -0,0 +1,164 @@
+import json
+import sqlite3
+import threading
+import time
+
+from run_report import percentile
+
+# 从运行报告中保存的阶段耗时
+HISTORY_PHASES = ('trigger', 'queue_wait', 'build', 'detection', 'total')
+
+
+class DeployHistory:
+    """
+    部署历史: 每次顺序/并发部署结束后，把各服务的结果、各阶段耗时和重试次数写入本地 SQLite。
+    用于统计耗时分位数、最不稳定的服务，并为调度和部署计划提供历史耗时。
+    """
+
+    def __init__(self, path='JenkisBuild/deploy_history.db'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                kind TEXT,
+                started_at REAL,
+                finished_at REAL,
+                wall_time REAL,
+                services INTEGER,
+                succeeded INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id TEXT,
+                service TEXT,
+                branch TEXT,
+                success INTEGER,
+                skipped INTEGER,
+                build_number INTEGER,
+                retries INTEGER,
+                trigger REAL,
+                queue_wait REAL,
+                build REAL,
+                detection REAL,
+                total REAL,
+                finished_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_results_service ON results (service, id);
+        """)
+
+    def record_run(self, report):
+        """
+        保存一次部署的运行报告 (RunReport)，同一 run_id 再次保存 (恢复部署) 时覆盖；
+        恢复部署时没有重新部署的服务 (resumed) 保留上次保存的记录，没有记录时按跳过保存
+        """
+        finished_at = report.finished_at or time.time()
+        entries = dict(report.services)
+        with self._lock, self._conn:
+            existing = {row[0] for row in self._conn.execute(
+                "SELECT service FROM results WHERE run_id = ?", (report.run_id,))}
+            kept = {service for service, entry in entries.items() if entry.get('resumed') and service in existing}
+            rows = []
+            for service, entry in entries.items():
+                if service in kept:
+                    continue
+                phases = entry.get('phases') or {}
+                skipped = entry.get('skipped') or entry.get('resumed')
+                rows.append((report.run_id, service, entry.get('branch'), 1 if entry.get('success') else 0,
+                             1 if skipped else 0, entry.get('build_number'), entry.get('retries', 0))
+                            + tuple(phases.get(phase) for phase in HISTORY_PHASES) + (finished_at,))
+            for service in existing - kept:
+                self._conn.execute("DELETE FROM results WHERE run_id = ? AND service = ?", (report.run_id, service))
+            self._conn.executemany(
+                "INSERT INTO results (run_id, service, branch, success, skipped, build_number, retries, "
+                f"{', '.join(HISTORY_PHASES)}, finished_at) VALUES ({', '.join('?' * (8 + len(HISTORY_PHASES)))})",
+                rows,
+            )
+            services, succeeded = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(success), 0) FROM results WHERE run_id = ?", (report.run_id,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO runs (run_id, kind, started_at, finished_at, wall_time, services, succeeded) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (report.run_id, report.kind, report.started_at, finished_at, finished_at - report.started_at,
+                 services, succeeded),
+            )
+
+    def _results(self, services=None, limit=None) -> dict:
+        """
+        每个服务最近 limit 次实际部署的记录，新的在前；
+        跳过的 (分支未变化、前置服务失败) 没有构建过，不计入
+        :return: {service: [{'success', 'retries', <phase>: seconds, ...}, ...]}
+        """
+        columns = ('service', 'success', 'retries') + HISTORY_PHASES
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(columns)} FROM results WHERE skipped = 0 ORDER BY id DESC"
+            ).fetchall()
+        wanted = set(services) if services is not None else None
+        results = {}
+        for row in rows:
+            record = dict(zip(columns, row))
+            service = record.pop('service')
+            if wanted is not None and service not in wanted:
+                continue
+            records = results.setdefault(service, [])
+            if limit is None or len(records) < limit:
+                records.append(record)
+        return results
+
+    def durations(self, services=None, phase='total', pct=50, window=10, min_samples=3) -> dict:
+        """
+        按最近 window 次成功部署估计各服务的耗时(秒)，成功次数少于 min_samples 的服务不返回
+        """
+        durations = {}
+        for service, records in self._results(services, window).items():
+            values = [record[phase] for record in records if record['success'] and record[phase] is not None]
+            if len(values) >= min_samples:
+                durations[service] = round(percentile(values, pct), 2)
+        return durations
+
+    def service_stats(self, services=None, window=20) -> list:
+        """
+        各服务最近 window 次部署的统计，按 p95 总耗时从长到短排列
+        :return: [{'service', 'runs', 'failures', 'retries', 'flaky_score', <phase>_p50, <phase>_p95, ...}, ...]
+        """
+        stats = []
+        for service, records in self._results(services, window).items():
+            failures = sum(1 for record in records if not record['success'])
+            retried = sum(1 for record in records if record['success'] and record['retries'])
+            entry = {
+                'service': service,
+                'runs': len(records),
+                'failures': failures,
+                'retries': sum(record['retries'] or 0 for record in records),
+                # 失败或需要重试才成功的比例
+                'flaky_score': round((failures + retried) / len(records), 3),
+            }
+            for phase in HISTORY_PHASES:
+                values = [record[phase] for record in records if record[phase] is not None]
+                entry[f"{phase}_p50"] = percentile(values, 50)
+                entry[f"{phase}_p95"] = percentile(values, 95)
+            stats.append(entry)
+        return sorted(stats, key=lambda entry: -(entry['total_p95'] or 0))
+
+    def flakiest(self, limit=5, window=20) -> list:
+        """失败或重试比例最高的服务"""
+        stats = [entry for entry in self.service_stats(window=window) if entry['flaky_score'] > 0]
+        return sorted(stats, key=lambda entry: (-entry['flaky_score'], -entry['runs']))[:limit]
+
+    def runs(self, limit=10) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT run_id, kind, started_at, wall_time, services, succeeded FROM runs "
+                "ORDER BY started_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(zip(('run_id', 'kind', 'started_at', 'wall_time', 'services', 'succeeded'), row))
+                for row in rows]
+
+    def export(self) -> str:
+        return json.dumps({'runs': self.runs(limit=-1), 'services': self.service_stats()}, ensure_ascii=False,
+                          indent=2)
+
+    def close(self):
+        self._conn.close()
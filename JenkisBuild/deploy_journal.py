@@ -0,0 +1,107 @@
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+# 部署状态
+QUEUED = 'queued'
+TRIGGERED = 'triggered'
+RUNNING = 'running'
+SUCCESS = 'success'
+FAILED = 'failed'
+
+
+class DeployJournal:
+    """
+    把每个服务的部署状态变化写入本地 SQLite，
+    进程中断后可以根据最后状态恢复：成功的跳过，仍在构建的重新关联，其余重新触发
+    """
+
+    def __init__(self, path='JenkisBuild/deploy_journal.db'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                kind TEXT,
+                services TEXT,
+                created_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id TEXT,
+                service TEXT,
+                state TEXT,
+                branch TEXT,
+                build_number INTEGER,
+                previous_number INTEGER,
+                queue_url TEXT,
+                created_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_events_run ON events (run_id, service);
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(events)")}
+        if 'queue_url' not in columns:
+            # 旧版本创建的日志没有队列项地址
+            with self._conn:
+                self._conn.execute("ALTER TABLE events ADD COLUMN queue_url TEXT")
+
+    def start_run(self, services_branches: dict, kind: str) -> str:
+        """登记一次新的部署，返回 run_id"""
+        run_id = datetime.now().strftime('%Y%m%d-%H%M%S-%f')[:-3]
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO runs (run_id, kind, services, created_at) VALUES (?, ?, ?, ?)",
+                (run_id, kind, json.dumps(services_branches, ensure_ascii=False), time.time()),
+            )
+        return run_id
+
+    def run_services(self, run_id: str) -> dict:
+        """返回某次部署的 {service: branch}，run_id 不存在时抛出 KeyError"""
+        with self._lock:
+            row = self._conn.execute("SELECT services FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"找不到部署记录: {run_id}")
+        return json.loads(row[0])
+
+    def record(self, run_id: str, service: str, state: str, branch: str = None,
+               build_number: int = None, previous_number: int = None, queue_url: str = None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO events (run_id, service, state, branch, build_number, previous_number, queue_url, "
+                "created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, service, state, branch, build_number, previous_number, queue_url, time.time()),
+            )
+
+    def latest_states(self, run_id: str) -> dict:
+        """
+        返回每个服务的最后状态
+        :return: {service: {'state', 'build_number', 'previous_number', 'queue_url'}}，
+                 build_number/previous_number/queue_url 取该服务最近一次记录到的值
+        """
+        states = {}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT service, state, build_number, previous_number, queue_url FROM events "
+                "WHERE run_id = ? ORDER BY id",
+                (run_id,),
+            ).fetchall()
+        for service, state, build_number, previous_number, queue_url in rows:
+            entry = states.setdefault(service, {'build_number': None, 'previous_number': None, 'queue_url': None})
+            entry['state'] = state
+            if state in (QUEUED, TRIGGERED):
+                # 重新排队或重新触发后，旧的构建编号和队列项不再有效
+                entry['build_number'] = None
+                entry['queue_url'] = None
+            if queue_url is not None:
+                entry['queue_url'] = queue_url
+            if build_number is not None:
+                entry['build_number'] = build_number
+            if previous_number is not None:
+                entry['previous_number'] = previous_number
+        return states
+
+    def close(self):
+        self._conn.close()
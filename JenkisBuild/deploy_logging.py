@@ -0,0 +1,231 @@
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+from deploy_journal import QUEUED, TRIGGERED, RUNNING, SUCCESS, FAILED
+
+# 当前线程正在部署的服务，写入日志记录的 service 字段
+_context = threading.local()
+
+# 没有服务归属的日志 (调度、轮询器、汇总) 写入的文件名
+RUN_LOG = '_run'
+
+
+@contextmanager
+def service_context(service: str):
+    """在这个上下文中，当前线程输出的日志归属于 service"""
+    previous = getattr(_context, 'service', None)
+    _context.service = service
+    try:
+        yield
+    finally:
+        _context.service = previous
+
+
+class ServiceContextFilter(logging.Filter):
+    """在产生日志的线程中标记所属服务，之后由后台线程按服务分发"""
+
+    def filter(self, record):
+        if not getattr(record, 'service', None):
+            record.service = getattr(_context, 'service', None)
+        return True
+
+
+class StateRecordFilter(logging.Filter):
+    """去掉 set_state 产生的状态记录，用于不显示进度表时原来的控制台输出"""
+
+    def filter(self, record):
+        return not getattr(record, 'deploy_state', None)
+
+
+class JsonLinesHandler(logging.Handler):
+    """每个服务一个 JSON-lines 文件: <log_dir>/<service>.jsonl，文件在第一次写入时打开"""
+
+    def __init__(self, log_dir: str):
+        super().__init__()
+        self.log_dir = log_dir
+        self._files = {}
+        os.makedirs(log_dir, exist_ok=True)
+
+    def _file(self, service: str):
+        if service not in self._files:
+            name = (service or RUN_LOG).replace('/', '__')
+            self._files[service] = open(os.path.join(self.log_dir, f"{name}.jsonl"), 'a', encoding='utf-8')
+        return self._files[service]
+
+    def emit(self, record):
+        try:
+            entry = {
+                'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+                'level': record.levelname,
+                'service': record.service,
+                'thread': record.threadName,
+                'message': record.getMessage(),
+            }
+            if getattr(record, 'deploy_state', None):
+                entry['state'] = record.deploy_state
+            self._file(record.service).write(json.dumps(entry, ensure_ascii=False) + '\n')
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        for file in self._files.values():
+            file.flush()
+
+    def close(self):
+        for file in self._files.values():
+            file.close()
+        self._files = {}
+        super().close()
+
+
+class ProgressHandler(logging.Handler):
+    """
+    控制台进度表: 各服务的状态变化汇总成一张紧凑的表，按 refresh_interval 重绘；
+    警告和错误，以及不属于任何服务的日志直接输出。非终端 (重定向到文件、CI) 时每次状态变化输出一行。
+    """
+
+    def __init__(self, services, stream=None, refresh_interval=2.0, max_rows=15):
+        super().__init__()
+        self.stream = stream or sys.stderr
+        self.refresh_interval = refresh_interval
+        self.max_rows = max_rows
+        self.states = {service: (QUEUED, time.time()) for service in services}
+        self.started_at = time.time()
+        self._tty = hasattr(self.stream, 'isatty') and self.stream.isatty()
+        self._drawn_lines = 0
+        self._last_draw = 0
+        self.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+    def emit(self, record):
+        try:
+            state = getattr(record, 'deploy_state', None)
+            if state:
+                self.states[record.service] = (state, record.created)
+                if self._tty:
+                    self._draw(force=state in (SUCCESS, FAILED))
+                else:
+                    done = sum(1 for value, _ in self.states.values() if value in (SUCCESS, FAILED))
+                    self.stream.write(f"[{done}/{len(self.states)}] {record.service}: {state}\n")
+                    self.stream.flush()
+                return
+            if record.levelno >= logging.WARNING or not record.service:
+                self._clear()
+                prefix = f"[{record.service}] " if record.service else ''
+                self.stream.write(prefix + self.format(record) + '\n')
+                self._draw(force=True)
+        except Exception:
+            self.handleError(record)
+
+    def table(self) -> list:
+        counts = {}
+        for state, _ in self.states.values():
+            counts[state] = counts.get(state, 0) + 1
+        done = counts.get(SUCCESS, 0) + counts.get(FAILED, 0)
+        elapsed = time.time() - self.started_at
+        lines = [f"进度 {done}/{len(self.states)}  成功 {counts.get(SUCCESS, 0)}  失败 {counts.get(FAILED, 0)}  "
+                 f"构建中 {counts.get(RUNNING, 0) + counts.get(TRIGGERED, 0)}  排队 {counts.get(QUEUED, 0)}  "
+                 f"已用 {elapsed / 60:.1f} 分钟"]
+        active = sorted(((since, service, state) for service, (state, since) in self.states.items()
+                         if state in (TRIGGERED, RUNNING)))
+        now = time.time()
+        for since, service, state in active[:self.max_rows]:
+            lines.append(f"  {service:<40}{state:<11}{(now - since) / 60:>6.1f} 分钟")
+        if len(active) > self.max_rows:
+            lines.append(f"  ... 另有 {len(active) - self.max_rows} 个服务在构建")
+        return lines
+
+    def _clear(self):
+        if self._tty and self._drawn_lines:
+            # 光标上移到表格开头并清除到屏幕末尾
+            self.stream.write(f"\x1b[{self._drawn_lines}F\x1b[J")
+            self._drawn_lines = 0
+
+    def _draw(self, force=False):
+        if not self._tty or (not force and time.time() - self._last_draw < self.refresh_interval):
+            return
+        self._clear()
+        lines = self.table()
+        self.stream.write('\n'.join(lines) + '\n')
+        self.stream.flush()
+        self._drawn_lines = len(lines)
+        self._last_draw = time.time()
+
+    def close(self):
+        self._clear()
+        self.stream.write('\n'.join(self.table()) + '\n')
+        self.stream.flush()
+        super().close()
+
+
+class DeployLogPipeline:
+    """
+    并发部署期间的日志管道: 根日志器只保留一个 QueueHandler，worker 线程只把日志记录放入无界队列，
+    写文件和控制台输出都由后台 QueueListener 线程完成，不会阻塞部署。
+    每个服务的日志写入各自的 JSON-lines 文件，控制台显示进度表 (progress 为 False 时沿用原来的控制台输出)。
+    """
+
+    def __init__(self, log_dir: str, services, progress=True, refresh_interval=2.0):
+        self.log_dir = log_dir
+        self.services = list(services)
+        self.progress = progress
+        self.refresh_interval = refresh_interval
+        self.queue = queue.SimpleQueue()
+        self._listener = None
+        self._saved_handlers = None
+        self._handlers = []
+        self._state_filter = StateRecordFilter()
+
+    def start(self):
+        root = logging.getLogger()
+        self._saved_handlers = root.handlers[:]
+        self._handlers = [JsonLinesHandler(self.log_dir)]
+        if self.progress:
+            self._handlers.append(ProgressHandler(self.services, refresh_interval=self.refresh_interval))
+        else:
+            # 状态记录只写入 JSON 文件和进度表，原来的控制台格式中没有服务名，也不受日志级别限制
+            for handler in self._saved_handlers:
+                handler.addFilter(self._state_filter)
+            self._handlers += self._saved_handlers
+        queue_handler = QueueHandler(self.queue)
+        queue_handler.addFilter(ServiceContextFilter())
+        root.handlers = [queue_handler]
+        self._listener = QueueListener(self.queue, *self._handlers, respect_handler_level=True)
+        self._listener.start()
+        return self
+
+    def set_state(self, service: str, state: str):
+        """记录服务的状态变化，直接放入队列，不受日志级别影响"""
+        record = logging.makeLogRecord({
+            'name': 'deploy.progress', 'levelno': logging.INFO, 'levelname': 'INFO',
+            'msg': f"状态: {state}", 'service': service, 'deploy_state': state,
+            'threadName': threading.current_thread().name,
+        })
+        self.queue.put_nowait(record)
+
+    def stop(self):
+        """处理完队列中剩余的日志后恢复原来的控制台输出"""
+        if self._listener is None:
+            return
+        self._listener.stop()
+        self._listener = None
+        logging.getLogger().handlers = self._saved_handlers
+        for handler in self._handlers:
+            if handler in self._saved_handlers:
+                handler.removeFilter(self._state_filter)
+            else:
+                handler.close()
+        self._handlers = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
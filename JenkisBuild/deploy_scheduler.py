@@ -0,0 +1,164 @@
+import heapq
+import json
+import os
+
+# 没有任何耗时数据时假定的构建耗时(秒)
+DEFAULT_BUILD_DURATION = 600
+
+
+class DeployDag:
+    """
+    按 depends_on 配置把一次部署组织成 DAG。
+    某个服务的前置服务全部部署成功后即可开始，不必等待同一层的其它服务。
+    不在本次部署中的依赖视为已满足。
+    """
+
+    def __init__(self, services, depends_on: dict = None):
+        """
+        :param services: 本次要部署的服务名集合
+        :param depends_on: {service: [prerequisite, ...]}
+        """
+        services = list(services)
+        depends_on = depends_on or {}
+        self.services = services
+        self.deps = {
+            service: [dep for dep in (depends_on.get(service) or []) if dep in services and dep != service]
+            for service in services
+        }
+        self.started = set()
+        self._check_cycles()
+
+    def _check_cycles(self):
+        visiting, visited = set(), set()
+
+        def visit(service, path):
+            if service in visited:
+                return
+            if service in visiting:
+                cycle = path[path.index(service):] + [service]
+                raise ValueError(f"depends_on 中存在循环依赖: {' -> '.join(cycle)}")
+            visiting.add(service)
+            for dep in self.deps[service]:
+                visit(dep, path + [service])
+            visiting.discard(service)
+            visited.add(service)
+
+        for service in self.services:
+            visit(service, [])
+
+    def levels(self) -> list:
+        """按依赖深度分层，同一层的服务可以并行部署"""
+        depth = {}
+
+        def level_of(service):
+            if service not in depth:
+                depth[service] = 1 + max((level_of(dep) for dep in self.deps[service]), default=-1)
+            return depth[service]
+
+        levels = []
+        for service in self.services:
+            level = level_of(service)
+            while len(levels) <= level:
+                levels.append([])
+            levels[level].append(service)
+        return levels
+
+    def next_ready(self, results: dict) -> list:
+        """返回前置服务均已成功、且尚未开始的服务，并将其标记为已开始"""
+        ready = [
+            service for service in self.services
+            if service not in self.started and all(results.get(dep) is True for dep in self.deps[service])
+        ]
+        self.started.update(ready)
+        return ready
+
+    def blocked(self, results: dict) -> list:
+        """返回因前置服务失败而无法部署的服务，并在 results 中将其记为失败"""
+        blocked = []
+        changed = True
+        while changed:
+            changed = False
+            for service in self.services:
+                if service in self.started:
+                    continue
+                if any(results.get(dep) is False for dep in self.deps[service]):
+                    self.started.add(service)
+                    results[service] = False
+                    blocked.append(service)
+                    changed = True
+        return blocked
+
+
+def longest_first(services, durations: dict) -> list:
+    """按预计耗时从长到短排序 (LPT)"""
+    return sorted(services, key=lambda service: durations.get(service, DEFAULT_BUILD_DURATION), reverse=True)
+
+
+def simulate_schedule(services, durations: dict, workers: int, depends_on: dict = None):
+    """
+    按与 deploy_concurrent 相同的规则(依赖就绪 + 最长优先)模拟一次部署
+    :return: (预计总耗时秒数, [(service, start, end), ...])
+    """
+    dag = DeployDag(services, depends_on)
+    results = {}
+    running = []  # (end, service)
+    queue = longest_first(dag.next_ready(results), durations)
+    plan = []
+    now = 0
+    while queue or running:
+        while queue and len(running) < max(workers, 1):
+            service = queue.pop(0)
+            end = now + durations.get(service, DEFAULT_BUILD_DURATION)
+            heapq.heappush(running, (end, service))
+            plan.append((service, now, end))
+        now, service = heapq.heappop(running)
+        results[service] = True
+        queue = longest_first(queue + dag.next_ready(results), durations)
+    return now, plan
+
+
+def critical_path(services, durations: dict, depends_on: dict = None):
+    """
+    依赖链上耗时之和最长的一条路径，即不受并发数限制时部署所需的最短时间
+    :return: (总耗时秒数, [service, ...] 按部署顺序)
+    """
+    dag = DeployDag(services, depends_on)
+    finish = {}
+
+    def finish_of(service):
+        if service not in finish:
+            before = max((finish_of(dep) for dep in dag.deps[service]), key=lambda item: item[0], default=(0, []))
+            finish[service] = (before[0] + durations.get(service, DEFAULT_BUILD_DURATION), before[1] + [service])
+        return finish[service]
+
+    return max((finish_of(service) for service in dag.services), key=lambda item: item[0], default=(0, []))
+
+
+class BuildDurationStore:
+    """记录每个服务最近一次成功构建的耗时，供没有 Jenkins 预估时使用"""
+
+    def __init__(self, path='JenkisBuild/build_durations.json'):
+        self.path = path
+        self.durations = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.durations = json.load(f)
+            except (OSError, ValueError):
+                self.durations = {}
+
+    def record(self, service: str, seconds: float):
+        self.durations[service] = round(seconds, 2)
+
+    def save(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.durations, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def format_plan(total: float, plan: list, workers: int) -> str:
+    """把模拟结果格式化为便于阅读的文本"""
+    lines = [f"部署计划 (workers={workers}, 最长优先):"]
+    for service, start, end in sorted(plan, key=lambda item: (item[1], -item[2])):
+        lines.append(f"  {start / 60:7.1f} - {end / 60:7.1f} 分钟  {service}")
+    lines.append(f"预计总耗时: {total / 60:.1f} 分钟 ({round(total)} 秒)")
+    return "\n".join(lines)
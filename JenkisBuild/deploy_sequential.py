@@ -9,7 +9,8 @@ def main():
     deployer = JenkinsDeployer(
         max_workers=default_config.get('max_workers', 3),
         build_timeout=default_config.get('build_timeout', 1800),
-        headless=default_config.get('headless', True)
+        headless=default_config.get('headless', True),
+        backend=default_config.get('backend', 'selenium')
     )
     
     try:
@@ -0,0 +1,103 @@
+import logging
+import threading
+from contextlib import contextmanager
+
+
+class DriverPool:
+    """
+    可复用的浏览器池：浏览器在第一次需要时才启动，最多同时存在 size 个。
+    各 worker 线程在自己的线程里启动浏览器，因此多个浏览器是并行启动的。
+    崩溃或失去响应的浏览器会被关闭，下次借用时重新启动。
+    """
+
+    def __init__(self, factory, size: int, logger=None):
+        """
+        :param factory: 无参可调用对象，返回一个新的 webdriver
+        :param size: 浏览器数量上限，一般等于 max_workers
+        """
+        self.factory = factory
+        self.size = max(size, 1)
+        self.logger = logger or logging.getLogger(__name__)
+        self.started_count = 0  # 累计启动的浏览器数量
+        self._idle = []
+        self._alive = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _healthy(self, driver) -> bool:
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            self.logger.warning(f"关闭driver时发生错误: {str(e)}")
+        with self._cond:
+            self._alive -= 1
+            self._cond.notify()
+
+    def acquire(self):
+        """借用一个浏览器，没有空闲且已达上限时等待其它任务归还"""
+        while True:
+            with self._cond:
+                while not self._idle and self._alive >= self.size and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    raise RuntimeError("浏览器池已关闭")
+                driver = self._idle.pop() if self._idle else None
+                if driver is None:
+                    self._alive += 1
+
+            if driver is None:
+                try:
+                    driver = self.factory()
+                except Exception:
+                    with self._cond:
+                        self._alive -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self.started_count += 1
+                return driver
+
+            if self._healthy(driver):
+                return driver
+            self.logger.warning("检测到浏览器已失去响应，重新启动")
+            self._discard(driver)
+
+    def release(self, driver, check=False):
+        """归还浏览器，check 为 True 时先做健康检查，不健康的直接关闭"""
+        if driver is None:
+            return
+        if self._closed or (check and not self._healthy(driver)):
+            self._discard(driver)
+            return
+        with self._cond:
+            self._idle.append(driver)
+            self._cond.notify()
+
+    @contextmanager
+    def driver(self):
+        """with pool.driver() as driver: ...，出错时归还前做健康检查"""
+        driver = self.acquire()
+        failed = False
+        try:
+            yield driver
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.release(driver, check=failed)
+
+    def close(self):
+        """关闭所有空闲浏览器，之后归还的浏览器也会直接关闭"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for driver in idle:
+            self._discard(driver)
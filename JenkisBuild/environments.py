@@ -0,0 +1,87 @@
+# 多环境部署时服务的键: <环境>/<服务>
+TARGET_SEP = '/'
+
+# 未指定环境时使用的 Jenkins 目录
+DEFAULT_FOLDER = 'job/PP'
+
+# 不在所属目录中的任务
+DEFAULT_JOB_PATHS = {
+    'it-dependency': 'job/Prod/job/prod-lt-dependency',
+}
+
+
+class EnvironmentSet:
+    """
+    把同一份部署计划展开到多个环境 (Jenkins 目录)。
+    展开后的键为 <环境>/<服务>，各环境可以覆盖部分服务的分支，并有各自的并发上限；
+    depends_on 只在同一环境内生效。没有环境前缀的键按原来的方式部署到 PP。
+    """
+
+    def __init__(self, environments: dict = None):
+        """
+        :param environments: {环境名: {folder, job_paths, branches, max_workers}}
+        """
+        self.environments = environments or {}
+
+    @staticmethod
+    def split(target: str):
+        """返回 (环境名, 服务名)，没有环境前缀时环境名为 None"""
+        env, sep, service = target.partition(TARGET_SEP)
+        return (env, service) if sep else (None, target)
+
+    def names(self) -> list:
+        return list(self.environments)
+
+    def settings(self, env: str) -> dict:
+        if env not in self.environments:
+            raise ValueError(f"未配置的环境: {env}，可选: {', '.join(self.environments) or '无'}")
+        return self.environments[env] or {}
+
+    def job_path(self, target: str) -> str:
+        """返回服务在所属环境中的Jenkins任务路径"""
+        env, service = self.split(target)
+        settings = self.settings(env) if env else {}
+        job_paths = settings.get('job_paths') if env else DEFAULT_JOB_PATHS
+        if job_paths and service in job_paths:
+            return job_paths[service].strip('/')
+        folder = settings.get('folder', DEFAULT_FOLDER).strip('/')
+        return f"{folder}/job/{service}"
+
+    def expand(self, plan: dict, envs: list) -> dict:
+        """
+        把 {服务: 分支} 展开为 {<环境>/<服务>: 分支}，环境的 branches 覆盖计划中的分支。
+        多个环境指向同一个任务 (例如 it-dependency) 时只部署一次，归第一个环境
+        """
+        targets = {}
+        job_paths = set()
+        for env in envs:
+            overrides = self.settings(env).get('branches') or {}
+            for service, branch in plan.items():
+                target = f"{env}{TARGET_SEP}{service}"
+                job_path = self.job_path(target)
+                if job_path in job_paths:
+                    continue
+                job_paths.add(job_path)
+                targets[target] = overrides.get(service, branch)
+        return targets
+
+    def depends_on(self, depends_on: dict, targets) -> dict:
+        """
+        把服务间的依赖映射到展开后的键，前置服务取同一环境中的；
+        前置任务与其它环境共用时，依赖实际部署它的那个键
+        """
+        targets = list(targets)
+        owners = {}
+        for target in targets:
+            owners.setdefault(self.job_path(target), target)
+        expanded = {}
+        for target in targets:
+            env, service = self.split(target)
+            deps = [f"{env}{TARGET_SEP}{dep}" if env else dep for dep in depends_on.get(service) or []]
+            expanded[target] = [owners.get(self.job_path(dep), dep) for dep in deps]
+        return expanded
+
+    def limit(self, target: str):
+        """服务所属环境同时进行中的部署数上限，未配置时返回 None"""
+        env, _ = self.split(target)
+        return self.settings(env).get('max_workers') if env else None
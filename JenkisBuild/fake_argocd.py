@@ -0,0 +1,217 @@
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+
+def _rfc3339(timestamp: float) -> str:
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp)) if timestamp else None
+
+
+class FakeArgoCD:
+    """
+    本地 ArgoCD 替身，实现健康检查用到的 GET api/v1/applications/<应用名>。
+    应用一开始处于上一次发布留下的 Synced / Healthy (同步操作在一小时前结束)，refresh 参数不会改变状态，
+    所以构建刚结束时读到的是过期的健康状态。发布由 deploy(app) 或 POST /_jenkins 开始，
+    后者接收 Jenkins Notification 插件格式的回调 (可作为 FakeJenkins 的 notify_url)，构建 SUCCESS 时发布对应应用:
+    sync_lag 秒内状态不变，之后 OutOfSync / Progressing 持续 sync_delay 秒，同步结束后 Synced / Progressing
+    持续 health_delay 秒，最后 Synced / Healthy；按 failure_rate 随机以同步操作 Failed 和 Degraded 结束。
+    missing 中的应用返回 404。
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, sync_lag=(0.2, 0.5), sync_delay=(0.5, 1.0),
+                 health_delay=(0.5, 1.0), failure_rate=0.0, missing=(), token=None,
+                 app_prefix='preprod-', app_suffix='--qcore-preprod', seed=None):
+        """
+        :param sync_lag: (最短, 最长) 构建结束到 ArgoCD 开始同步的延迟(秒)
+        :param sync_delay: (最短, 最长) 同步耗时(秒)
+        :param health_delay: (最短, 最长) 同步后到健康的耗时(秒)
+        :param token: 设置时要求 Authorization: Bearer <token>
+        :param app_prefix: 收到构建通知时，任务名去掉 pp- 前缀后加上前后缀得到应用名
+        """
+        self.host = host
+        self.port = port
+        self.sync_lag = sync_lag
+        self.sync_delay = sync_delay
+        self.health_delay = health_delay
+        self.failure_rate = failure_rate
+        self.missing = set(missing)
+        self.token = token
+        self.app_prefix = app_prefix
+        self.app_suffix = app_suffix
+        self.random = random.Random(seed)
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self.reset()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def reset(self):
+        with self._lock:
+            self.rollouts = {}  # 应用名 -> {'sync_at', 'synced_at', 'healthy_at', 'fails'}
+            self.requests = Counter()
+            self.connections = set()  # 客户端 (地址, 端口)，用于确认连接被复用
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'requests': dict(self.requests), 'connections': len(self.connections),
+                    'rollouts': len(self.rollouts)}
+
+    def app_name(self, job_name: str) -> str:
+        name = job_name[len('pp-'):] if job_name.startswith('pp-') else job_name
+        return f"{self.app_prefix}{name}{self.app_suffix}"
+
+    def deploy(self, app: str):
+        """开始发布应用，sync_lag 秒后 ArgoCD 才开始同步"""
+        with self._lock:
+            sync_at = time.time() + self.random.uniform(*self.sync_lag)
+            synced_at = sync_at + self.random.uniform(*self.sync_delay)
+            self.rollouts[app] = {
+                'sync_at': sync_at,
+                'synced_at': synced_at,
+                'healthy_at': synced_at + self.random.uniform(*self.health_delay),
+                'fails': self.random.random() < self.failure_rate,
+            }
+
+    def app_json(self, app: str) -> dict:
+        now = time.time()
+        # 上一次发布: 一小时前同步完成
+        previous = self.started_at - 3600
+        sync, health = 'Synced', 'Healthy'
+        operation = {'phase': 'Succeeded', 'startedAt': _rfc3339(previous - 30), 'finishedAt': _rfc3339(previous)}
+        rollout = self.rollouts.get(app)
+        if rollout and now >= rollout['sync_at']:
+            if now < rollout['synced_at']:
+                sync, health = 'OutOfSync', 'Progressing'
+                operation = {'phase': 'Running', 'startedAt': _rfc3339(rollout['sync_at']), 'finishedAt': None}
+            else:
+                operation = {'phase': 'Failed' if rollout['fails'] else 'Succeeded',
+                             'startedAt': _rfc3339(rollout['sync_at']), 'finishedAt': _rfc3339(rollout['synced_at'])}
+                if rollout['fails']:
+                    sync, health = 'OutOfSync', 'Degraded'
+                elif now < rollout['healthy_at']:
+                    health = 'Progressing'
+        return {
+            'metadata': {'name': app, 'namespace': 'argocd'},
+            'status': {
+                'sync': {'status': sync},
+                'health': {'status': health},
+                'operationState': operation,
+                'reconciledAt': _rfc3339(now),
+            },
+        }
+
+    # ---- HTTP ----
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, data):
+                body = json.dumps(data).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                fake.handle(self)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                fake.handle_notification(payload)
+                self._send(200, {})
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-argocd', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def handle_notification(self, payload: dict):
+        """Jenkins Notification 插件格式的回调，构建成功时发布对应的应用"""
+        build = payload.get('build') or {}
+        if build.get('phase') == 'COMPLETED' and build.get('status') == 'SUCCESS':
+            self.deploy(self.app_name(payload.get('name') or ''))
+
+    def handle(self, handler):
+        split = urlsplit(handler.path)
+        query = parse_qs(split.query)
+        segments = [unquote(segment) for segment in split.path.split('/') if segment]
+        if segments[:1] == ['_stats']:
+            handler._send(200, self.stats())
+            return
+        if self.token and handler.headers.get('Authorization') != f"Bearer {self.token}":
+            handler._send(401, {'error': 'no session information', 'code': 16})
+            return
+        if segments[:3] != ['api', 'v1', 'applications'] or len(segments) != 4:
+            handler._send(404, {'error': 'not found', 'code': 5})
+            return
+        app = segments[3]
+        with self._lock:
+            self.requests['refresh' if query.get('refresh') else 'get'] += 1
+            self.connections.add(handler.client_address)
+            if app in self.missing:
+                handler._send(404, {'error': f'applications.argoproj.io "{app}" not found', 'code': 5})
+                return
+            data = self.app_json(app)
+        handler._send(200, data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动本地 ArgoCD 替身")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--sync-lag", type=float, nargs=2, default=(0.2, 0.5), metavar=("MIN", "MAX"),
+                        help="构建结束到开始同步的延迟范围(秒)")
+    parser.add_argument("--sync-delay", type=float, nargs=2, default=(0.5, 1.0), metavar=("MIN", "MAX"),
+                        help="同步耗时范围(秒)")
+    parser.add_argument("--health-delay", type=float, nargs=2, default=(0.5, 1.0), metavar=("MIN", "MAX"),
+                        help="同步后到健康的耗时范围(秒)")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--missing", nargs='*', default=[], help="返回 404 的应用名")
+    args = parser.parse_args()
+
+    fake = FakeArgoCD(port=args.port, sync_lag=tuple(args.sync_lag), sync_delay=tuple(args.sync_delay),
+                      health_delay=tuple(args.health_delay), failure_rate=args.failure_rate, missing=args.missing)
+    fake.start()
+    print(f"Fake ArgoCD 运行中: {fake.url}  (构建通知地址 {fake.url}/_jenkins，Ctrl-C 退出)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
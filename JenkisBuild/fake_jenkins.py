@@ -0,0 +1,423 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import urllib.request
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# 构建页面，结构与 _fill_branch_and_build 使用的 XPath 一致，供浏览器后端使用
+BUILD_PAGE = """<html><head data-crumb-header="Jenkins-Crumb" data-crumb-value="fake"><title>Build</title>
+<link rel="stylesheet" href="/static/fake/css/style.css">
+<link rel="stylesheet" href="/static/fake/css/responsive-grid.css">
+<link rel="preload" href="/static/fake/fonts/roboto.woff2" as="font" type="font/woff2" crossorigin>
+<script src="/static/fake/scripts/behavior.js"></script>
+</head>
+<body>
+<img src="/static/fake/images/title.png"><img src="/static/fake/images/logo.svg"><img src="/static/fake/images/build.gif">
+<div id="main-panel"><form method="post" action="build?delay=0sec"><div><div>
+<div></div><div></div><div><div><input type="hidden" name="name" value="BRANCH"><input type="text" name="value"></div></div>
+</div></div></form></div>
+<div id="bottom-sticker"><div><button type="button" onclick="document.forms[0].submit()">Build</button></div></div>
+</body></html>"""
+
+# 构建页面引用的静态资源类型
+ASSET_TYPES = {
+    '.css': 'text/css', '.js': 'application/javascript', '.png': 'image/png', '.gif': 'image/gif',
+    '.svg': 'image/svg+xml', '.woff2': 'font/woff2',
+}
+
+PAGE = """<html><head data-crumb-header="Jenkins-Crumb" data-crumb-value="fake"><title>Jenkins</title></head>
+<body><div id="main-panel">fake jenkins</div></body></html>"""
+
+# 控制台每隔多少秒输出一行
+CONSOLE_LINE_INTERVAL = 0.1
+
+
+class FakeJenkins:
+    """
+    本地 Jenkins 替身，实现部署用到的接口:
+    buildWithParameters / 构建页面表单、队列项、任务与目录的 api/json、构建 api/json、
+    logText/progressiveText、stop、computer 与 queue 状态。
+    构建耗时在 build_duration 范围内随机，按 failure_rate 随机失败，失败的构建在中途输出 [ERROR] BUILD FAILURE。
+    设置 notify_url 时会像 Notification 插件一样推送 STARTED / COMPLETED 回调。
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, build_duration=(1.0, 3.0), failure_rate=0.0,
+                 queue_delay=0.2, executors=0, notify_url=None, seed=None, asset_delay=0.0):
+        """
+        :param build_duration: (最短, 最长) 构建耗时(秒)
+        :param executors: 执行器数量，0 表示不限制
+        :param asset_delay: 构建页面每个静态资源(样式表、图片、字体、脚本)的响应延迟(秒)
+        """
+        self.host = host
+        self.port = port
+        self.build_duration = build_duration
+        self.failure_rate = failure_rate
+        self.queue_delay = queue_delay
+        self.executors = executors
+        self.notify_url = notify_url
+        self.asset_delay = asset_delay
+        self.random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._server = None
+        self._threads = []
+        self._stopped = threading.Event()
+        self.reset()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def reset(self):
+        with self._lock:
+            self.jobs = {}  # job_path -> {'builds': [build, ...] 新的在前, 'next_number'}
+            self.queue = {}  # id -> queue item
+            self.next_queue_id = 1
+            self.requests = Counter()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'requests': sum(self.requests.values()), 'by_endpoint': dict(self.requests)}
+
+    # ---- 模拟 ----
+
+    def _job(self, job_path: str) -> dict:
+        return self.jobs.setdefault(job_path, {'builds': [], 'next_number': 1})
+
+    def _is_folder(self, path: str) -> bool:
+        return any(job_path.startswith(f"{path}/job/") for job_path in self.jobs)
+
+    def enqueue(self, job_path: str, params: dict) -> int:
+        with self._lock:
+            self._job(job_path)
+            queue_id = self.next_queue_id
+            self.next_queue_id += 1
+            self.queue[queue_id] = {'id': queue_id, 'job': job_path, 'params': params,
+                                    'created': time.time(), 'cancelled': False, 'build': None}
+            return queue_id
+
+    def _running_count(self) -> int:
+        now = time.time()
+        return sum(1 for job in self.jobs.values() for build in job['builds'] if self._building(build, now))
+
+    def _tick(self):
+        """把等待足够久的队列项分配给空闲执行器"""
+        now = time.time()
+        events = []
+        with self._lock:
+            running = self._running_count()
+            for item in sorted(self.queue.values(), key=lambda item: item['id']):
+                if item['build'] or item['cancelled'] or now - item['created'] < self.queue_delay:
+                    continue
+                if self.executors and running >= self.executors:
+                    break
+                job = self._job(item['job'])
+                build = {
+                    'number': job['next_number'],
+                    'job': item['job'],
+                    'start': now,
+                    'duration': self.random.uniform(*self.build_duration),
+                    'fail': self.random.random() < self.failure_rate,
+                    'aborted': False,
+                    'notified': set(),
+                    'params': item['params'],
+                }
+                job['next_number'] += 1
+                job['builds'].insert(0, build)
+                item['build'] = build
+                running += 1
+            if self.notify_url:
+                for job in self.jobs.values():
+                    for build in job['builds']:
+                        if 'STARTED' not in build['notified']:
+                            build['notified'].add('STARTED')
+                            events.append((build, 'STARTED'))
+                        if not self._building(build, now) and 'COMPLETED' not in build['notified']:
+                            build['notified'].add('COMPLETED')
+                            events.append((build, 'COMPLETED'))
+        for build, phase in events:
+            self._notify(build, phase)
+
+    @staticmethod
+    def _building(build: dict, now: float) -> bool:
+        return not build['aborted'] and now < build['start'] + build['duration']
+
+    def _result(self, build: dict, now: float):
+        if self._building(build, now):
+            return None
+        if build['aborted']:
+            return 'ABORTED'
+        return 'FAILURE' if build['fail'] else 'SUCCESS'
+
+    def _estimated_ms(self, job: dict) -> int:
+        finished = [build for build in job['builds'] if not self._building(build, time.time())]
+        if finished:
+            return int(finished[0]['duration'] * 1000)
+        return int(sum(self.build_duration) / 2 * 1000)
+
+    def build_json(self, build: dict) -> dict:
+        now = time.time()
+        building = self._building(build, now)
+        return {
+            'number': build['number'],
+            'building': building,
+            'result': self._result(build, now),
+            'timestamp': int(build['start'] * 1000),
+            'duration': 0 if building else int(build['duration'] * 1000),
+            'estimatedDuration': self._estimated_ms(self.jobs[build['job']]),
+            'actions': [],
+        }
+
+    def job_json(self, job_path: str) -> dict:
+        job = self._job(job_path)
+        now = time.time()
+        builds = [self.build_json(build) for build in job['builds'][:10]]
+        successful = [build for build in job['builds'] if self._result(build, now) == 'SUCCESS']
+        queued = [item for item in self.queue.values()
+                  if item['job'] == job_path and not item['build'] and not item['cancelled']]
+        return {
+            'name': job_path.rsplit('/job/', 1)[-1],
+            'lastBuild': builds[0] if builds else None,
+            'lastSuccessfulBuild': self.build_json(successful[0]) if successful else None,
+            'builds': builds,
+            'inQueue': bool(queued),
+            'queueItem': {'id': queued[0]['id'], 'url': f"queue/item/{queued[0]['id']}/"} if queued else None,
+        }
+
+    def console_text(self, build: dict) -> str:
+        elapsed = (build['duration'] if not self._building(build, time.time())
+                   else time.time() - build['start'])
+        lines = [f"Started by user benchmark, BRANCH={build['params'].get('BRANCH', '')}"]
+        total = int(build['duration'] / CONSOLE_LINE_INTERVAL)
+        for i in range(min(int(elapsed / CONSOLE_LINE_INTERVAL), total)):
+            if build['fail'] and i == total // 2:
+                lines.append("[ERROR] BUILD FAILURE")
+            else:
+                lines.append(f"[INFO] step {i}")
+        if not self._building(build, time.time()):
+            lines.append(f"Finished: {self._result(build, time.time())}")
+        return '\n'.join(lines) + '\n'
+
+    def _find_build(self, job_path: str, number: str):
+        job = self._job(job_path)
+        builds = job['builds']
+        if number == 'lastBuild':
+            return builds[0] if builds else None
+        if number == 'lastSuccessfulBuild':
+            now = time.time()
+            return next((build for build in builds if self._result(build, now) == 'SUCCESS'), None)
+        return next((build for build in builds if str(build['number']) == number), None)
+
+    def _notify(self, build: dict, phase: str):
+        payload = {
+            'name': build['job'].rsplit('/job/', 1)[-1],
+            'url': f"{build['job']}/",
+            'build': {'number': build['number'], 'phase': phase,
+                      'status': self._result(build, time.time()) if phase == 'COMPLETED' else None},
+        }
+        request = urllib.request.Request(self.notify_url, data=json.dumps(payload).encode(),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        try:
+            urllib.request.urlopen(request, timeout=5).close()
+        except OSError:
+            pass
+
+    # ---- HTTP ----
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body=b'', content_type='application/json', headers=None):
+                if isinstance(body, str):
+                    body = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, data):
+                self._send(200, json.dumps(data))
+
+            def do_GET(self):
+                fake.handle(self, 'GET')
+
+            def do_POST(self):
+                fake.handle(self, 'POST')
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._stopped.clear()
+        self._threads = [
+            threading.Thread(target=self._server.serve_forever, name='fake-jenkins', daemon=True),
+            threading.Thread(target=self._ticker, name='fake-jenkins-tick', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _ticker(self):
+        while not self._stopped.wait(0.05):
+            self._tick()
+
+    def stop(self):
+        self._stopped.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def handle(self, handler, method: str):
+        split = urlsplit(handler.path)
+        query = parse_qs(split.query)
+        segments = [segment for segment in split.path.split('/') if segment]
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = handler.rfile.read(length) if length else b''
+
+        if segments[:1] == ['_stats']:
+            handler._json(self.stats())
+            return
+        if segments[:1] == ['_reset']:
+            self.reset()
+            handler._json({})
+            return
+        if segments[:1] == ['static']:
+            # 模拟真实 Jenkins 页面上较慢的静态资源，不占用锁
+            with self._lock:
+                self.requests[f"{method} static"] += 1
+            time.sleep(self.asset_delay)
+            content_type = ASSET_TYPES.get(os.path.splitext(split.path)[1], 'application/octet-stream')
+            handler._send(200, b'' if content_type != 'application/javascript' else b'void 0;', content_type)
+            return
+
+        # 取出 job/<name>/job/<name> 前缀
+        job_parts = []
+        while len(segments) >= 2 and segments[0] == 'job':
+            job_parts += segments[:2]
+            segments = segments[2:]
+        job_path = '/'.join(job_parts)
+        rest = segments
+        endpoint = self._endpoint_name(job_path, rest)
+        with self._lock:
+            self.requests[f"{method} {endpoint}"] += 1
+        self._tick()
+
+        with self._lock:
+            if rest == ['crumbIssuer', 'api', 'json']:
+                handler._send(404, '{}')
+            elif rest == ['computer', 'api', 'json']:
+                total = self.executors or 1000
+                handler._json({'busyExecutors': self._running_count(), 'totalExecutors': total})
+            elif rest == ['queue', 'api', 'json']:
+                items = [{'id': item['id']} for item in self.queue.values()
+                         if not item['build'] and not item['cancelled']]
+                handler._json({'items': items})
+            elif rest[:2] == ['queue', 'item'] and len(rest) >= 3:
+                item = self.queue.get(int(rest[2]))
+                if not item:
+                    handler._send(404, '{}')
+                else:
+                    executable = {'number': item['build']['number']} if item['build'] else None
+                    handler._json({'id': item['id'], 'cancelled': item['cancelled'], 'why': None,
+                                   'executable': executable})
+            elif job_path and rest == ['buildWithParameters'] and method == 'POST':
+                params = {key: values[-1] for key, values in query.items()}
+                queue_id = self.enqueue(job_path, params)
+                handler._send(201, '', headers={'Location': f"{self.url}/queue/item/{queue_id}/"})
+            elif job_path and rest == ['build'] and method == 'POST':
+                form = parse_qs(body.decode('utf-8'))
+                params = dict(zip(form.get('name', []), form.get('value', [])))
+                queue_id = self.enqueue(job_path, params)
+                handler._send(302, '', headers={'Location': f"/{job_path}/",
+                                                'X-Queue-Item': f"{self.url}/queue/item/{queue_id}/"})
+            elif job_path and rest == ['build']:
+                handler._send(200, BUILD_PAGE, 'text/html')
+            elif job_path and rest == ['api', 'json']:
+                if self._is_folder(job_path):
+                    jobs = [self.job_json(path) for path in sorted(self.jobs)
+                            if path.startswith(f"{job_path}/job/") and '/job/' not in path[len(job_path) + 5:]]
+                    handler._json({'jobs': jobs})
+                else:
+                    handler._json(self.job_json(job_path))
+            elif job_path and len(rest) >= 1 and rest[1:] in (['api', 'json'], ['logText', 'progressiveText'], ['stop']):
+                build = self._find_build(job_path, rest[0])
+                if build is None:
+                    handler._send(404, '{}')
+                elif rest[1:] == ['api', 'json']:
+                    handler._json(self.build_json(build))
+                elif rest[1:] == ['stop']:
+                    if self._building(build, time.time()):
+                        build['aborted'] = True
+                        build['duration'] = time.time() - build['start']
+                    handler._send(200, '')
+                else:
+                    text = self.console_text(build)
+                    start = int((query.get('start') or ['0'])[0])
+                    more = 'true' if self._building(build, time.time()) else 'false'
+                    handler._send(200, text[start:], 'text/plain',
+                                  headers={'X-Text-Size': str(len(text)), 'X-More-Data': more})
+            elif method == 'GET':
+                handler._send(200, PAGE, 'text/html')
+            else:
+                handler._send(404, '{}')
+
+    @staticmethod
+    def _endpoint_name(job_path: str, rest: list) -> str:
+        """请求计数用的接口名，构建编号和队列编号归为一类"""
+        if rest[:2] == ['queue', 'item']:
+            return 'queue/item'
+        if job_path and rest and rest[0].isdigit():
+            return 'job/<build>/' + '/'.join(rest[1:])
+        if job_path:
+            return 'job/' + '/'.join(rest)
+        return '/'.join(rest) or '/'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动本地 Jenkins 替身")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--duration", type=float, nargs=2, default=(1.0, 3.0), metavar=("MIN", "MAX"),
+                        help="构建耗时范围(秒)")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--queue-delay", type=float, default=0.2)
+    parser.add_argument("--executors", type=int, default=0, help="执行器数量，0 表示不限制")
+    parser.add_argument("--notify-url", help="构建开始/结束时推送通知的地址")
+    parser.add_argument("--asset-delay", type=float, default=0.0, help="构建页面静态资源的响应延迟(秒)")
+    args = parser.parse_args()
+
+    fake = FakeJenkins(port=args.port, build_duration=tuple(args.duration), failure_rate=args.failure_rate,
+                       queue_delay=args.queue_delay, executors=args.executors, notify_url=args.notify_url,
+                       asset_delay=args.asset_delay)
+    fake.start()
+    print(f"Fake Jenkins 运行中: {fake.url}  (Ctrl-C 退出)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import logging
+import os
+import threading
+
+# 快速页面模式下拦截的资源，DevTools Network.setBlockedURLs 的通配格式
+DEFAULT_BLOCKED_URLS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.svg', '*.ico', '*.webp',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.css', '*.css?*',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+]
+
+# 浏览器内容设置: 2 表示禁止，图片在请求发出之前就被拦下
+BLOCK_CONTENT_PREFS = {
+    'profile.managed_default_content_settings.images': 2,
+}
+
+
+def apply_fast_options(options, profile_dir=None):
+    """
+    快速页面模式的启动参数: eager 加载策略 (DOM 就绪即返回，不等图片和样式表)、禁止图片，
+    指定 profile_dir 时使用持久化的浏览器配置目录，保留登录状态和脚本缓存
+    """
+    options.page_load_strategy = 'eager'
+    options.add_experimental_option('prefs', dict(BLOCK_CONTENT_PREFS))
+    if profile_dir:
+        options.add_argument(f'--user-data-dir={os.path.abspath(profile_dir)}')
+    return options
+
+
+def block_resources(driver, patterns, logger=None) -> bool:
+    """通过 DevTools 协议拦截匹配的请求，浏览器不支持 CDP 时返回 False"""
+    logger = logger or logging.getLogger(__name__)
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': list(patterns)})
+        return True
+    except Exception as e:
+        logger.warning(f"无法通过DevTools拦截页面资源，使用普通页面加载: {str(e)}")
+        return False
+
+
+class ProfileSlots:
+    """
+    持久化浏览器配置目录的分配。同一个配置目录同时只能被一个浏览器使用，
+    因此浏览器池中的每个浏览器占用一个编号目录 (base_dir/0, base_dir/1, ...)，关闭后归还，
+    下次启动的浏览器复用其中的登录状态和缓存。
+    """
+
+    def __init__(self, base_dir: str):
+        self.base_dir = base_dir
+        self._in_use = set()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> str:
+        """占用编号最小的空闲目录"""
+        with self._lock:
+            slot = 0
+            while slot in self._in_use:
+                slot += 1
+            self._in_use.add(slot)
+        path = os.path.join(self.base_dir, str(slot))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def release(self, path: str):
+        with self._lock:
+            self._in_use.discard(int(os.path.basename(path)))
+
+    def bind(self, driver, path: str):
+        """浏览器关闭时归还它占用的目录"""
+        quit_driver = driver.quit
+        released = []
+
+        def quit():
+            try:
+                quit_driver()
+            finally:
+                # 重复 quit 时不能归还已被其它浏览器占用的同一目录
+                if not released:
+                    released.append(path)
+                    self.release(path)
+
+        driver.quit = quit
+        return driver
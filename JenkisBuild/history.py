@@ -0,0 +1,76 @@
+import argparse
+from datetime import datetime
+
+from config_loader import load_config
+from deploy_history import DeployHistory
+from deploy_scheduler import DEFAULT_BUILD_DURATION, critical_path
+
+
+def _seconds(value) -> str:
+    return f"{value:>8.1f}s" if value is not None else f"{'-':>9}"
+
+
+def format_stats(stats: list) -> str:
+    lines = [f"{'服务':<36}{'次数':>6}{'失败':>6}{'重试':>6}{'总耗时p50':>11}{'总耗时p95':>11}"
+             f"{'构建p50':>11}{'排队p50':>11}"]
+    for entry in stats:
+        lines.append(f"{entry['service']:<36}{entry['runs']:>6}{entry['failures']:>6}{entry['retries']:>6}  "
+                     f"{_seconds(entry['total_p50'])}  {_seconds(entry['total_p95'])}  "
+                     f"{_seconds(entry['build_p50'])}  {_seconds(entry['queue_wait_p50'])}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查看部署历史: 各服务耗时分位数、最不稳定的服务和最慢的关键路径")
+    parser.add_argument("--service", nargs='+', help="只统计这些服务")
+    parser.add_argument("--window", type=int, default=20, help="每个服务统计最近多少次部署")
+    parser.add_argument("--top", type=int, default=5, help="列出最不稳定的前几个服务")
+    parser.add_argument("--runs", type=int, default=10, help="列出最近几次部署")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出全部历史统计")
+    args = parser.parse_args()
+
+    config = load_config()
+    history_config = config.get('history') or {}
+    history = DeployHistory(history_config.get('path', 'JenkisBuild/deploy_history.db'))
+    try:
+        if args.json:
+            print(history.export())
+            return
+
+        runs = history.runs(args.runs)
+        if not runs:
+            print("还没有部署历史")
+            return
+        print("最近的部署:")
+        for run in runs:
+            started = datetime.fromtimestamp(run['started_at']).strftime('%Y-%m-%d %H:%M')
+            print(f"  {run['run_id']:<24}{run['kind']:<12}{started:<18}"
+                  f"{run['succeeded']}/{run['services']} 成功  墙钟 {run['wall_time'] / 60:.1f} 分钟")
+
+        print(f"\n各服务耗时 (最近 {args.window} 次):")
+        print(format_stats(history.service_stats(args.service, args.window)))
+
+        flaky = history.flakiest(args.top, args.window)
+        print("\n最不稳定的服务 (失败或重试后才成功的比例):")
+        for entry in flaky:
+            print(f"  {entry['service']:<36}{entry['flaky_score'] * 100:>5.0f}%  "
+                  f"({entry['failures']} 次失败, {entry['retries']} 次重试 / {entry['runs']} 次部署)")
+        if not flaky:
+            print("  无")
+
+        # 按 p95 耗时计算 concurrent 计划的关键路径，即并发不受限时的最短部署时间
+        plan = list(args.service or (config.get('services') or {}).get('concurrent') or {})
+        if plan:
+            durations = {entry['service']: entry['total_p95'] for entry in history.service_stats(plan, args.window)
+                         if entry['total_p95'] is not None}
+            total, path = critical_path(plan, durations, config.get('depends_on') or {})
+            print(f"\n最慢的关键路径 (p95，共 {total / 60:.1f} 分钟):")
+            for service in path:
+                source = '历史' if service in durations else '默认'
+                print(f"  {service:<36}{durations.get(service, DEFAULT_BUILD_DURATION) / 60:>6.1f} 分钟  ({source})")
+    finally:
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
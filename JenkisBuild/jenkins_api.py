@@ -0,0 +1,116 @@
+import logging
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class JenkinsApiClient:
+    """Jenkins REST API 客户端，所有请求复用同一个带连接池的认证会话"""
+
+    def __init__(self, base_url, user=None, api_token=None, pool_size=20, timeout=10, verify=True):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.logger = logging.getLogger(__name__)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.verify = verify
+        if user and api_token:
+            self.session.auth = (user, api_token)
+
+        # CSRF crumb 与会话绑定，获取一次后缓存
+        self._crumb = None
+        self._crumb_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, jenkins_config: dict):
+        """根据 config.yaml 中的 jenkins 配置创建客户端，凭据可由环境变量提供"""
+        return cls(
+            base_url=jenkins_config.get('url', 'https://jenkins.qima.com'),
+            user=jenkins_config.get('user') or os.environ.get('JENKINS_USER'),
+            api_token=jenkins_config.get('api_token') or os.environ.get('JENKINS_API_TOKEN'),
+            pool_size=jenkins_config.get('pool_size', 20),
+            timeout=jenkins_config.get('timeout', 10),
+            verify=jenkins_config.get('verify_ssl', True),
+        )
+
+    def url(self, path: str) -> str:
+        """把相对路径拼接为完整URL，已是完整URL时原样返回"""
+        if path.startswith('http://') or path.startswith('https://'):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def _get_crumb(self, refresh=False) -> dict:
+        """获取并缓存 CSRF crumb 请求头"""
+        with self._crumb_lock:
+            if self._crumb is None or refresh:
+                resp = self.session.get(self.url('crumbIssuer/api/json'), timeout=self.timeout)
+                if resp.status_code == 404:
+                    # Jenkins 未开启 CSRF 保护
+                    self._crumb = {}
+                else:
+                    resp.raise_for_status()
+                    data = resp.json()
+                    self._crumb = {data['crumbRequestField']: data['crumb']}
+            return self._crumb
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        resp = self.session.get(self.url(path), timeout=self.timeout, **kwargs)
+        resp.raise_for_status()
+        return resp
+
+    def get_json(self, path: str, tree: str = None) -> dict:
+        """读取 Jenkins 对象的 JSON 表示，tree 用于只返回需要的字段"""
+        path = path.rstrip('/')
+        if not path.endswith('api/json'):
+            path = f"{path}/api/json"
+        params = {'tree': tree} if tree else None
+        return self.get(path, params=params).json()
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        """带 crumb 的 POST 请求，crumb 失效时刷新后重试一次"""
+        extra_headers = kwargs.pop('headers', {})
+        headers = {**self._get_crumb(), **extra_headers}
+        resp = self.session.post(self.url(path), headers=headers, timeout=self.timeout, **kwargs)
+        if resp.status_code == 403 and self._crumb:
+            self.logger.info("crumb 可能已失效，刷新后重试")
+            headers = {**self._get_crumb(refresh=True), **extra_headers}
+            resp = self.session.post(self.url(path), headers=headers, timeout=self.timeout, **kwargs)
+        resp.raise_for_status()
+        return resp
+
+    def last_build_number(self, job_path: str) -> int:
+        """返回任务最近一次构建的编号，没有构建时返回 0"""
+        data = self.get_json(job_path, tree='lastBuild[number]')
+        last_build = data.get('lastBuild') or {}
+        return last_build.get('number', 0)
+
+    def trigger_build(self, job_path: str, params: dict = None) -> str:
+        """
+        通过 buildWithParameters 触发构建
+        :return: Jenkins 返回的队列项地址 (Location 响应头)
+        """
+        query = {'delay': '0sec'}
+        query.update(params or {})
+        resp = self.post(f"{job_path.rstrip('/')}/buildWithParameters", params=query)
+        return resp.headers.get('Location')
+
+    def progressive_text(self, path: str, start: int = 0):
+        """
+        增量读取控制台输出
+        :return: (新增文本, 下次读取的偏移量, 是否还有更多输出)
+        """
+        resp = self.get(path, params={'start': start})
+        next_start = resp.headers.get('X-Text-Size')
+        return resp.text, int(next_start) if next_start else None, resp.headers.get('X-More-Data') == 'true'
+
+    def stop_build(self, build_path: str):
+        """中止构建，释放其占用的执行器"""
+        self.post(f"{build_path.rstrip('/')}/stop")
+
+    def close(self):
+        self.session.close()
@@ -1,35 +1,94 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+import os
+import socket
+import sqlite3
 import time
 import logging
-from selenium.webdriver.remote.webelement import WebElement
-from selenium.common.exceptions import StaleElementReferenceException
-from services_extract import extract_services
+import warnings
+from service_catalog import ServiceCatalog
 from functools import wraps
-from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeoutError
 from config_loader import load_config
-from typing import Tuple
+from build_watcher import BuildStatusWatcher, MultiplexedBuildPoller, follow_queue_item
+from deploy_scheduler import DeployDag, BuildDurationStore, DEFAULT_BUILD_DURATION, longest_first, simulate_schedule
+from driver_pool import DriverPool
+from deploy_journal import DeployJournal, QUEUED, TRIGGERED, RUNNING, SUCCESS, FAILED
+from deploy_history import DeployHistory
+from deploy_logging import DeployLogPipeline, service_context
+from revision_check import RevisionChecker
+from console_watcher import ConsoleWatcher
+from concurrency_governor import ConcurrencyGovernor
+from run_report import RunReport
+from retry_policy import HttpStatusError, RetryPolicy
+from fast_page import DEFAULT_BLOCKED_URLS, ProfileSlots, apply_fast_options, block_resources
+from environments import EnvironmentSet
+from typing import Tuple, TYPE_CHECKING
+from urllib.parse import quote, urlsplit
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webelement import WebElement
+
+# 在浏览器中异步读取JSON，复用浏览器已登录的会话
+FETCH_JSON_SCRIPT = """
+const callback = arguments[arguments.length - 1];
+fetch(arguments[0], {credentials: 'same-origin'})
+    .then(resp => resp.ok ? resp.json() : {'__error__': 'HTTP ' + resp.status, '__status__': resp.status})
+    .then(callback)
+    .catch(err => callback({'__error__': String(err)}));
+"""
+
+# 在浏览器中增量读取控制台输出，返回文本和 X-Text-Size / X-More-Data 响应头
+FETCH_TEXT_SCRIPT = """
+const callback = arguments[arguments.length - 1];
+fetch(arguments[0], {credentials: 'same-origin'})
+    .then(resp => resp.ok
+        ? resp.text().then(text => ({'text': text, 'size': resp.headers.get('X-Text-Size'),
+                                     'more': resp.headers.get('X-More-Data') === 'true'}))
+        : {'__error__': 'HTTP ' + resp.status, '__status__': resp.status})
+    .then(callback)
+    .catch(err => callback({'__error__': String(err)}));
+"""
+
+# 在浏览器中发送带 crumb 的 POST 请求，crumb 取自 Jenkins 页面的 head 属性
+POST_SCRIPT = """
+const callback = arguments[arguments.length - 1];
+const headers = {};
+const crumbHeader = document.head.getAttribute('data-crumb-header');
+if (crumbHeader) {
+    headers[crumbHeader] = document.head.getAttribute('data-crumb-value');
+}
+fetch(arguments[0], {method: 'POST', credentials: 'same-origin', headers: headers})
+    .then(resp => callback(resp.ok ? {} : {'__error__': 'HTTP ' + resp.status, '__status__': resp.status}))
+    .catch(err => callback({'__error__': String(err)}));
+"""
+
+def _raise_for_browser_error(data):
+    """浏览器脚本返回的错误转换为异常: HTTP 错误带状态码，网络错误按连接错误处理"""
+    if isinstance(data, dict) and '__error__' in data:
+        if data.get('__status__'):
+            raise HttpStatusError(data['__error__'], data['__status__'])
+        raise ConnectionError(data['__error__'])
+    return data
 
 def retry_decorator(retries=3, delay=1):
+    """
+    失败时重试。装饰 JenkinsDeployer 的方法时使用它共享的重试策略 (抖动退避、重试预算、断路器)，
+    否则以 delay 为基础间隔做指数退避
+    """
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            for attempt in range(retries):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    if attempt == retries - 1:
-                        raise e
-                    time.sleep(delay)
-            return None
+            owner = args[0] if args else None
+            policy = getattr(owner, 'retry_policy', None) or RetryPolicy(max_attempts=retries, base_delay=delay,
+                                                                         budget=None)
+            return policy.call(lambda: func(*args, **kwargs), attempts=retries,
+                               host=getattr(owner, 'jenkins_host', None), label=func.__name__)
         return wrapper
     return decorator
 
 class JenkinsDeployer:
-    def __init__(self, max_workers=3, build_timeout=1800, headless=True):
+    def __init__(self, max_workers=3, build_timeout=1800, headless=True, backend='selenium'):
         self.driver = None  # 初始化为 None
         # 配置日志
         logging.basicConfig(
@@ -41,60 +100,204 @@ class JenkinsDeployer:
         # 配置安静的日志记录，减少第三方库的日志输出
         self._configure_quiet_logging()
         
-        # 从HTML文件中动态加载services
-        with open('JenkisBuild/jenkins_build_page.html', 'r', encoding='utf-8') as file:
-            html = file.read()
-        self.services = extract_services(html)
-        
         # 从配置文件加载skip_services
         config = load_config()
+        # 服务列表，第一次使用时才从目录缓存读取
+        catalog_config = config.get('catalog') or {}
+        self.catalog = ServiceCatalog(ttl=catalog_config.get('ttl', 0), logger=self.logger)
+        self._services = None
         self.skip_services = config.get('skip_services', [])
+        # 服务之间的部署依赖: {service: [前置服务, ...]}
+        self.depends_on = config.get('depends_on') or {}
+        # 多环境部署: 同一份计划展开为 <环境>/<服务>，各环境有自己的目录、分支覆盖和并发上限
+        self.environments = EnvironmentSet(config.get('environments'))
+        # 历史构建耗时，用于最长优先调度
+        self.duration_store = BuildDurationStore()
+        # 分支最新提交已成功构建过的服务是否跳过
+        self.skip_unchanged = config.get('default', {}).get('skip_unchanged', True)
+        # 控制台输出失败特征检测
+        self.console_config = config.get('console') or {}
+        self.failure_excerpts = {}  # service -> 匹配到失败特征的日志摘录
+        # 按Jenkins空闲执行器动态调整并发，上限为 max_workers
+        self.concurrency_config = config.get('concurrency') or {}
+        # 接收Jenkins构建通知，收到通知后不必等待轮询
+        self.webhook_config = config.get('webhook') or {}
+        self._webhook = None
+        self._durations = {}  # 本次并发部署各服务的预计耗时
+        # 各服务分阶段耗时的运行报告
+        self.report_config = config.get('report') or {}
+        self.report = None
+        # 部署历史，记录每次部署各服务的结果与耗时，并为调度提供历史耗时
+        self.history_config = config.get('history') or {}
+        self._history = None
+        # 并发部署时日志经队列交给后台线程，每个服务一个 JSON-lines 文件，控制台显示进度表
+        self.logging_config = config.get('logging') or {}
+        self._log_pipeline = None
+        # 触发、状态查询、页面加载共用的重试策略
+        self.retry_config = config.get('retry') or {}
+        self.retry_policy = RetryPolicy.from_config(self.retry_config, logger=self.logger)
+        # 构建成功后等待 ArgoCD 应用 Synced 且 Healthy 才算部署成功
+        self.argocd_config = config.get('argocd') or {}
+        self._argocd = None
         
-        self.base_url = "https://jenkins.qima.com/job/PP/job/{}/build?delay=0sec"
-        self.it_dependency_url = "https://jenkins.qima.com/job/Prod/job/prod-lt-dependency/build?delay=0sec"
         self.max_workers = max_workers
         self.build_timeout = build_timeout
         self.headless = headless  # 添加headless属性
-        self.driver = webdriver.Edge(options=self._get_browser_options())
+        # 快速页面模式: 拦截图片/字体/样式表/统计脚本，eager 加载，复用持久化的浏览器配置
+        browser_config = config.get('browser') or {}
+        self.fast_page = browser_config.get('fast_mode', True)
+        self.blocked_urls = DEFAULT_BLOCKED_URLS + list(browser_config.get('blocked_urls') or [])
+        profile_dir = browser_config.get('profile_dir')
+        self.profiles = ProfileSlots(profile_dir) if profile_dir else None
+        self.backend = backend  # selenium: 浏览器操作; api: Jenkins REST API
+
+        jenkins_config = config.get('jenkins', {})
+        self.jenkins_config = jenkins_config
+        self.jenkins_url = jenkins_config.get('url', 'https://jenkins.qima.com').rstrip('/')
+        self.branch_param = jenkins_config.get('branch_param', 'BRANCH')
+        self.poll_interval = jenkins_config.get('poll_interval', 1.0)
+        self._api = None  # API模式下第一次使用时创建
+        self.driver_pool = None  # 并发部署期间使用的浏览器池
+        self.journal = None  # 部署状态日志，第一次并发部署时打开
+        self._run_id = None  # 当前并发部署的 run_id
+
+    @property
+    def api(self):
+        """API模式下所有服务共用一个带连接池的会话，不需要浏览器；浏览器模式下为 None"""
+        if self._api is None and self.backend == 'api':
+            from jenkins_api import JenkinsApiClient
+            self._api = JenkinsApiClient.from_config(self.jenkins_config)
+        return self._api
+
+    @api.setter
+    def api(self, api):
+        self._api = api
+
+    @property
+    def history(self):
+        """部署历史数据库，第一次使用时打开，history.enabled 为 false 时为 None"""
+        if self._history is None and self.history_config.get('enabled', True):
+            self._history = DeployHistory(self.history_config.get('path', 'JenkisBuild/deploy_history.db'))
+        return self._history
+
+    @history.setter
+    def history(self, history):
+        self._history = history
+
+    @property
+    def argocd(self):
+        """ArgoCD 健康检查，所有服务共用一个带连接池的会话，第一次使用时创建；argocd.enabled 为 false 时为 None"""
+        if self._argocd is None and self.argocd_config.get('enabled', False):
+            from argocd_gate import ArgoHealthGate
+            self._argocd = ArgoHealthGate.from_config(self.argocd_config, self.environments, logger=self.logger)
+        return self._argocd
+
+    @argocd.setter
+    def argocd(self, argocd):
+        self._argocd = argocd
+
+    @property
+    def jenkins_host(self) -> str:
+        """断路器按主机统计错误率"""
+        return urlsplit(self.jenkins_url).netloc
+
+    @property
+    def services(self) -> list:
+        """可部署的服务列表，API模式下按 catalog.ttl 从Jenkins刷新，否则读取本地页面"""
+        if self._services is None:
+            self._services = self.catalog.services(self._fetch_json if self.backend == 'api' else None)
+        return self._services
+
+    @services.setter
+    def services(self, services):
+        self._services = list(services)
+
+    def _get_driver(self):
+        """第一次需要时才启动顺序部署使用的浏览器"""
+        if self.driver is None:
+            self.driver = self._new_driver()
+        return self.driver
+
+    def _new_driver(self):
+        """启动一个 Edge 浏览器，Selenium 只在第一次需要浏览器时才导入"""
+        from selenium import webdriver
+        profile = self.profiles.acquire() if self.profiles else None
+        try:
+            driver = webdriver.Edge(options=self._get_browser_options(profile))
+        except Exception:
+            if profile:
+                self.profiles.release(profile)
+            raise
+        if profile:
+            self.profiles.bind(driver, profile)
+        if self.fast_page:
+            block_resources(driver, self.blocked_urls, self.logger)
+        return driver
+
+    def _job_path(self, service: str) -> str:
+        """返回服务对应的Jenkins任务路径，多环境部署时 service 为 <环境>/<服务>"""
+        return self.environments.job_path(service)
+
+    def _build_page_url(self, service: str) -> str:
+        return f"{self.jenkins_url}/{self._job_path(service)}/build?delay=0sec"
+
+    def _is_known(self, service: str) -> bool:
+        """服务(去掉环境前缀后)是否在服务列表中"""
+        _, name = self.environments.split(service)
+        return name in self.services or name == 'it-dependency'
         
-    def _get_browser_options(self):
-        """配置浏览器选项"""
+    def _get_browser_options(self, profile_dir=None):
+        """
+        配置浏览器选项，无头模式与可见模式使用相同的精简参数
+        :param profile_dir: 持久化的浏览器配置目录
+        """
+        from selenium import webdriver
         options = webdriver.EdgeOptions()
         if self.headless:
             options.add_argument('--headless')
-        else:
-            options.add_argument('--disable-gpu')
-            options.add_argument('--no-sandbox')
-            options.add_argument('--disable-dev-shm-usage')
-            # 增加以下配置来抑制更多日志
-            options.add_argument('--log-level=3')  # 仅显示 FATAL
-            options.add_argument('--silent')
-            options.add_argument('--disable-logging')
-            options.add_argument('--disable-smartscreen')  # 禁用 SmartScreen
-            options.add_argument('--disable-identity-provider-fetch')  # 禁用身份验证提供者获取
-            options.add_argument('--disable-qqbrowser-importer')  # 禁用 QQBrowser 导入器
-            options.add_experimental_option('excludeSwitches', ['enable-logging', 'enable-automation'])
-            options.add_experimental_option('useAutomationExtension', False)
-            options.add_argument('--disable-extensions')  # 禁用扩展
-            options.add_argument('--disable-infobars')  # 禁用信息栏
-            options.add_argument('--disable-popup-blocking')  # 禁用弹出窗口拦截
-            options.add_argument('--disable-features=IsolateOrigins,site-per-process')  # 禁用隔离特性
+        options.add_argument('--disable-gpu')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        # 增加以下配置来抑制更多日志
+        options.add_argument('--log-level=3')  # 仅显示 FATAL
+        options.add_argument('--silent')
+        options.add_argument('--disable-logging')
+        options.add_argument('--disable-smartscreen')  # 禁用 SmartScreen
+        options.add_argument('--disable-identity-provider-fetch')  # 禁用身份验证提供者获取
+        options.add_argument('--disable-qqbrowser-importer')  # 禁用 QQBrowser 导入器
+        options.add_experimental_option('excludeSwitches', ['enable-logging', 'enable-automation'])
+        options.add_experimental_option('useAutomationExtension', False)
+        options.add_argument('--disable-extensions')  # 禁用扩展
+        options.add_argument('--disable-infobars')  # 禁用信息栏
+        options.add_argument('--disable-popup-blocking')  # 禁用弹出窗口拦截
+        options.add_argument('--disable-features=IsolateOrigins,site-per-process')  # 禁用隔离特性
+        if self.fast_page:
+            apply_fast_options(options, profile_dir)
+        elif profile_dir:
+            options.add_argument(f'--user-data-dir={os.path.abspath(profile_dir)}')
         return options
 
     def deploy(self, services_branches: dict):
         """
         部署多个服务，失败时重试一次
         :param services_branches: Dict[service_name: str, branch: str]
+        :return: {service_name: success_status}
         """
         if not services_branches:
-            return
+            return {}
+        results = {}
         
         self.logger.info(f"开始批量部署服务: {list(services_branches.keys())}")
         start_time = time.time()
+        # 不在服务列表中的不会部署，不计入运行报告和部署历史
+        self._begin_report('sequential', branches={service: branch for service, branch in services_branches.items()
+                                                   if self._is_known(service)})
+        self.retry_policy.reset_budget()
+        attempts = self.retry_config.get('deploy_attempts', 2)
         
         try:
             for service, branch in services_branches.items():
-                if service not in self.services and service != 'it-dependency':
+                if not self._is_known(service):
                     self.logger.warning(f"服务 {service} 不在预定义列表中")
                     continue
                     
@@ -103,13 +306,20 @@ class JenkinsDeployer:
                 self.logger.info(f"分支: {branch}")
                 
                 success = False
-                for attempt in range(2):  # 最多尝试2次（初次+1次重试）
+                for attempt in range(attempts):  # 默认最多尝试2次（初次+1次重试）
                     if attempt > 0:
                         self.logger.info(f"第 {attempt + 1} 次尝试部署: {service}")
+                        if self.report:
+                            self.report.retry(service)
                     
                     try:
+                        # API模式不需要浏览器
+                        driver = None
+                        if self.backend != 'api':
+                            with self._timing(service, 'driver_start'):
+                                driver = self._get_driver()
                         # 这里可以重用 _execute_deploy 方法
-                        success = self._execute_deploy(self.driver, service, branch)
+                        success = self._execute_deploy(driver, service, branch)
                         if success:
                             break
                         else:
@@ -117,47 +327,67 @@ class JenkinsDeployer:
                     except Exception as e:
                         self.logger.error(f"部署服务 {service} 时发生错误: {str(e)}")
                     
-                    if not success and attempt < 1:
-                        self.logger.info(f"等待 5 秒后进行重试...")
-                        time.sleep(5)
+                    if not success and attempt < attempts - 1:
+                        if not self.retry_policy.take_budget():
+                            self.logger.warning("本次部署的重试预算已用完，不再重试")
+                            break
+                        # 抖动退避，避免 Jenkins 过载时重试集中在同一时刻
+                        delay = self.retry_policy.backoff(attempt + 1)
+                        self.logger.info(f"等待 {delay:.1f} 秒后进行重试...")
+                        time.sleep(delay)
+                        self.retry_policy.wait_until_allowed(self.jenkins_host)
                 
                 service_end_time = time.time()
                 duration = round(service_end_time - service_start_time, 2)
                 self.logger.info(f"===== 服务 {service} 部署：{branch}{'成功' if success else '失败'} =====")
                 self.logger.info(f"耗时: {duration} 秒")
+                self._report_result(service, success, duration)
+                results[service] = success
                 
         finally:
             total_duration = round(time.time() - start_time, 2)
             self.logger.info(f"部署结束，总耗时: {total_duration} 秒")
-            if len(services_branches) > 0:
+            self._finish_report()
+            if len(services_branches) > 0 and self.driver:
                 try:
                     self.driver.quit()
                     self.driver = None
                 except Exception as e:
                     self.logger.warning(f"关闭浏览器时发生错误: {str(e)}")
+        return results
+
+    def master_services(self) -> dict:
+        """构建所有服务(除skip_services外)的master分支字典"""
+        return {
+            service: "master" for service in self.services 
+            if service not in self.skip_services
+        }
 
-    def deploy_all_master(self):
+    def deploy_all_master(self, resume_run_id=None, force=False):
         """
         部署所有服务的master分支
         
+        Args:
+            resume_run_id: 要恢复的部署 run_id，提供时按部署日志继续上一次中断的部署
+            force: 为 True 时即使master最新提交已成功构建过也重新构建
+
         Returns:
             dict: 包含每个服务部署结果的字典，格式为 {service_name: success_status}
         """
-        # 构建所有服务的master分支字典
-        services_to_deploy = {
-            service: "master" for service in self.services 
-            if service not in self.skip_services
-        }
+        services_to_deploy = None if resume_run_id else self.master_services()
         
-        self.logger.info(f"开始部署所有master分支，共 {len(services_to_deploy)} 个服务")
+        if services_to_deploy is not None:
+            self.logger.info(f"开始部署所有master分支，共 {len(services_to_deploy)} 个服务")
         
         try:
             # 使用deploy_concurrent进行部署
-            results = self.deploy_concurrent(services_to_deploy)
+            results = self.deploy_concurrent(services_to_deploy, resume_run_id=resume_run_id, force=force)
             
             # 统计成功和失败的服务
             success_count = sum(1 for success in results.values() if success)
             self.logger.info(f"部署完成: {success_count}/{len(results)} 个服务成功")
+            for service, excerpt in self.failure_excerpts.items():
+                self.logger.info(f"服务 {service} 失败日志:\n{excerpt}")
             
             return results
         except Exception as e:
@@ -165,63 +395,500 @@ class JenkinsDeployer:
             return {}
 
     def _configure_quiet_logging(self):
-        """配置安静的日志记录，减少第三方库的日志输出"""
-        import urllib3
-        urllib3.disable_warnings()
+        """配置安静的日志记录，减少第三方库的日志输出；只按名称设置，不导入 urllib3/Selenium"""
+        warnings.filterwarnings('ignore', module=r'urllib3(\.|$)')
         logging.getLogger("urllib3").setLevel(logging.ERROR)
-        import selenium.webdriver.remote.remote_connection as remote_connection
-        remote_connection.LOGGER.setLevel(logging.WARNING)
+        logging.getLogger("selenium.webdriver.remote.remote_connection").setLevel(logging.WARNING)
 
-    def deploy_concurrent(self, services_branches: dict):
-        """并发部署多个服务"""
+    def deploy_concurrent(self, services_branches: dict, resume_run_id=None, force=False):
+        """
+        并发部署多个服务
+        按 config.yaml 中的 depends_on 以DAG方式调度：服务的前置服务全部成功后立即开始，
+        前置服务失败的服务直接记为失败
+        :param resume_run_id: 恢复之前中断的部署：已成功的跳过，仍在构建的重新关联，其余重新触发
+        :param force: 为 True 时不跳过分支最新提交已成功构建过的服务
+        """
+        if self.journal is None:
+            self.journal = DeployJournal()
+        if resume_run_id:
+            services_branches = services_branches or self.journal.run_services(resume_run_id)
         if not services_branches:
             return {}
         
         service_start_time = time.time()
+        self.failure_excerpts = {}
         self.logger.info(f"===== 开始部署服务: {services_branches} =====")
         self.logger.info(f"分支: {services_branches}")
+
+        services = {}
+        for service, branch in services_branches.items():
+            if not self._is_known(service):
+                self.logger.warning(f"服务 {service} 不在预定义列表中")
+                continue
+            services[service] = branch
+        if self.backend != 'api':
+            # 浏览器按需并行启动，最多 max_workers 个，构建触发后立即归还给其它服务复用
+            self.driver_pool = DriverPool(self._new_driver,
+                                          self.max_workers, logger=self.logger)
+        dag = DeployDag(services, self.environments.depends_on(self.depends_on, services))
+        self.logger.info(f"部署层级: {dag.levels()}")
+        durations = self.estimate_durations(services)
+
         results = {}
+        reattach = {}  # 中断前已触发、需要重新关联的构建
+        if resume_run_id:
+            self._run_id = resume_run_id
+            for service, entry in self.journal.latest_states(resume_run_id).items():
+                if service not in services:
+                    continue
+                if entry['state'] == SUCCESS:
+                    results[service] = True
+                    self.logger.info(f"服务 {service} 已在上次部署中成功，跳过")
+                elif entry['state'] in (TRIGGERED, RUNNING):
+                    reattach[service] = entry
+            dag.started.update(results)
+            dag.started.update(reattach)
+        else:
+            self._run_id = self.journal.start_run(services, kind='concurrent')
+        self.logger.info(f"部署 run_id: {self._run_id}，中断后可使用 --resume {self._run_id} 继续")
+        self._begin_report('concurrent', self._run_id, branches=services)
+        if self.report:
+            for service in results:
+                # 上次部署中已成功、这次没有重新部署，部署历史保留上次的记录
+                self.report.set(service, success=True, resumed=True)
+        self.retry_policy.reset_budget()
+        if self.skip_unchanged and not force:
+            pending = {service: branch for service, branch in services.items()
+                       if service not in results and service not in reattach}
+            checker = RevisionChecker(self._fetch_json, logger=self.logger)
+            for service in checker.unchanged(pending, self._job_path):
+                results[service] = True
+                dag.started.add(service)
+                if self.report:
+                    self.report.set(service, success=True, skipped=True)
+                self._journal(service, SUCCESS, branch=services[service])
+        for service, branch in services.items():
+            if service not in results and service not in reattach:
+                self._journal(service, QUEUED, branch=branch)
+
+        # 所有进行中的构建共用一个轮询器，每个周期只发一次批量请求
+        poller = self._create_build_poller()
+        governor = self._create_governor()
+        self._durations = durations
+        self._webhook = self._start_webhook(poller)
         with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            futures = []
-            drivers = {}  # 使用字典来跟踪每个service对应的driver
+            futures = {}  # future -> (service, submit_time)
+            queue = []  # 依赖已满足、等待空闲worker的服务，按预计耗时从长到短排列
+
+            def submit_ready():
+                # 只在有空闲worker时提交，保证耗时最长的服务最先开始 (LPT)
+                queue[:] = longest_first(queue + dag.next_ready(results), durations)
+                limit = governor.limit(len(futures)) if governor and queue else self.max_workers
+                # 多环境部署时各环境另有自己的并发上限，已满的环境让位给其它环境
+                in_flight = Counter(self.environments.split(service)[0] for service, _ in futures.values())
+                for service in list(queue):
+                    if len(futures) >= limit:
+                        break
+                    env = self.environments.split(service)[0]
+                    env_limit = self.environments.limit(service)
+                    if env_limit and in_flight[env] >= env_limit:
+                        continue
+                    queue.remove(service)
+                    in_flight[env] += 1
+                    future = executor.submit(self._run_for_service, service, self._deploy_single_service,
+                                             service, services[service], poller)
+                    futures[future] = (service, time.time())
             
             try:
-                for service, branch in services_branches.items():
-                    if service not in self.services and service != 'it-dependency':
-                        self.logger.warning(f"服务 {service} 不在预定义列表中")
-                        continue
-                        
-                    driver = webdriver.Edge(options=self._get_browser_options())
-                    drivers[service] = driver
-                    futures.append(
-                        executor.submit(self._deploy_single_service_with_driver, 
-                                      driver, service, branch)
-                    )
-                
-                for future in futures:
-                    try:
-                       service, success = future.result()
-                       results[service] = success
-                       self.logger.info(f"服务 {service} 部署{'成功' if success else '失败'}")
-                    except Exception as e:
-                       self.logger.error(f"部署服务 {service} 时发生错误: {str(e)}")
-                       results[service] = False
+                states = {service: SUCCESS for service in results}
+                states.update((service, entry['state']) for service, entry in reattach.items())
+                self._log_pipeline = self._start_log_pipeline(services, states)
+                for service, entry in reattach.items():
+                    future = executor.submit(self._run_for_service, service, self._reattach_single_service,
+                                             service, entry, poller)
+                    futures[future] = (service, time.time())
+                submit_ready()
+                while futures:
+                    # 有服务在排队时定期醒来，Jenkins空出执行器后及时提交
+                    timeout = governor.refresh_interval if governor and queue else None
+                    done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        service, submit_time = futures.pop(future)
+                        try:
+                            _, success = future.result()
+                        except Exception as e:
+                            self.logger.error(f"部署服务 {service} 时发生错误: {str(e)}")
+                            success = False
+                        results[service] = success
+                        self._journal(service, SUCCESS if success else FAILED)
+                        self._report_result(service, success, time.time() - submit_time)
+                        if success and service not in reattach:
+                            self.duration_store.record(service, time.time() - submit_time)
+                        self.logger.info(f"服务 {service} 部署{'成功' if success else '失败'}", extra={'service': service})
+                    for service in dag.blocked(results):
+                        self._journal(service, FAILED)
+                        if self.report:
+                            # 没有构建过，在部署历史中与跳过的服务一样不计入失败和不稳定统计
+                            self.report.set(service, success=False, skipped=True, blocked=True)
+                        self.logger.warning(f"服务 {service} 的前置服务部署失败，跳过部署")
+                    submit_ready()
                     
             finally:
+                if self._webhook:
+                    self._webhook.stop()
+                    self.logger.info(f"共收到构建通知 {self._webhook.event_count} 条")
+                    self._webhook = None
+                poller.stop()
+                self._run_id = None
+                self.logger.info(f"构建状态批量查询共 {poller.request_count} 次")
+                self._finish_report()
+                try:
+                    self.duration_store.save()
+                except OSError as e:
+                    self.logger.warning(f"保存构建耗时记录失败: {str(e)}")
                 # 清理所有driver
-                for driver in drivers.values():
-                    try:
-                        driver.quit()
-                    except Exception as e:
-                        self.logger.warning(f"关闭driver时发生错误: {str(e)}")
+                if self.driver_pool:
+                    self.driver_pool.close()
+                    self.logger.info(f"共启动 {self.driver_pool.started_count} 个浏览器")
+                    self.driver_pool = None
+                if self._log_pipeline:
+                    self._log_pipeline.stop()
+                    self._log_pipeline = None
                     
         return results
 
-    def _deploy_single_service_with_driver(self, driver, service: str, branch: str) -> Tuple[str, bool]:
-        """使用预创建的driver部署服务"""
+    def deploy_async(self, services_branches: dict, max_concurrency=None) -> dict:
+        """
+        使用asyncio引擎并发部署，单线程驱动大量服务，需要配置Jenkins API凭据
+        :param max_concurrency: 同时进行中的构建上限，默认使用max_workers
+        :return: {service_name: success_status}
+        """
+        if not services_branches:
+            return {}
+        from async_deploy import AsyncDeployEngine
+
+        services = {}
+        for service, branch in services_branches.items():
+            if not self._is_known(service):
+                self.logger.warning(f"服务 {service} 不在预定义列表中")
+                continue
+            services[service] = branch
+
+        # 按预计耗时从长到短创建任务，信号量按先来先得放行，即最长优先
+        services = {service: services[service]
+                    for service in longest_first(services, self.estimate_durations(services))}
+        self.logger.info(f"===== 开始异步部署 {len(services)} 个服务 =====")
+        engine = AsyncDeployEngine(
+            self.jenkins_config,
+            self._job_path,
+            branch_param=self.branch_param,
+            max_concurrency=max_concurrency or self.max_workers,
+            build_timeout=self.build_timeout,
+            poll_interval=self.poll_interval,
+            depends_on=self.environments.depends_on(self.depends_on, services),
+            health_gate=self.argocd,
+            environments=self.environments,
+            retry_policy=self.retry_policy,
+            logger=self.logger,
+        )
+        self.retry_policy.reset_budget()
+        return engine.run(services)
+
+    def estimate_durations(self, services, fetch_json=None) -> dict:
+        """
+        预估各服务的构建耗时(秒)
+        优先使用部署历史中最近几次成功部署的耗时中位数，其次是Jenkins最近一次构建的 estimatedDuration，
+        都取不到时使用本地记录的最近一次耗时
+        :param fetch_json: 读取 estimatedDuration 的方式，默认 self._fetch_json；为 False 时不查询Jenkins
+        """
+        if fetch_json is None:
+            fetch_json = self._fetch_json
+        durations = {service: self.duration_store.durations[service]
+                     for service in services if service in self.duration_store.durations}
+        # 部署历史中有足够成功记录的服务直接使用历史中位数 (含排队和触发)，不再查询Jenkins
+        from_history = self._history_durations(services)
+        folders = {}
+        for service in services:
+            if service in from_history or not fetch_json:
+                continue
+            folder, job_name = self._job_path(service).rsplit('/job/', 1)
+            folders.setdefault(folder, {})[job_name] = service
+        for folder, jobs in folders.items():
+            try:
+                data = fetch_json(folder, 'jobs[name,lastBuild[estimatedDuration]]')
+            except Exception as e:
+                self.logger.warning(f"获取 {folder} 预计构建耗时失败，使用历史记录: {str(e)}")
+                continue
+            for job in data.get('jobs', []):
+                estimated_ms = (job.get('lastBuild') or {}).get('estimatedDuration') or -1
+                if job.get('name') in jobs and estimated_ms > 0:
+                    durations[jobs[job['name']]] = round(estimated_ms / 1000, 2)
+        durations.update(from_history)
+        return durations
+
+    def _history_durations(self, services) -> dict:
+        if not self.history or not self.history_config.get('estimate', True):
+            return {}
+        try:
+            return self.history.durations(services, window=self.history_config.get('window', 10),
+                                          min_samples=self.history_config.get('min_samples', 3))
+        except sqlite3.Error as e:
+            self.logger.warning(f"读取部署历史失败: {str(e)}")
+            return {}
+
+    def plan(self, services_branches: dict, workers=None):
+        """
+        预测按最长优先调度部署这些服务所需的总时间，不触发任何构建
+        :return: (预计总耗时秒数, [(service, start, end), ...])
+        """
+        services = [service for service in services_branches if self._is_known(service)]
+        client = None
+        if self.api or self.driver or self.driver_pool:
+            fetch_json = self._fetch_json
+        elif self._has_api_credentials():
+            # 浏览器模式下有API凭据时临时用REST客户端读取 estimatedDuration
+            from jenkins_api import JenkinsApiClient
+            client = JenkinsApiClient.from_config(self.jenkins_config)
+            fetch_json = client.get_json
+        else:
+            # 只为预估耗时不启动浏览器，使用部署历史和本地记录的耗时
+            self.logger.info("未配置Jenkins API凭据，按部署历史和本地记录预估耗时")
+            fetch_json = False
+        try:
+            durations = self.estimate_durations(services, fetch_json)
+        finally:
+            if client:
+                client.close()
+        return simulate_schedule(services, durations, workers or self.max_workers,
+                                 self.environments.depends_on(self.depends_on, services))
+
+    def _has_api_credentials(self) -> bool:
+        return bool((self.jenkins_config.get('user') or os.environ.get('JENKINS_USER'))
+                    and (self.jenkins_config.get('api_token') or os.environ.get('JENKINS_API_TOKEN')))
+
+    def _fetch_json(self, path: str, tree: str = None) -> dict:
+        """读取Jenkins JSON接口，结果计入断路器；调用方(轮询器等)自行决定何时再试"""
+        return self.retry_policy.observe(self.jenkins_host, lambda: self._read_json(path, tree))
+
+    def _read_json(self, path: str, tree: str = None) -> dict:
+        """API模式走连接池，浏览器模式复用已登录浏览器的会话"""
+        if self.api:
+            return self.api.get_json(path, tree)
+        if self.driver_pool:
+            # 并发部署期间从浏览器池借用空闲的浏览器，不额外启动
+            with self.driver_pool.driver() as driver:
+                return self._same_origin_fetch_json(driver, path, tree)
+        return self._same_origin_fetch_json(self._get_driver(), path, tree)
+
+    def _same_origin_fetch_json(self, driver, path: str, tree: str = None) -> dict:
+        if not driver.current_url.startswith(self.jenkins_url):
+            # fetch 需要与Jenkins同源的页面
+            driver.get(self.jenkins_url)
+        return self._driver_fetch_json(driver, self._api_url(path), tree)
+
+    def _api_url(self, path: str) -> str:
+        """把任务路径转换为完整URL"""
+        if path.startswith('http://') or path.startswith('https://'):
+            return path
+        return f"{self.jenkins_url}/{path.lstrip('/')}"
+
+    def _create_governor(self):
+        """concurrency.adaptive 开启时创建并发调节器，上限为 max_workers"""
+        if not self.concurrency_config.get('adaptive', False):
+            return None
+        return ConcurrencyGovernor(
+            self._fetch_json,
+            min_workers=self.concurrency_config.get('min_workers', 1),
+            max_workers=self.max_workers,
+            refresh_interval=self.concurrency_config.get('refresh_interval', 10),
+            logger=self.logger,
+        )
+
+    def _with_retry(self, func, service: str, label: str):
+        """按共享重试策略执行触发/页面加载，重试次数计入运行报告"""
+        on_retry = (lambda: self.report.retry(service)) if self.report else None
+        return self.retry_policy.call(func, host=self.jenkins_host, label=f"{service} {label}", on_retry=on_retry)
+
+    def _timing(self, service: str, phase: str):
+        """记录某个阶段的耗时，未开启运行报告时不做任何事"""
+        return self.report.phase(service, phase) if self.report else nullcontext()
+
+    def _begin_report(self, kind: str, run_id: str = None, branches: dict = None):
+        """运行报告或部署历史任一开启时记录各服务的分阶段耗时"""
+        if not self.report_config.get('enabled', True) and not self.history_config.get('enabled', True):
+            self.report = None
+            return
+        self.report = RunReport(kind, run_id)
+        for service, branch in (branches or {}).items():
+            self.report.set(service, branch=branch)
+
+    def _report_result(self, service: str, success: bool, seconds: float):
+        if self.report:
+            self.report.add(service, 'total', seconds)
+            self.report.set(service, success=success)
+
+    def _record_build_timing(self, service: str, job_path: str, build_number: int, waited: float):
+        """构建耗时取 Jenkins 记录的 duration，发现延迟为构建结束到拿到结果的时间，取不到时按等待时间记录"""
+        if not self.report:
+            return
+        if build_number:
+            self.report.set(service, build_number=build_number)
+            try:
+                build = self._fetch_json(f"{job_path.rstrip('/')}/{build_number}", 'timestamp,duration')
+                if build.get('duration'):
+                    finished_at = (build['timestamp'] + build['duration']) / 1000
+                    self.report.add(service, 'build', build['duration'] / 1000)
+                    self.report.add(service, 'detection', time.time() - finished_at)
+                    return
+            except Exception as e:
+                self.logger.debug(f"读取 {service} 构建 #{build_number} 耗时失败: {str(e)}")
+        self.report.add(service, 'build', waited)
+
+    def _finish_report(self):
+        """写出 JSON 报告和 Prometheus textfile，并打印各阶段汇总"""
+        report, self.report = self.report, None
+        if not report or not report.services:
+            return
+        report.finish()
+        if self.history:
+            try:
+                self.history.record_run(report)
+            except sqlite3.Error as e:
+                self.logger.warning(f"写入部署历史失败: {str(e)}")
+        if not self.report_config.get('enabled', True):
+            return
+        self.logger.info(report.format_summary())
+        report_dir = self.report_config.get('dir', 'JenkisBuild/reports')
+        try:
+            json_path = os.path.join(report_dir, f"run-{report.run_id}.json")
+            report.write_json(json_path)
+            report.write_prometheus(self.report_config.get('prometheus_file',
+                                                           os.path.join(report_dir, 'jenkins_deploy.prom')))
+            self.logger.info(f"运行报告已写入: {json_path}")
+        except OSError as e:
+            self.logger.warning(f"写入运行报告失败: {str(e)}")
+
+    def _start_webhook(self, poller):
+        """webhook.enabled 时启动构建通知接收服务，通知直接交给轮询器"""
+        if not self.webhook_config.get('enabled', False):
+            return None
+        from build_webhook import BuildWebhookReceiver
+        token = self.webhook_config.get('token') or os.environ.get('JENKINS_WEBHOOK_TOKEN')
+        if not token:
+            self.logger.warning("未配置 webhook.token (或环境变量 JENKINS_WEBHOOK_TOKEN)，不启动构建通知接收服务，改为轮询")
+            return None
+        receiver = BuildWebhookReceiver(
+            poller.notify,
+            token,
+            host=self.webhook_config.get('host') or self._local_address(),
+            port=self.webhook_config.get('port', 8765),
+            path=self.webhook_config.get('path', '/jenkins'),
+            logger=self.logger,
+        )
+        try:
+            receiver.start()
+        except OSError as e:
+            self.logger.warning(f"启动构建通知接收服务失败，改为轮询: {str(e)}")
+            return None
+        return receiver
+
+    def _local_address(self) -> str:
+        """本机访问 Jenkins 时使用的网卡地址，只在这个地址上接收通知；找不到时使用 127.0.0.1"""
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                # UDP connect 不发送数据，只用来选出路由对应的本机地址
+                sock.connect((urlsplit(self.jenkins_url).hostname, 80))
+                return sock.getsockname()[0]
+        except OSError:
+            return '127.0.0.1'
+
+    def _quiet_period(self, service: str):
+        """启用通知时，在预计耗时加上余量之内不轮询该服务的构建"""
+        if not self._webhook:
+            return None
+        return self._durations.get(service, DEFAULT_BUILD_DURATION) + self.webhook_config.get('fallback_margin', 120)
+
+    def _create_build_poller(self) -> MultiplexedBuildPoller:
+        """创建批量构建状态轮询器"""
+        return MultiplexedBuildPoller(self._fetch_json, interval=self.poll_interval,
+                                      timeout=self.build_timeout, logger=self.logger)
+
+    def _start_log_pipeline(self, services, states: dict):
+        """
+        启动本次并发部署的日志管道，日志写入 <logging.dir>/<run_id>/<service>.jsonl
+        :param states: 开始前已确定状态的服务 (跳过的、需要重新关联的)
+        """
+        if not self.logging_config.get('enabled', True):
+            return None
+        log_dir = os.path.join(self.logging_config.get('dir', 'JenkisBuild/logs'), self._run_id)
+        try:
+            pipeline = DeployLogPipeline(log_dir, services, progress=self.logging_config.get('progress', True),
+                                         refresh_interval=self.logging_config.get('refresh_interval', 2))
+            pipeline.start()
+        except OSError as e:
+            self.logger.warning(f"创建日志目录失败，日志仍输出到控制台: {str(e)}")
+            return None
+        self.logger.info(f"各服务日志: {log_dir}")
+        for service, state in states.items():
+            pipeline.set_state(service, state)
+        return pipeline
+
+    def _run_for_service(self, service: str, func, *args):
+        """在worker线程中执行 func，期间输出的日志归属于 service"""
+        with service_context(service):
+            return func(*args)
+
+    def _journal(self, service: str, state: str, **kwargs):
+        """记录部署状态变化，只在并发部署期间生效"""
+        if self._log_pipeline:
+            self._log_pipeline.set_state(service, state)
+        if self._run_id:
+            try:
+                self.journal.record(self._run_id, service, state, **kwargs)
+            except Exception as e:
+                self.logger.warning(f"写入部署日志失败: {str(e)}")
+
+    def _reattach_single_service(self, service: str, entry: dict, poller) -> Tuple[str, bool]:
+        """重新关联中断前已触发的构建，只等待结果，不重新触发"""
         try:
-            driver.set_page_load_timeout(30)
-            success = self._execute_deploy(driver, service, branch)
+            build_number = entry['build_number']
+            if not build_number and entry.get('queue_url'):
+                # 中断时仍在排队，跟随原来的队列项；队列项已过期时按触发前的构建编号判断
+                self.logger.info(f"重新关联服务 {service} 的队列项: {entry['queue_url']}")
+                with self._timing(service, 'queue_wait'):
+                    build_number = self._follow_queue(self._fetch_json, entry['queue_url'])
+                if build_number:
+                    self._journal(service, TRIGGERED, build_number=build_number,
+                                  previous_number=entry['previous_number'], queue_url=entry['queue_url'])
+            if build_number:
+                previous_number = build_number - 1
+                self.logger.info(f"重新关联服务 {service} 的构建 #{build_number}")
+            else:
+                previous_number = entry['previous_number'] or 0
+                self.logger.info(f"重新关联服务 {service} 的构建 (构建编号大于 {previous_number})")
+            success = self._wait_for_build(None, self._job_path(service), previous_number, service, poller,
+                                           build_number=build_number)
+            return service, success
+        except Exception as e:
+            self.logger.error(f"重新关联服务 {service} 时发生错误: {str(e)}")
+            return service, False
+
+    def _deploy_single_service(self, service: str, branch: str, poller) -> Tuple[str, bool]:
+        """并发部署中的单个服务，浏览器模式下从浏览器池借用浏览器"""
+        try:
+            if self.backend == 'api':
+                return service, self._execute_deploy_api(service, branch, poller)
+            acquire_start = time.time()
+            with self.driver_pool.driver() as driver:
+                if self.report:
+                    self.report.add(service, 'driver_start', time.time() - acquire_start)
+                driver.set_page_load_timeout(30)
+                with self._timing(service, 'trigger'):
+                    job_url, previous_number, queue_url = self._trigger_with_driver(driver, service, branch)
+            # 构建已触发，浏览器已归还给其它服务，结果由轮询器统一监控
+            build_number = self._follow_triggered(service, branch, previous_number, queue_url, self._fetch_json)
+            success = self._wait_for_build(None, job_url, previous_number, service, poller,
+                                           build_number=build_number)
             return service, success
         except Exception as e:
             self.logger.error(f"部署服务 {service} 时发生错误: {str(e)}")
@@ -230,6 +897,9 @@ class JenkinsDeployer:
     @retry_decorator(retries=2)
     def _fill_branch_and_build(self, driver, branch):
         """填写分支并触发构建"""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
         branch_input = WebDriverWait(driver, 10).until(
             EC.presence_of_element_located((By.XPATH, 
                 '//*[@id="main-panel"]/form/div[1]/div[1]/div[3]/div/input[2]'))
@@ -243,24 +913,224 @@ class JenkinsDeployer:
         )
         build_button.click()
 
-    def _execute_deploy(self, driver, service: str, branch: str) -> bool:
-        """执行单个服务的部署"""
+    def _execute_deploy(self, driver, service: str, branch: str, poller=None) -> bool:
+        """
+        执行单个服务的部署
+        :param poller: 可选的 MultiplexedBuildPoller，提供时由它统一监控构建结果
+        """
+        if self.backend == 'api':
+            return self._execute_deploy_api(service, branch, poller)
         try:
-            url = self.it_dependency_url if service == 'it-dependency' else self.base_url.format(service)
-            self.logger.info(f"访问构建页面: {url}")
-            driver.get(url)
-            self.logger.info(f"填写分支信息: {branch}")
-            # 填写分支并构建
-            self._fill_branch_and_build(driver, branch)
-            self.logger.info(f"访问构建页面: {url}")
+            with self._timing(service, 'trigger'):
+                job_url, previous_number, queue_url = self._trigger_with_driver(driver, service, branch)
+            fetch_json = lambda path, tree: self._same_origin_fetch_json(driver, path, tree)
+            with self._timing(service, 'queue_wait'):
+                build_number = self._follow_queue(fetch_json, queue_url)
             # 检查构建结果
-            return self._check_build_result(driver)
+            if poller:
+                return self._wait_for_build(None, job_url, previous_number, service, poller,
+                                            build_number=build_number)
+            return self._check_build_result(driver, job_url, previous_number, build_number)
+        except Exception as e:
+            self.logger.error(f"部署服务 {service} 失败: {str(e)}")
+            return False
+
+    def _trigger_with_driver(self, driver, service: str, branch: str):
+        """
+        在浏览器中打开构建页面并触发构建
+        :return: (任务URL, 触发前的最后构建编号, 队列项URL)，找不到队列项时队列项URL为 None
+        """
+        url = self._build_page_url(service)
+        job_url = f"{self.jenkins_url}/{self._job_path(service)}"
+        self.retry_policy.wait_until_allowed(self.jenkins_host)
+        self.logger.info(f"访问构建页面: {url}")
+        self._with_retry(lambda: driver.get(url), service, '加载构建页面')
+        last_build = self._with_retry(lambda: self._driver_fetch_json(driver, job_url, 'lastBuild[number]'),
+                                      service, '读取最后构建编号').get('lastBuild') or {}
+        previous_number = last_build.get('number', 0)
+        self.logger.info(f"填写分支信息: {branch}")
+        # 填写分支并构建
+        self._fill_branch_and_build(driver, branch)
+        return job_url, previous_number, self._find_queue_item(driver, job_url)
+
+    def _find_queue_item(self, driver, job_url: str):
+        """浏览器触发的构建拿不到 Location 头，从任务的 queueItem 读取队列项地址"""
+        try:
+            item = self._same_origin_fetch_json(driver, job_url, 'queueItem[url]').get('queueItem') or {}
+        except Exception as e:
+            self.logger.warning(f"读取队列项失败: {str(e)}")
+            return None
+        return self._api_url(item['url']) if item.get('url') else None
+
+    def _follow_queue(self, fetch_json, queue_url):
+        """
+        跟随队列项拿到本次触发的构建编号
+        :return: 构建编号；没有队列项或读取失败时返回 None，之后按触发前的构建编号判断
+        :raises RuntimeError: 队列项被取消
+        """
+        if not queue_url:
+            return None
+        return follow_queue_item(fetch_json, queue_url, timeout=self.build_timeout, logger=self.logger)
+
+    def _follow_triggered(self, service: str, branch: str, previous_number: int, queue_url, fetch_json):
+        """
+        触发后立即记录 TRIGGERED 和队列项地址，排队期间进程中断时恢复部署会重新关联队列项而不是再次触发；
+        队列项分配构建编号后再记录一次
+        :return: 构建编号，拿不到时为 None
+        """
+        self._journal(service, TRIGGERED, branch=branch, previous_number=previous_number, queue_url=queue_url)
+        with self._timing(service, 'queue_wait'):
+            build_number = self._follow_queue(fetch_json, queue_url)
+        if build_number:
+            self._journal(service, TRIGGERED, branch=branch, build_number=build_number,
+                          previous_number=previous_number, queue_url=queue_url)
+        return build_number
+
+    def _execute_deploy_api(self, service: str, branch: str, poller=None) -> bool:
+        """通过 buildWithParameters 触发构建，不需要浏览器"""
+        job_path = self._job_path(service)
+        try:
+            self.retry_policy.wait_until_allowed(self.jenkins_host)
+            with self._timing(service, 'trigger'):
+                previous_number = self._with_retry(lambda: self.api.last_build_number(job_path),
+                                                   service, '读取最后构建编号')
+                self.logger.info(f"通过API触发构建: {job_path}，分支: {branch}")
+                queue_url = self._with_retry(lambda: self.api.trigger_build(job_path, {self.branch_param: branch}),
+                                             service, '触发构建')
+            self.logger.info(f"构建已进入队列: {queue_url}")
+            build_number = self._follow_triggered(service, branch, previous_number, queue_url, self.api.get_json)
+            return self._wait_for_build(self.api.get_json, job_path, previous_number, service, poller,
+                                        build_number=build_number)
         except Exception as e:
             self.logger.error(f"部署服务 {service} 失败: {str(e)}")
             return False
 
-    def _wait_for_element(self, locator, timeout=10, retries=3) -> WebElement:
+    def _wait_for_build(self, fetch_json, job_path: str, previous_number: int, service: str, poller=None,
+                        build_number: int = None) -> bool:
+        """
+        通过构建的JSON状态等待构建结束
+        :param build_number: 从队列项拿到的构建编号，提供时只监控这一个构建，否则关注触发之后产生的构建
+        """
+        self.logger.info("开始监控构建状态...")
+        start_time = time.time()
+        check = self._console_check(service, job_path, build_number)
+        console_interval = self.console_config.get('poll_interval', 5)
+        if poller:
+            on_start = lambda build_number: self._journal(service, RUNNING, build_number=build_number)
+            future = poller.watch(job_path, previous_number, on_start, build_number,
+                                  quiet_for=self._quiet_period(service))
+            result = None
+            while check:
+                try:
+                    result = future.result(timeout=console_interval)
+                    break
+                except FutureTimeoutError:
+                    result = check()
+                    if result:
+                        break
+            else:
+                result = future.result()
+        else:
+            max_interval = console_interval if check else 15.0
+            watcher = BuildStatusWatcher(fetch_json, max_interval=max_interval,
+                                         timeout=self.build_timeout, logger=self.logger)
+            result = watcher.wait(job_path, previous_number, label=service, build_number=build_number, check=check)
+        total_time = round(time.time() - start_time, 2)
+        self._record_build_timing(service, job_path, build_number, total_time)
+
+        if result == 'SUCCESS':
+            self.logger.info(f"{service} 构建成功! 总耗时: {total_time}秒")
+            return self._wait_for_rollout(service, job_path, build_number, start_time)
+        if result is None:
+            self.logger.error(f"构建监控超时，总耗时: {total_time}秒")
+        else:
+            self.logger.error(f"{service} 构建失败({result})! 总耗时: {total_time}秒")
+        return False
+
+    def _wait_for_rollout(self, service: str, job_path: str, build_number: int, waited_since: float) -> bool:
+        """
+        构建成功后等待 ArgoCD 完成发布，未启用 argocd 时直接返回成功
+        :param waited_since: 开始监控构建的时间，取不到构建开始时间时作为下限
+        """
+        if not self.argocd:
+            return True
+        since = waited_since
+        if build_number:
+            try:
+                build = self._fetch_json(f"{job_path.rstrip('/')}/{build_number}", 'timestamp')
+                since = build['timestamp'] / 1000 if build.get('timestamp') else since
+            except Exception as e:
+                self.logger.debug(f"读取 {service} 构建 #{build_number} 开始时间失败: {str(e)}")
+        with self._timing(service, 'rollout'):
+            healthy = self.argocd.wait(service, since)
+        if not healthy:
+            self.logger.error(f"{service} 构建成功但 ArgoCD 发布未完成，按部署失败处理")
+        return healthy
+
+    def _console_check(self, service: str, job_path: str, build_number: int = None):
+        """
+        创建控制台输出检查函数，等待构建期间定期调用
+        :return: check() -> 匹配到失败特征时返回 'FAILURE'，否则 None；未启用或构建编号未知时返回 None
+        """
+        if not build_number or not self.console_config.get('enabled', True):
+            return None
+        build_path = f"{job_path.rstrip('/')}/{build_number}"
+        watcher = ConsoleWatcher(self._fetch_text, build_path, self.console_config.get('failure_patterns'),
+                                 self.console_config.get('context_lines', 5), logger=self.logger)
+
+        def check():
+            excerpt = watcher.poll()
+            if not excerpt:
+                return None
+            self.failure_excerpts[service] = excerpt
+            self.logger.error(f"{service} 构建 #{build_number} 控制台输出匹配到失败特征:\n{excerpt}")
+            if self.console_config.get('abort_on_failure', False):
+                try:
+                    self._stop_build(build_path)
+                    self.logger.info(f"已中止 {service} 构建 #{build_number}，释放执行器")
+                except Exception as e:
+                    self.logger.warning(f"中止 {service} 构建 #{build_number} 失败: {str(e)}")
+            return 'FAILURE'
+        return check
+
+    def _fetch_text(self, path: str, start: int = 0):
+        """增量读取控制台输出，返回 (文本, 下次读取的偏移量, 是否还有更多输出)"""
+        if self.api:
+            return self.api.progressive_text(path, start)
+        url = f"{self._api_url(path)}?start={start}"
+        data = self._run_in_browser(FETCH_TEXT_SCRIPT, url)
+        return data.get('text', ''), int(data['size']) if data.get('size') else None, data.get('more', False)
+
+    def _stop_build(self, build_path: str):
+        """中止构建"""
+        if self.api:
+            self.api.stop_build(build_path)
+        else:
+            self._run_in_browser(POST_SCRIPT, f"{self._api_url(build_path)}/stop")
+
+    def _run_in_browser(self, script: str, url: str) -> dict:
+        """在与Jenkins同源的浏览器页面中执行脚本，借用方式与 _fetch_json 相同"""
+        def run(driver):
+            if not driver.current_url.startswith(self.jenkins_url):
+                driver.get(self.jenkins_url)
+            return _raise_for_browser_error(driver.execute_async_script(script, url))
+
+        if self.driver_pool:
+            with self.driver_pool.driver() as driver:
+                return run(driver)
+        return run(self._get_driver())
+
+    def _driver_fetch_json(self, driver, path: str, tree: str = None) -> dict:
+        """在浏览器当前会话中用 fetch 读取 JSON 接口，不刷新页面"""
+        url = f"{path.rstrip('/')}/api/json"
+        if tree:
+            url += f"?tree={quote(tree, safe=',')}"
+        return _raise_for_browser_error(driver.execute_async_script(FETCH_JSON_SCRIPT, url))
+
+    def _wait_for_element(self, locator, timeout=10, retries=3) -> 'WebElement':
         """等待元素出现，带重试机制"""
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
         for attempt in range(retries):
             try:
                 element = WebDriverWait(self.driver, timeout).until(
@@ -273,55 +1143,14 @@ class JenkinsDeployer:
                 self.logger.warning(f"等待元素 {locator} 失败，重试第 {attempt + 1} 次")
                 time.sleep(1)
 
-    def _check_build_result(self, driver=None, max_retries=60):
-        """检查构建结果"""
-        retry_interval = 10
-        driver = driver or self.driver
-        self.logger.info("开始监控构建状态...")
-        start_time = time.time()
-        
-        # 先等待一段时间让构建开始
-        time.sleep(5)
-        
-        for attempt in range(max_retries):
-            try:
-                status_link = WebDriverWait(driver, retry_interval).until(
-                    EC.presence_of_element_located((By.CLASS_NAME, "build-status-link"))
-                )
-                title = status_link.get_attribute("title")
-                
-                # 提取服务名称的逻辑可以单独封装为一个方法
-                service_name = self._extract_service_name_from_url(driver.current_url)
-                
-                if any(status in title.lower() for status in ["progress", "running", "pending"]):
-                    elapsed = round(time.time() - start_time, 2)
-                    self.logger.info(f"服务 {service_name} 构建进行中... ({attempt + 1}/{max_retries}) - 已耗时: {elapsed}秒")
-                    time.sleep(retry_interval)
-                    driver.refresh()
-                    continue
-                
-                if "Success" in title:
-                    total_time = round(time.time() - start_time, 2)
-                    self.logger.info(f"{service_name} 构建成功! 总耗时: {total_time}秒")
-                    return True
-                elif any(status in title for status in ["Failed", "Aborted"]):
-                    total_time = round(time.time() - start_time, 2)
-                    self.logger.error(f"{service_name} 构建失败! 总耗时: {total_time}秒")
-                    return False
-                    
-            except StaleElementReferenceException:
-                self.logger.warning(f"元素已过期，重试中... ({attempt + 1}/{max_retries})")
-            except TimeoutException:
-                self.logger.warning(f"等待超时，重试中... ({attempt + 1}/{max_retries})")
-            except Exception as e:
-                self.logger.error(f"检查构建结果时发生错误: {str(e)}")
-                
-            time.sleep(retry_interval)
-            driver.refresh()
-        
-        total_time = round(time.time() - start_time, 2)
-        self.logger.error(f"构建监控超时，总耗时: {total_time}秒")
-        return False
+    def _check_build_result(self, driver=None, job_url=None, previous_number=0, build_number=None):
+        """检查构建结果，轮询轻量的JSON状态接口代替刷新页面"""
+        driver = driver or self._get_driver()
+        if job_url is None:
+            job_url = driver.current_url.split('/build')[0].split('?')[0]
+        service_name = self._extract_service_name_from_url(job_url)
+        fetch_json = lambda path, tree: self._driver_fetch_json(driver, path, tree)
+        return self._wait_for_build(fetch_json, job_url, previous_number, service_name, build_number=build_number)
 
     def _extract_service_name_from_url(self, url):
         """从URL中提取服务名称"""
@@ -0,0 +1,88 @@
+import argparse
+import json
+import logging
+import tempfile
+import time
+
+from fake_jenkins import FakeJenkins
+from fast_page import ProfileSlots
+from jenkins_deploy import JenkinsDeployer
+from run_report import percentile
+
+# 构建按钮可点击即视为页面可用，与 _fill_branch_and_build 一致
+BUILD_BUTTON = '//*[@id="bottom-sticker"]/div/button'
+
+
+def visit(driver, url: str, timeout=30) -> float:
+    """打开构建页面直到构建按钮可点击，返回耗时(秒)"""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    start = time.perf_counter()
+    driver.get(url)
+    WebDriverWait(driver, timeout).until(EC.element_to_be_clickable((By.XPATH, BUILD_BUTTON)))
+    return time.perf_counter() - start
+
+
+def measure(deployer: JenkinsDeployer, urls: list, visits: int) -> dict:
+    """启动一个浏览器，先访问一次预热 (登录、缓存)，再依次访问 visits 次"""
+    start = time.perf_counter()
+    driver = deployer._new_driver()
+    startup = time.perf_counter() - start
+    try:
+        visit(driver, urls[0])
+        samples = [visit(driver, urls[i % len(urls)]) for i in range(visits)]
+    finally:
+        driver.quit()
+    return {
+        'driver_start': round(startup, 3),
+        'p50': round(percentile(samples, 50), 3),
+        'p95': round(percentile(samples, 95), 3),
+        'mean': round(sum(samples) / len(samples), 3),
+        'samples': [round(sample, 3) for sample in samples],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较快速页面模式开启/关闭时构建页面的访问耗时")
+    parser.add_argument("--visits", type=int, default=20, help="每种模式访问的次数")
+    parser.add_argument("--services", nargs='+', default=['pp-file-service', 'pp-gi-service', 'pp-gi-web'])
+    parser.add_argument("--jenkins", action="store_true",
+                        help="访问 config.yaml 中配置的真实 Jenkins (需已登录)，默认使用本地 Jenkins 替身")
+    parser.add_argument("--asset-delay", type=float, default=0.3, help="Jenkins 替身中每个静态资源的响应延迟(秒)")
+    parser.add_argument("--no-headless", action="store_true", help="显示浏览器窗口")
+    parser.add_argument("--output", help="把结果另存为 JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    fake = None if args.jenkins else FakeJenkins(asset_delay=args.asset_delay).start()
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as profile_dir:
+            for mode in ('normal', 'fast'):
+                deployer = JenkinsDeployer(headless=not args.no_headless)
+                if fake:
+                    deployer.jenkins_url = fake.url
+                deployer.fast_page = mode == 'fast'
+                if not args.jenkins:
+                    # 快速模式复用持久化配置；普通模式每个浏览器使用新的临时配置。
+                    # 真实 Jenkins 两种模式都使用 browser.profile_dir 中的登录状态
+                    deployer.profiles = ProfileSlots(profile_dir) if mode == 'fast' else None
+                urls = [deployer._build_page_url(service) for service in args.services]
+                results[mode] = measure(deployer, urls, args.visits)
+                row = results[mode]
+                print(f"{mode:<8} 启动浏览器 {row['driver_start']:>6.2f}s  "
+                      f"p50 {row['p50']:>6.3f}s  p95 {row['p95']:>6.3f}s  平均 {row['mean']:>6.3f}s", flush=True)
+    finally:
+        if fake:
+            fake.stop()
+
+    if results['fast']['p50']:
+        print(f"p50 加速 {results['normal']['p50'] / results['fast']['p50']:.1f} 倍")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
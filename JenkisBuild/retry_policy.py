@@ -0,0 +1,257 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+
+class HttpStatusError(RuntimeError):
+    """浏览器中 fetch 得到的 HTTP 错误，status 为状态码"""
+
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+
+class CircuitBreaker:
+    """
+    统计某个主机最近 window 次请求的错误率，超过阈值后断开，冷却 cooldown 秒后放行一次试探请求：
+    试探成功则恢复，失败则继续断开。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, window=20, min_requests=5, error_rate=0.5, cooldown=30):
+        self.window = window
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.opened_at = 0
+        self._results = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, success: bool) -> bool:
+        """记录一次请求结果，返回断路器是否因此断开"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                if success:
+                    self.state = self.CLOSED
+                    self._results.clear()
+                else:
+                    self._open()
+                    return True
+                return False
+            self._results.append(success)
+            failures = self._results.count(False)
+            if (self.state == self.CLOSED and len(self._results) >= self.min_requests
+                    and failures / len(self._results) >= self.error_rate):
+                self._open()
+                return True
+            return False
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.time()
+        self._results.clear()
+
+    def remaining(self) -> float:
+        """断开状态下距离可以试探还剩多少秒，可以请求时返回 0"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                # 已放行一次试探请求，等待其结果
+                return 1.0
+            if self.state != self.OPEN:
+                return 0
+            remaining = self.opened_at + self.cooldown - time.time()
+            if remaining <= 0:
+                self.state = self.HALF_OPEN
+                return 0
+            return remaining
+
+
+class RetryPolicy:
+    """
+    触发构建、状态查询、页面加载共用的重试策略：
+    指数退避加随机抖动 (full jitter)，避免各 worker 同时重试；一次部署内的重试次数有总预算；
+    每个主机一个断路器，错误率过高时暂停新的触发。
+    """
+
+    def __init__(self, max_attempts=3, base_delay=1.0, max_delay=30.0, budget=30, breaker=None, logger=None):
+        """
+        :param budget: 一次部署内所有服务共享的重试次数，None 表示不限制
+        :param breaker: CircuitBreaker 的参数 {window, min_requests, error_rate, cooldown}
+        """
+        self.max_attempts = max(max_attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.breaker_config = breaker or {}
+        self.logger = logger or logging.getLogger(__name__)
+        self.retries_used = 0
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, retry_config: dict, logger=None):
+        return cls(
+            max_attempts=retry_config.get('max_attempts', 3),
+            base_delay=retry_config.get('base_delay', 1.0),
+            max_delay=retry_config.get('max_delay', 30.0),
+            budget=retry_config.get('budget', 30),
+            breaker=retry_config.get('breaker'),
+            logger=logger,
+        )
+
+    def reset_budget(self):
+        """每次部署开始时重置重试预算"""
+        with self._lock:
+            self.retries_used = 0
+
+    def take_budget(self) -> bool:
+        """占用一次重试预算，预算用完时返回 False"""
+        with self._lock:
+            if self.budget is not None and self.retries_used >= self.budget:
+                return False
+            self.retries_used += 1
+            return True
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次失败后的等待时间，在 [0, min(max_delay, base_delay * 2^(attempt-1))] 内随机"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(**self.breaker_config)
+            return self._breakers[host]
+
+    def record(self, host: str, success: bool):
+        if host and self.breaker(host).record(success):
+            self.logger.warning(f"{host} 错误率过高，暂停新的触发 {self.breaker(host).cooldown} 秒")
+
+    def wait_until_allowed(self, host: str):
+        """断路器断开时阻塞，直到冷却结束可以发送试探请求"""
+        if not host:
+            return
+        breaker = self.breaker(host)
+        remaining = breaker.remaining()
+        if remaining > 0:
+            self.logger.info(f"{host} 断路器已断开，{remaining:.0f} 秒后再触发")
+        while remaining > 0:
+            time.sleep(min(remaining, 5))
+            remaining = breaker.remaining()
+
+    async def wait_until_allowed_async(self, host: str):
+        """wait_until_allowed 的协程版本，等待期间不阻塞事件循环"""
+        if not host:
+            return
+        breaker = self.breaker(host)
+        remaining = breaker.remaining()
+        if remaining > 0:
+            self.logger.info(f"{host} 断路器已断开，{remaining:.0f} 秒后再触发")
+        while remaining > 0:
+            await asyncio.sleep(min(remaining, 5))
+            remaining = breaker.remaining()
+
+    @staticmethod
+    def _status(error: Exception):
+        response = getattr(error, 'response', None)
+        status = getattr(response, 'status_code', None) or getattr(error, 'status', None)
+        return status if isinstance(status, int) else None
+
+    @classmethod
+    def retryable(cls, error: Exception) -> bool:
+        """4xx 请求错误 (429 除外) 重试也不会成功"""
+        status = cls._status(error)
+        if status and 400 <= status < 500 and status != 429:
+            return False
+        return True
+
+    @classmethod
+    def overloaded(cls, error: Exception) -> bool:
+        """
+        错误是否说明主机过载或不可达: 5xx、429、连接错误和超时。
+        4xx 等请求本身的问题 (任务路径写错、没有权限) 不计入断路器
+        """
+        status = cls._status(error)
+        if status:
+            return status >= 500 or status == 429
+        if isinstance(error, ValueError):
+            # 响应内容无法解析 (例如返回了登录页)
+            return False
+        if isinstance(error, OSError):
+            # 包括 requests 的连接/超时错误、socket 错误
+            return True
+        # selenium 的 TimeoutException、aiohttp 的 ServerDisconnectedError 等
+        return any('Timeout' in klass.__name__ or 'Connection' in klass.__name__ or 'Disconnected' in klass.__name__
+                   for klass in type(error).__mro__)
+
+    def observe(self, host: str, func):
+        """执行一次请求，主机过载类的错误计入断路器，不重试"""
+        try:
+            result = func()
+        except Exception as e:
+            if self.overloaded(e):
+                self.record(host, False)
+            raise
+        self.record(host, True)
+        return result
+
+    async def observe_async(self, host: str, func):
+        """observe 的协程版本，func() 返回协程"""
+        try:
+            result = await func()
+        except Exception as e:
+            if self.overloaded(e):
+                self.record(host, False)
+            raise
+        self.record(host, True)
+        return result
+
+    def _retry_delay(self, error: Exception, attempt: int, attempts: int, label: str, on_retry=None):
+        """决定失败后是否重试，重试时返回退避时间，不重试时返回 None"""
+        if attempt >= attempts or not self.retryable(error):
+            return None
+        if not self.take_budget():
+            self.logger.warning(f"{label} 失败且本次部署的重试预算 ({self.budget} 次) 已用完，不再重试")
+            return None
+        delay = self.backoff(attempt)
+        self.logger.warning(f"{label} 第 {attempt} 次失败: {str(error)}，{delay:.1f} 秒后重试")
+        if on_retry:
+            on_retry()
+        return delay
+
+    def call(self, func, attempts: int = None, host: str = None, label: str = '', on_retry=None):
+        """
+        执行 func()，失败时按退避策略重试
+        :param attempts: 最多尝试次数，默认 max_attempts
+        :param host: 计入哪个主机的断路器
+        :param on_retry: 可选回调，每次重试前调用
+        """
+        attempts = attempts or self.max_attempts
+        for attempt in range(1, attempts + 1):
+            try:
+                return self.observe(host, func)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, attempts, label, on_retry)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            self.wait_until_allowed(host)
+
+    async def call_async(self, func, attempts: int = None, host: str = None, label: str = '', on_retry=None):
+        """call 的协程版本，func() 返回协程；退避和等待断路器用 asyncio.sleep，不阻塞事件循环"""
+        attempts = attempts or self.max_attempts
+        for attempt in range(1, attempts + 1):
+            try:
+                return await self.observe_async(host, func)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, attempts, label, on_retry)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            await self.wait_until_allowed_async(host)
@@ -0,0 +1,125 @@
+import json
+import logging
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RevisionChecker:
+    """
+    判断服务分支的最新提交是否已经被该任务成功构建过。
+    已构建提交取自任务 lastSuccessfulBuild 的 Git BuildData，分支最新提交通过 git ls-remote 获取。
+    每个构建的 BuildData 按构建编号缓存在本地，只有出现新的成功构建时才重新读取。
+    """
+
+    BUILD_TREE = 'number,actions[remoteUrls,lastBuiltRevision[SHA1,branch[name]]]'
+
+    def __init__(self, fetch_json, cache_path='JenkisBuild/revision_cache.json', max_workers=8, logger=None):
+        """
+        :param fetch_json: 可调用对象 fetch_json(path, tree) -> dict
+        """
+        self.fetch_json = fetch_json
+        self.cache_path = cache_path
+        self.max_workers = max_workers
+        self.logger = logger or logging.getLogger(__name__)
+        self._heads = {}  # (remote_url, branch) -> sha，本次运行内的缓存
+        self.cache = {}  # job_path -> {'number', 'remote', 'revisions': {branch_name: sha}}
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    self.cache = json.load(f)
+            except (OSError, ValueError):
+                self.cache = {}
+
+    def save(self):
+        with open(self.cache_path, 'w', encoding='utf-8') as f:
+            json.dump(self.cache, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+    def _last_successful_numbers(self, job_paths) -> dict:
+        """每个目录一次批量请求，取各任务最近一次成功构建的编号"""
+        folders = {}
+        for job_path in job_paths:
+            folder, job_name = job_path.rsplit('/job/', 1)
+            folders.setdefault(folder, {})[job_name] = job_path
+        numbers = {}
+        for folder, jobs in folders.items():
+            data = self.fetch_json(folder, 'jobs[name,lastSuccessfulBuild[number]]')
+            for job in data.get('jobs', []):
+                if job.get('name') in jobs:
+                    numbers[jobs[job['name']]] = (job.get('lastSuccessfulBuild') or {}).get('number')
+        return numbers
+
+    def _build_data(self, job_path: str, number: int) -> dict:
+        """读取成功构建的 Git 信息，构建编号未变化时直接使用缓存"""
+        cached = self.cache.get(job_path)
+        if cached and cached.get('number') == number:
+            return cached
+        build = self.fetch_json(f"{job_path}/{number}", self.BUILD_TREE)
+        entry = {'number': number, 'remote': None, 'revisions': {}}
+        for action in build.get('actions') or []:
+            if not action:
+                continue
+            if action.get('remoteUrls') and not entry['remote']:
+                entry['remote'] = action['remoteUrls'][0]
+            revision = action.get('lastBuiltRevision') or {}
+            for branch in revision.get('branch') or []:
+                entry['revisions'][branch.get('name')] = revision.get('SHA1')
+        self.cache[job_path] = entry
+        return entry
+
+    def head_revision(self, remote_url: str, branch: str):
+        """git ls-remote 获取分支最新提交，同一仓库同一分支只查询一次"""
+        key = (remote_url, branch)
+        if key not in self._heads:
+            output = subprocess.run(
+                ['git', 'ls-remote', remote_url, f'refs/heads/{branch}'],
+                capture_output=True, text=True, timeout=30, check=True,
+            ).stdout
+            self._heads[key] = output.split()[0] if output.strip() else None
+        return self._heads[key]
+
+    @staticmethod
+    def _built_revision(revisions: dict, branch: str):
+        for name in (branch, f'origin/{branch}', f'refs/remotes/origin/{branch}', f'refs/heads/{branch}'):
+            if revisions.get(name):
+                return revisions[name]
+        return None
+
+    def unchanged(self, services_branches: dict, job_path) -> set:
+        """
+        返回分支最新提交已被成功构建过、可以跳过的服务
+        :param job_path: 可调用对象 job_path(service) -> Jenkins任务路径
+        """
+        paths = {service: job_path(service) for service in services_branches}
+        try:
+            numbers = self._last_successful_numbers(paths.values())
+        except Exception as e:
+            self.logger.warning(f"获取最近成功构建失败，不跳过任何服务: {str(e)}")
+            return set()
+
+        def check(service):
+            branch = services_branches[service]
+            number = numbers.get(paths[service])
+            if not number:
+                return None
+            try:
+                data = self._build_data(paths[service], number)
+                built = self._built_revision(data['revisions'], branch)
+                if not built or not data['remote']:
+                    return None
+                head = self.head_revision(data['remote'], branch)
+            except Exception as e:
+                self.logger.warning(f"检查服务 {service} 的分支版本失败: {str(e)}")
+                return None
+            if head and head == built:
+                self.logger.info(f"服务 {service} 的 {branch} ({head[:10]}) 已在构建 #{number} 中成功部署，跳过")
+                return service
+            return None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            skipped = {service for service in executor.map(check, services_branches) if service}
+        try:
+            self.save()
+        except OSError as e:
+            self.logger.warning(f"保存版本缓存失败: {str(e)}")
+        return skipped
@@ -0,0 +1,156 @@
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# 单个服务部署的各个阶段
+PHASES = ('driver_start', 'trigger', 'queue_wait', 'build', 'detection', 'rollout', 'total')
+
+
+def percentile(values, pct: float):
+    """最近秩法计算百分位数，values 为空时返回 None"""
+    values = sorted(values)
+    if not values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+class RunReport:
+    """
+    记录一次部署中每个服务各阶段的耗时，结束时输出 JSON 报告和 Prometheus textfile。
+    阶段: driver_start 借用/启动浏览器, trigger 打开页面并触发, queue_wait 排队等待构建编号,
+    build Jenkins 构建本身, detection 构建结束到发现结果的延迟, rollout 构建成功后等待 ArgoCD 同步并健康,
+    total 单个服务从提交到结束。
+    """
+
+    def __init__(self, kind: str, run_id: str = None):
+        self.kind = kind
+        self.run_id = run_id or datetime.now().strftime('%Y%m%d-%H%M%S-%f')[:-3]
+        self.started_at = time.time()
+        self.finished_at = None
+        self.services = {}  # service -> {'phases': {phase: seconds}, 'retries', 'success', ...}
+        self._lock = threading.Lock()
+
+    def _entry(self, service: str) -> dict:
+        return self.services.setdefault(service, {'phases': {}, 'retries': 0, 'success': None})
+
+    def add(self, service: str, phase: str, seconds: float):
+        """累加某个阶段的耗时，重试时同一阶段会出现多次"""
+        with self._lock:
+            phases = self._entry(service)['phases']
+            phases[phase] = round(phases.get(phase, 0) + max(seconds, 0), 3)
+
+    @contextmanager
+    def phase(self, service: str, phase: str):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(service, phase, time.time() - start)
+
+    def set(self, service: str, **fields):
+        """记录 success/retries/build_number/skipped 等字段"""
+        with self._lock:
+            self._entry(service).update(fields)
+
+    def retry(self, service: str):
+        with self._lock:
+            self._entry(service)['retries'] += 1
+
+    def finish(self):
+        self.finished_at = time.time()
+
+    def summary(self) -> dict:
+        """各阶段在所有服务上的 p50/p95/总和，以及整次部署的墙钟耗时"""
+        summary = {}
+        with self._lock:
+            entries = list(self.services.values())
+        for phase in PHASES:
+            values = [entry['phases'][phase] for entry in entries if phase in entry['phases']]
+            if values:
+                summary[phase] = {
+                    'count': len(values),
+                    'p50': percentile(values, 50),
+                    'p95': percentile(values, 95),
+                    'sum': round(sum(values), 3),
+                }
+        end = self.finished_at or time.time()
+        summary['wall_time'] = round(end - self.started_at, 3)
+        summary['retries'] = sum(entry['retries'] for entry in entries)
+        return summary
+
+    def to_dict(self) -> dict:
+        return {
+            'run_id': self.run_id,
+            'kind': self.kind,
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+            'services': self.services,
+            'summary': self.summary(),
+        }
+
+    def write_json(self, path: str):
+        _write_atomic(path, json.dumps(self.to_dict(), ensure_ascii=False, indent=2))
+
+    def write_prometheus(self, path: str):
+        """写入 node_exporter textfile collector 可读取的指标文件"""
+        labels = f'kind="{self.kind}"'
+        lines = [
+            '# HELP jenkins_deploy_phase_seconds Seconds spent in each deploy phase per service.',
+            '# TYPE jenkins_deploy_phase_seconds gauge',
+        ]
+        for service, entry in sorted(self.services.items()):
+            for phase, seconds in sorted(entry['phases'].items()):
+                lines.append(f'jenkins_deploy_phase_seconds{{{labels},service="{service}",phase="{phase}"}} {seconds}')
+        lines += [
+            '# HELP jenkins_deploy_success Whether the last deploy of the service succeeded.',
+            '# TYPE jenkins_deploy_success gauge',
+        ]
+        for service, entry in sorted(self.services.items()):
+            lines.append(f'jenkins_deploy_success{{{labels},service="{service}"}} {1 if entry["success"] else 0}')
+        lines += [
+            '# HELP jenkins_deploy_retries Retries used by the service in the last deploy.',
+            '# TYPE jenkins_deploy_retries gauge',
+        ]
+        for service, entry in sorted(self.services.items()):
+            lines.append(f'jenkins_deploy_retries{{{labels},service="{service}"}} {entry["retries"]}')
+        summary = self.summary()
+        lines += [
+            '# HELP jenkins_deploy_phase_summary_seconds p50/p95/sum of each phase across services.',
+            '# TYPE jenkins_deploy_phase_summary_seconds gauge',
+        ]
+        for phase in PHASES:
+            for stat in ('p50', 'p95', 'sum'):
+                if phase in summary:
+                    lines.append(f'jenkins_deploy_phase_summary_seconds{{{labels},phase="{phase}",stat="{stat}"}} '
+                                 f'{summary[phase][stat]}')
+        lines += [
+            '# HELP jenkins_deploy_wall_seconds Wall clock time of the last deploy run.',
+            '# TYPE jenkins_deploy_wall_seconds gauge',
+            f'jenkins_deploy_wall_seconds{{{labels}}} {summary["wall_time"]}',
+        ]
+        _write_atomic(path, '\n'.join(lines) + '\n')
+
+    def format_summary(self) -> str:
+        summary = self.summary()
+        lines = [f"部署耗时统计 (run_id={self.run_id}, 墙钟 {summary['wall_time']}秒, 重试 {summary['retries']} 次):"]
+        for phase in PHASES:
+            if phase in summary:
+                stats = summary[phase]
+                lines.append(f"  {phase:<13} p50 {stats['p50']:>8.2f}s  p95 {stats['p95']:>8.2f}s  "
+                             f"合计 {stats['sum']:>9.2f}s  ({stats['count']} 个服务)")
+        return '\n'.join(lines)
+
+
+def _write_atomic(path: str, content: str):
+    """先写临时文件再替换，避免读取方看到写了一半的文件"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
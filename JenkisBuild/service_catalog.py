@@ -0,0 +1,82 @@
+import hashlib
+import json
+import logging
+import os
+import time
+
+from services_extract import extract_services_from_file
+
+
+class ServiceCatalog:
+    """
+    服务列表目录。
+    本地页面的提取结果按文件 mtime/大小 缓存，mtime 变化时再比较内容哈希，内容不变就不重新提取；
+    提供 fetch_json 时按 ttl 从 Jenkins 目录的 jobs[name] 刷新列表，失败时退回本地页面。
+    """
+
+    def __init__(self, html_path='JenkisBuild/jenkins_build_page.html', cache_path='JenkisBuild/service_catalog.json',
+                 folder='job/PP', ttl=86400, logger=None):
+        """
+        :param folder: 服务所在的 Jenkins 目录
+        :param ttl: 远程列表的有效期(秒)，0 表示不从 Jenkins 刷新
+        """
+        self.html_path = html_path
+        self.cache_path = cache_path
+        self.folder = folder
+        self.ttl = ttl
+        self.logger = logger or logging.getLogger(__name__)
+        self.cache = {}
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    self.cache = json.load(f)
+            except (OSError, ValueError):
+                self.cache = {}
+
+    def save(self):
+        try:
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump(self.cache, f, ensure_ascii=False, separators=(',', ':'))
+        except OSError as e:
+            self.logger.warning(f"保存服务列表缓存失败: {str(e)}")
+
+    def services(self, fetch_json=None) -> list:
+        """
+        返回服务名列表
+        :param fetch_json: 可选的 fetch_json(path, tree)，提供且远程列表已过期时从 Jenkins 刷新
+        """
+        remote = self.cache.get('remote')
+        if self.ttl and remote and time.time() - remote['fetched_at'] < self.ttl:
+            return remote['services']
+        if self.ttl and fetch_json:
+            try:
+                return self.refresh(fetch_json)
+            except Exception as e:
+                self.logger.warning(f"从Jenkins刷新服务列表失败，使用本地页面: {str(e)}")
+        return self.from_html()
+
+    def refresh(self, fetch_json) -> list:
+        """从 Jenkins 目录读取任务名并写入缓存"""
+        data = fetch_json(self.folder, 'jobs[name]')
+        services = [job['name'] for job in data.get('jobs', []) if job.get('name')]
+        self.cache['remote'] = {'fetched_at': time.time(), 'services': services}
+        self.save()
+        return services
+
+    def from_html(self) -> list:
+        """读取本地页面的服务列表，页面未变化时直接使用缓存"""
+        stat = os.stat(self.html_path)
+        cached = self.cache.get('html') or {}
+        if cached.get('path') == self.html_path and cached.get('mtime_ns') == stat.st_mtime_ns \
+                and cached.get('size') == stat.st_size:
+            return cached['services']
+        with open(self.html_path, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        if cached.get('path') == self.html_path and cached.get('sha1') == digest:
+            services = cached['services']
+        else:
+            services = extract_services_from_file(self.html_path)
+        self.cache['html'] = {'path': self.html_path, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+                              'sha1': digest, 'services': services}
+        self.save()
+        return services
@@ -1,23 +1,24 @@
-from bs4 import BeautifulSoup
+import re
+
+# 任务列表中每个任务一行: <tr id="job_<服务名>" class="...">
+JOB_ROW = re.compile(r'<tr\b[^>]*?\bid="job_([^"]+)"')
+
 
 def extract_services(html):
-    soup = BeautifulSoup(html, 'html.parser')
-    services = []  # Changed to list instead of dict
-    
-    # Find all tr elements
-    for tr in soup.find_all('tr'):
-        # Get id attribute
-        job_id = tr.get('id')
-        if job_id and job_id.startswith('job_'):
-            # Extract service name by removing 'job_' prefix
-            service_name = job_id[4:]
-            services.append(service_name)  # Simply append the service name
-            
+    """从 Jenkins 任务列表页面中提取服务名，一次扫描所有 id="job_..." 的行，不构建 DOM"""
+    return [match.group(1) for match in JOB_ROW.finditer(html)]
+
+
+def extract_services_from_file(path):
+    """逐行扫描页面文件提取服务名，不需要把整个文件读入内存"""
+    services = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            if 'id="job_' in line:
+                services.extend(match.group(1) for match in JOB_ROW.finditer(line))
     return services
 
 
 if __name__ == "__main__":
-    with open(f'JenkisBuild/jenkins_build_page.html', 'r', encoding='utf-8') as file:
-        html = file.read()
-    services = extract_services(html)
-    print(services)
\ No newline at end of file
+    services = extract_services_from_file('JenkisBuild/jenkins_build_page.html')
+    print(services)
@@ -8,6 +8,7 @@ import json
 import argparse
 from pathlib import Path
 import getpass
+from urllib.parse import urlsplit, parse_qs
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.edge.options import Options
@@ -25,6 +26,12 @@ HTML_FILE = os.path.join(SCRIPT_DIR, "jira_page_source.html")
 OUTPUT_FILE = os.path.join(SCRIPT_DIR, "service_categories_from_list.txt")
 LOGIN_URL = "https://qima.atlassian.net/login"
 
+# JIRA REST 搜索接口，只取 Affects Project 字段
+# (旧的 /rest/api/2/search 已在 JIRA Cloud 下线，新接口按 nextPageToken 逐页获取)
+SEARCH_API = "/rest/api/3/search/jql"
+AFFECTS_PROJECT_FIELD = "customfield_12605"
+SEARCH_PAGE_SIZE = 100  # 每页 maxResults
+
 # Service categories - 从release_exctract.py复制过来
 COMMONS = ['commons']
 DEPENDENCY = ['lt-dependency']
@@ -561,6 +568,147 @@ def fetch_jira_page(username=None, password=None, headless=True, save_session=Fa
                 print("从文件加载的HTML内容无效")
         
 
+def create_jira_session(email=None, api_token=None):
+    """
+    创建JIRA会话，所有分页请求共用，复用同一个连接
+    
+    Args:
+        email (str): JIRA账号邮箱，为空时读取环境变量 JIRA_EMAIL
+        api_token (str): JIRA API token，为空时读取环境变量 JIRA_API_TOKEN
+        
+    Returns:
+        requests.Session: 会话；没有API token时使用浏览器保存的cookies认证
+    """
+    session = requests.Session()
+    session.headers['Accept'] = 'application/json'
+    
+    email = email or os.environ.get('JIRA_EMAIL')
+    api_token = api_token or os.environ.get('JIRA_API_TOKEN')
+    if email and api_token:
+        print("使用API token认证")
+        session.auth = (email, api_token)
+    elif os.path.exists(COOKIES_FILE):
+        # 复用Selenium登录后保存的会话cookies
+        with open(COOKIES_FILE, 'rb') as f:
+            cookies = pickle.load(f)
+        for cookie in cookies:
+            if 'atlassian' in cookie.get('domain', ''):
+                session.cookies.set(cookie['name'], cookie['value'], domain=cookie['domain'],
+                                    path=cookie.get('path', '/'))
+        print(f"使用保存的cookies认证 ({len(session.cookies)} 个)")
+    else:
+        print("警告: 没有API token也没有保存的cookies，将以匿名身份请求")
+    return session
+
+def search_target(url):
+    """
+    从JIRA列表页面URL得到站点地址和JQL
+    
+    Args:
+        url (str): 例如 https://qima.atlassian.net/issues/?filter=20334
+        
+    Returns:
+        tuple: (站点地址, JQL)
+    """
+    parts = urlsplit(url)
+    query = parse_qs(parts.query)
+    base_url = f"{parts.scheme}://{parts.netloc}"
+    if query.get('jql'):
+        return base_url, query['jql'][0]
+    if query.get('filter'):
+        return base_url, f"filter={query['filter'][0]}"
+    raise ValueError(f"URL中没有filter或jql参数: {url}")
+
+def fetch_search_page(session, base_url, jql, max_results, next_page_token=None):
+    """
+    获取一页搜索结果，只返回 Affects Project 字段
+    
+    Args:
+        next_page_token (str): 上一页返回的 nextPageToken，第一页为空
+    
+    Returns:
+        dict: JIRA返回的JSON (issues, nextPageToken, isLast)
+    """
+    params = {
+        'jql': jql,
+        'fields': AFFECTS_PROJECT_FIELD,
+        'maxResults': max_results,
+    }
+    if next_page_token:
+        params['nextPageToken'] = next_page_token
+    response = session.get(base_url + SEARCH_API, params=params, timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+def fetch_issues_via_api(session, url=None, page_size=SEARCH_PAGE_SIZE):
+    """
+    通过JIRA搜索API获取过滤器中的全部问题
+    
+    每页返回下一页的 nextPageToken，只能逐页获取，直到 isLast 或没有 nextPageToken
+    
+    Returns:
+        list: 问题列表
+    """
+    base_url, jql = search_target(url or JIRA_URL)
+    issues = []
+    pages = 0
+    next_page_token = None
+    while True:
+        page = fetch_search_page(session, base_url, jql, page_size, next_page_token)
+        pages += 1
+        issues.extend(page.get('issues') or [])
+        next_page_token = page.get('nextPageToken')
+        if page.get('isLast', True) or not next_page_token:
+            break
+    print(f"共获取 {len(issues)} 个问题 ({pages} 页)")
+    return issues
+
+def extract_service_names_from_issues(issues):
+    """
+    从搜索结果的 Affects Project 字段中提取服务名称
+    
+    Args:
+        issues (list): JIRA搜索结果中的问题
+        
+    Returns:
+        list: 服务名称列表
+    """
+    service_names = set()
+    for issue in issues:
+        value = (issue.get('fields') or {}).get(AFFECTS_PROJECT_FIELD)
+        if not value:
+            continue
+        # 多选字段为选项列表，也兼容单个选项和逗号分隔的文本
+        values = value if isinstance(value, list) else [value]
+        for item in values:
+            text = (item.get('value') or item.get('name') or '') if isinstance(item, dict) else str(item)
+            for part in text.split(','):
+                service_name = part.strip()
+                if service_name and is_valid_service_name(service_name):
+                    service_names.add(service_name)
+    return clean_service_names(service_names)
+
+def fetch_services_via_api(email=None, api_token=None, page_size=SEARCH_PAGE_SIZE):
+    """
+    通过JIRA REST API获取服务名称，不需要浏览器
+    
+    Returns:
+        list: 服务名称列表，请求失败时返回 None
+    """
+    start_time = time.time()
+    print(f"通过JIRA搜索API获取: {JIRA_URL}")
+    session = create_jira_session(email, api_token)
+    try:
+        issues = fetch_issues_via_api(session, JIRA_URL, page_size)
+    except (requests.RequestException, ValueError) as e:
+        print(f"通过API获取失败: {str(e)}")
+        return None
+    finally:
+        session.close()
+    service_names = extract_service_names_from_issues(issues)
+    print(f"API获取耗时: {time.time() - start_time:.2f} 秒")
+    return service_names
+
 def is_valid_service_name(name):
     """
     检查是否是有效的服务名称
@@ -724,6 +872,20 @@ def extract_service_names_from_html(html_content):
                 if match and is_valid_service_name(match.strip()):
                     service_names.add(match.strip())
     
+    return clean_service_names(service_names)
+
+def clean_service_names(service_names):
+    """
+    补充依赖服务并清理服务名称
+    
+    Args:
+        service_names (set): 提取到的原始服务名称
+        
+    Returns:
+        list: 清理后的唯一服务名称列表
+    """
+    service_names = set(service_names)
+    
     # 添加依赖服务 - 这个是必须的
     if not any(s.lower() == 'lt-dependency' for s in service_names):
         print("添加依赖服务: lt-dependency")
@@ -860,54 +1022,16 @@ def print_results(categories):
     
     print(f"\n结果已保存到 {OUTPUT_FILE}")
 
-def main():
-    # 解析命令行参数
-    parser = argparse.ArgumentParser(description="从JIRA HTML列表页面提取服务名称并分类")
-    parser.add_argument("--no-headless", action="store_true", help="不在无头模式下运行浏览器（显示浏览器窗口）")
-    parser.add_argument("--username", type=str, help="JIRA用户名")
-    parser.add_argument("--password", type=str, help="JIRA密码")
-    parser.add_argument("--save-session", action="store_true", help="登录后保存会话cookies")
-    parser.add_argument("--no-use-cookies", action="store_false", dest="use_cookies", help="不使用保存的cookies")
-    parser.add_argument("--reset-cookies", action="store_true", help="删除已保存的cookies，强制重新登录")
-    parser.add_argument("--html-file", type=str, help="JIRA HTML文件路径")
-    parser.add_argument("--url", type=str, help="自定义JIRA URL，覆盖默认URL")
-    parser.add_argument("--token", type=str, help="指定atl_token值，用于JIRA URL")
-    parser.add_argument("--save-html", action="store_true", help="保存获取到的HTML内容到文件中")
-    parser.add_argument("--debug", action="store_true", help="启用调试模式，输出更多信息")
-    parser.add_argument("--output", type=str, help="输出文件路径")
-    parser.add_argument("--use-existing-html", action="store_true", help="强制使用已保存的HTML文件，而不获取新的数据")
-    args = parser.parse_args()
-    
-    print("开始从JIRA HTML列表页面提取服务名称...")
-    
-    # 如果需要重置cookies
-    if args.reset_cookies:
-        reset_cookies()
-    
-    # 如果指定了自定义URL
-    global JIRA_URL
-    if args.url:
-        JIRA_URL = args.url
-        print(f"使用自定义URL: {JIRA_URL}")
-    
-    # 如果指定了atl_token
-    if args.token:
-        # 检查URL中是否已存在atl_token参数
-        if "atl_token=" in JIRA_URL:
-            # 替换现有token
-            JIRA_URL = re.sub(r'atl_token=[^&]+', f'atl_token={args.token}', JIRA_URL)
-        else:
-            # 添加token参数
-            separator = "&" if "?" in JIRA_URL else "?"
-            JIRA_URL = f"{JIRA_URL}{separator}atl_token={args.token}"
-        print(f"使用指定的atl_token更新URL: {JIRA_URL}")
-    
-    # 如果指定了自定义输出文件
-    global OUTPUT_FILE
-    if args.output:
-        OUTPUT_FILE = args.output
-        print(f"使用自定义输出文件: {OUTPUT_FILE}")
+def fetch_service_names_from_html(args):
+    """
+    从HTML文件或浏览器获取的JIRA打印列表页面中提取服务名称
     
+    Args:
+        args: 命令行参数
+        
+    Returns:
+        list: 服务名称列表，未获取到HTML内容时返回 None
+    """
     # 获取HTML内容
     html_content = ""
     
@@ -934,7 +1058,7 @@ def main():
     
     if not html_content:
         print("错误: 未获取到HTML内容，无法提取服务名称")
-        return
+        return None
     
     # 如果需要保存HTML内容
     if args.save_html:
@@ -955,7 +1079,71 @@ def main():
         print(f"HTML内容有效性验证: {'通过' if is_valid else '失败'}")
     
     # 从HTML内容中提取服务名称
-    service_names = extract_service_names_from_html(html_content)
+    return extract_service_names_from_html(html_content)
+
+def main():
+    # 解析命令行参数
+    parser = argparse.ArgumentParser(description="从JIRA过滤器的问题列表提取服务名称并分类")
+    parser.add_argument("--no-headless", action="store_true", help="不在无头模式下运行浏览器（显示浏览器窗口）")
+    parser.add_argument("--username", type=str, help="JIRA用户名")
+    parser.add_argument("--password", type=str, help="JIRA密码")
+    parser.add_argument("--save-session", action="store_true", help="登录后保存会话cookies")
+    parser.add_argument("--no-use-cookies", action="store_false", dest="use_cookies", help="不使用保存的cookies")
+    parser.add_argument("--reset-cookies", action="store_true", help="删除已保存的cookies，强制重新登录")
+    parser.add_argument("--html-file", type=str, help="JIRA HTML文件路径")
+    parser.add_argument("--url", type=str, help="自定义JIRA URL，覆盖默认URL")
+    parser.add_argument("--token", type=str, help="指定atl_token值，用于JIRA URL")
+    parser.add_argument("--save-html", action="store_true", help="保存获取到的HTML内容到文件中")
+    parser.add_argument("--debug", action="store_true", help="启用调试模式，输出更多信息")
+    parser.add_argument("--output", type=str, help="输出文件路径")
+    parser.add_argument("--use-existing-html", action="store_true", help="强制使用已保存的HTML文件，而不获取新的数据")
+    parser.add_argument("--backend", choices=["api", "browser"], default="api",
+                        help="api: 通过JIRA搜索API获取（默认，失败时改用浏览器）; browser: 通过浏览器导出打印列表")
+    parser.add_argument("--email", type=str, help="JIRA账号邮箱，用于API token认证，默认读取环境变量 JIRA_EMAIL")
+    parser.add_argument("--api-token", type=str, help="JIRA API token，默认读取环境变量 JIRA_API_TOKEN")
+    parser.add_argument("--page-size", type=int, default=SEARCH_PAGE_SIZE, help="API每页获取的问题数 (maxResults)")
+    args = parser.parse_args()
+    
+    print("开始从JIRA HTML列表页面提取服务名称...")
+    
+    # 如果需要重置cookies
+    if args.reset_cookies:
+        reset_cookies()
+    
+    # 如果指定了自定义URL
+    global JIRA_URL
+    if args.url:
+        JIRA_URL = args.url
+        print(f"使用自定义URL: {JIRA_URL}")
+    
+    # 如果指定了atl_token
+    if args.token:
+        # 检查URL中是否已存在atl_token参数
+        if "atl_token=" in JIRA_URL:
+            # 替换现有token
+            JIRA_URL = re.sub(r'atl_token=[^&]+', f'atl_token={args.token}', JIRA_URL)
+        else:
+            # 添加token参数
+            separator = "&" if "?" in JIRA_URL else "?"
+            JIRA_URL = f"{JIRA_URL}{separator}atl_token={args.token}"
+        print(f"使用指定的atl_token更新URL: {JIRA_URL}")
+    
+    # 如果指定了自定义输出文件
+    global OUTPUT_FILE
+    if args.output:
+        OUTPUT_FILE = args.output
+        print(f"使用自定义输出文件: {OUTPUT_FILE}")
+    
+    # 没有指定HTML文件时优先通过搜索API获取，不需要浏览器
+    use_html_file = (args.use_existing_html and os.path.exists(HTML_FILE)) or \
+        (args.html_file and os.path.exists(args.html_file))
+    service_names = None
+    if args.backend == "api" and not use_html_file:
+        service_names = fetch_services_via_api(args.email, args.api_token, args.page_size)
+        if service_names is None:
+            print("改用浏览器获取JIRA页面...")
+    if service_names is None:
+        service_names = fetch_service_names_from_html(args)
     
     if not service_names:
         print("错误: 提取服务名称失败")